@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Alertes sur recherches sauvegardées
+Chaque annonce scrapée ou enrichie est comparée aux critères de l'utilisateur
+(ville, prix, surface, pièces, mots-clés). Les critères sont indexés par
+ville et par intervalles de prix et de surface: une annonce n'est testée que
+contre les règles candidates, pas contre toutes.
+
+Usage: python3 alerts.py run --rules alerts.json --input annonces.json
+       python3 alerts.py stub --port 8099   # Webhook local de test
+"""
+
+import argparse
+import bisect
+import json
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from export import list_fields
+from metrics import REGISTRY
+from record import load_dicts
+from search_index import (
+    document_text, fold_accents, is_excluded, parse_query, tokenize,
+)
+
+ALERTS_FILE = 'alerts.json'
+ALERTS_STATE_FILE = 'alerts_seen.json'
+DEFAULT_SINK = 'stdout'
+WEBHOOK_TIMEOUT = 10
+
+ALERTS_SENT = REGISTRY.counter(
+    'seloger_alerts_total', 'Alertes envoyées par règle'
+)
+
+_POSTAL_RE = re.compile(r'\b(\d{5})\b')
+
+
+def _place_name(folded: str) -> str:
+    """Dernier segment d'une localisation, sans code postal ("quartier, ville")"""
+    segments = re.sub(r'\(.*?\)|\d{5}', '', folded).split(',')
+    return next((s.strip(' -') for s in reversed(segments) if s.strip(' -')),
+                '')
+
+
+def city_keys(ville: Optional[str]) -> set:
+    """
+    Clés de ville d'une annonce
+
+    "Lyon 3ème (69003)" -> {"69003", "lyon", "lyon 3eme"}
+    "Le Grand Trou, Lyon" -> {"lyon"} (le quartier précède la ville)
+    """
+    if not ville:
+        return set()
+    folded = fold_accents(ville)
+    keys = set(_POSTAL_RE.findall(folded))
+    name = _place_name(folded)
+    if name:
+        keys.add(name)
+        keys.add(re.split(r'\s+\d', name)[0].strip())
+    return keys
+
+
+@lru_cache(maxsize=10000)
+def city_name(ville: Optional[str]) -> Optional[str]:
+    """
+    Ville d'une annonce sans quartier, code postal ni arrondissement
+
+    "Le Grand Trou, Lyon 3ème (69003)" -> "lyon"
+    """
+    if not ville:
+        return None
+    name = _place_name(fold_accents(ville))
+    return re.split(r'\s+\d', name)[0].strip() or None
+
+
+class IntervalIndex:
+    """
+    Index d'intervalles fermés [min, max] (bornes optionnelles)
+
+    Les bornes découpent l'axe en segments élémentaires; chaque segment
+    connaît les règles qui le couvrent. Une valeur se résout par bisection.
+    """
+
+    def __init__(self, intervals: Dict[int, tuple]):
+        self.bounds = sorted({
+            bound for lo, hi in intervals.values()
+            for bound in (lo, hi) if bound is not None
+        })
+        # Segment 2i: ouvert avant bounds[i]; segment 2i+1: bounds[i] exact
+        self.segments = [set() for _ in range(2 * len(self.bounds) + 1)]
+        self.unbounded = set()  # règles sans contrainte sur cet axe
+        for rule_id, (lo, hi) in intervals.items():
+            if lo is None and hi is None:
+                self.unbounded.add(rule_id)
+            first = 0 if lo is None else self._point(lo)
+            last = len(self.segments) - 1 if hi is None else self._point(hi)
+            for segment in range(first, last + 1):
+                self.segments[segment].add(rule_id)
+
+    def _point(self, value: float) -> int:
+        return 2 * bisect.bisect_left(self.bounds, value) + 1
+
+    def lookup(self, value: Optional[float]) -> set:
+        """Règles dont l'intervalle contient la valeur"""
+        if value is None:
+            # Valeur inconnue: seules les règles sans contrainte s'appliquent
+            return self.unbounded
+        i = bisect.bisect_left(self.bounds, value)
+        if i < len(self.bounds) and self.bounds[i] == value:
+            return self.segments[2 * i + 1]
+        return self.segments[2 * i]
+
+
+def normalize_rule(rule: Dict, default_sink: str) -> Dict:
+    """Valide une règle et prépare ses critères"""
+    if not rule.get('name'):
+        raise ValueError(f"Règle sans nom: {rule}")
+    villes = rule.get('villes') or rule.get('ville') or []
+    if isinstance(villes, str):
+        villes = [villes]
+    keywords = rule.get('keywords') or ''
+    required, excluded = parse_query(keywords)
+    return {
+        **rule,
+        'city_keys': {fold_accents(v).strip() for v in villes},
+        'required': set(required),
+        'excluded': excluded,
+        'sink': rule.get('sink') or default_sink,
+    }
+
+
+class StdoutSink:
+    """Affiche les alertes dans le terminal"""
+
+    def send(self, alert: Dict):
+        a = alert['annonce']
+        print(f"🔔 [{alert['rule']}] {a.get('title') or 'Annonce'} | "
+              f"{a.get('price') or 'N/A'} € | {a.get('surface') or 'N/A'} m² | "
+              f"{a.get('ville') or 'N/A'}\n   {a.get('url')}")
+
+
+class FileSink:
+    """Ajoute les alertes à un fichier NDJSON"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def send(self, alert: Dict):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(alert, ensure_ascii=False) + '\n')
+
+
+class WebhookSink:
+    """Envoie les alertes en POST JSON"""
+
+    def __init__(self, url: str):
+        self.url = url
+
+    def send(self, alert: Dict):
+        import urllib.error
+        import urllib.request
+
+        request = urllib.request.Request(
+            self.url, method='POST',
+            data=json.dumps(alert, ensure_ascii=False).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+        )
+        try:
+            with urllib.request.urlopen(request,
+                                        timeout=WEBHOOK_TIMEOUT) as response:
+                response.read()
+        except (urllib.error.URLError, OSError) as e:
+            print(f"⚠️ Webhook {self.url} injoignable: {e}")
+
+
+def make_sink(spec: str):
+    """
+    Crée une sortie d'alertes
+
+    Args:
+        spec: 'stdout', 'file:<chemin>' ou 'webhook:<url>'
+    """
+    kind, _, target = spec.partition(':')
+    if kind == 'stdout':
+        return StdoutSink()
+    if kind == 'file' and target:
+        return FileSink(target)
+    if kind == 'webhook' and target:
+        return WebhookSink(target)
+    raise ValueError(f"Sortie d'alertes inconnue: {spec}")
+
+
+class AlertEngine:
+    """Compare des annonces à un ensemble de règles indexées"""
+
+    def __init__(self, rules: List[Dict], state_file: Optional[str] = None,
+                 default_sink: str = DEFAULT_SINK):
+        self.rules = [normalize_rule(rule, default_sink) for rule in rules]
+        self.state_file = state_file
+        self._sinks = {}
+        self.checked = 0  # règles effectivement testées (pour les stats)
+
+        self._by_city = {}
+        self._any_city = set()
+        for rule_id, rule in enumerate(self.rules):
+            if not rule['city_keys']:
+                self._any_city.add(rule_id)
+            for key in rule['city_keys']:
+                self._by_city.setdefault(key, set()).add(rule_id)
+        self._price = IntervalIndex({
+            i: (rule.get('price_min'), rule.get('price_max'))
+            for i, rule in enumerate(self.rules)
+        })
+        self._surface = IntervalIndex({
+            i: (rule.get('surface_min'), rule.get('surface_max'))
+            for i, rule in enumerate(self.rules)
+        })
+
+        # Annonces déjà signalées, par règle
+        self.seen = {}
+        if state_file and os.path.exists(state_file):
+            with open(state_file, 'r', encoding='utf-8') as f:
+                self.seen = {name: set(urls)
+                             for name, urls in json.load(f).items()}
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> 'AlertEngine':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f), **kwargs)
+
+    def candidates(self, fields: Dict) -> set:
+        """Règles compatibles avec la ville, le prix et la surface"""
+        by_city = set(self._any_city)
+        keys = city_keys(fields['ville'])
+        if fields['quartier']:
+            keys.add(fold_accents(fields['quartier']).strip())
+        for key in keys:
+            by_city.update(self._by_city.get(key, ()))
+        if not by_city:
+            return by_city
+        return (by_city & self._price.lookup(fields['price'])
+                & self._surface.lookup(fields['surface']))
+
+    def match(self, annonce: Dict,
+              fields: Optional[Dict] = None) -> List[Dict]:
+        """Règles satisfaites par une annonce"""
+        fields = fields or list_fields(annonce)
+        candidates = self.candidates(fields)
+        self.checked += len(candidates)
+        terms = None
+        matched = []
+        for rule_id in sorted(candidates):
+            rule = self.rules[rule_id]
+            if (rule.get('pieces_min') and
+                    (fields['pieces'] or 0) < rule['pieces_min']):
+                continue
+            if (rule.get('chambres_min') and
+                    (fields['chambres'] or 0) < rule['chambres_min']):
+                continue
+            if rule['required'] or rule['excluded']:
+                if terms is None:
+                    terms = set(tokenize(' '.join(document_text(annonce))))
+                if (not rule['required'] <= terms or
+                        is_excluded(rule['excluded'], terms)):
+                    continue
+            matched.append(rule)
+        return matched
+
+    def _sink(self, spec: str):
+        sink = self._sinks.get(spec)
+        if sink is None:
+            sink = self._sinks[spec] = make_sink(spec)
+        return sink
+
+    def process(self, annonces: Iterable[Dict], save: bool = True) -> int:
+        """
+        Signale les annonces qui satisfont une règle pour la première fois
+
+        Args:
+            annonces: Lot d'annonces à tester
+            save: Réécrire le fichier d'état après le lot (False quand
+                l'appelant traite les annonces une à une et appelle
+                save_state() à la fin)
+
+        Returns:
+            Nombre d'alertes envoyées
+        """
+        sent = 0
+        for annonce in annonces:
+            url = annonce.get('url')
+            if not url:
+                continue
+            fields = list_fields(annonce)
+            for rule in self.match(annonce, fields):
+                seen = self.seen.setdefault(rule['name'], set())
+                if url in seen:
+                    continue
+                seen.add(url)
+                alert = {
+                    'rule': rule['name'],
+                    'ts': time.time(),
+                    'annonce': {'url': url, **fields},
+                }
+                self._sink(rule['sink']).send(alert)
+                ALERTS_SENT.inc(rule=rule['name'])
+                sent += 1
+        if save:
+            self.save_state()
+        return sent
+
+    def save_state(self):
+        if not self.state_file:
+            return
+        with open(self.state_file, 'w', encoding='utf-8') as f:
+            json.dump({name: sorted(urls) for name, urls in self.seen.items()},
+                      f, ensure_ascii=False, indent=2)
+
+
+def run_stub(port: int):
+    """Webhook local qui affiche les alertes reçues"""
+    import http.server
+
+    class StubHandler(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            alert = json.loads(self.rfile.read(length) or b'{}')
+            StdoutSink().send(alert)
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format, *args):  # noqa: A002
+            pass
+
+    with http.server.ThreadingHTTPServer(('127.0.0.1', port),
+                                         StubHandler) as httpd:
+        print(f"📡 Webhook de test sur http://127.0.0.1:{port}/")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("\n👋 Arrêt du webhook")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Alertes sur recherches sauvegardées'
+    )
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_run = sub.add_parser('run', help='Tester un fichier d\'annonces')
+    p_run.add_argument('--rules', default=ALERTS_FILE,
+                       help=f'Fichier JSON des règles (défaut: {ALERTS_FILE})')
+    p_run.add_argument('--input', default='annonces.json',
+                       help='Fichier d\'annonces (JSON ou .sla)')
+    p_run.add_argument('--sink', default=DEFAULT_SINK,
+                       help='Sortie par défaut: stdout, file:<chemin>, '
+                            'webhook:<url>')
+    p_run.add_argument('--state', default=ALERTS_STATE_FILE,
+                       help='Annonces déjà signalées '
+                            f'(défaut: {ALERTS_STATE_FILE})')
+
+    p_stub = sub.add_parser('stub', help='Webhook local de test')
+    p_stub.add_argument('--port', type=int, default=8099,
+                        help='Port d\'écoute (défaut: 8099)')
+
+    args = parser.parse_args(argv)
+    if args.command == 'stub':
+        run_stub(args.port)
+        return
+
+    engine = AlertEngine.from_file(args.rules, state_file=args.state,
+                                   default_sink=args.sink)
+    annonces = load_dicts(args.input)
+    print(f"📂 {len(annonces)} annonces, {len(engine.rules)} règles")
+    sent = engine.process(annonces)
+    tested = len(annonces) * len(engine.rules)
+    print(f"🔔 {sent} alertes envoyées "
+          f"({engine.checked}/{tested} couples annonce/règle testés)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+Analyse de marché: prix au m² de référence par quartier et bonnes affaires
+Les annonces sont chargées dans des tableaux NumPy (prix, surface, codes
+ville/quartier, DPE); médianes et centiles du €/m² sont calculés par
+groupe en une passe vectorisée (tri + découpage), sans boucle Python par
+quartier. Chaque annonce est comparée à la référence de son quartier, ou
+de sa ville si le quartier compte trop peu d'annonces.
+
+Usage: python3 analytics.py --input annonces_enriched.json [--top 20]
+"""
+
+import argparse
+import threading
+from typing import Dict, Iterable, List
+
+from alerts import city_name
+from export import list_fields, parse_number
+from record import Annonce, is_binary, load, load_dicts
+
+try:
+    import numpy as np
+except ImportError:  # Analyses indisponibles (le reste du projet s'en passe)
+    np = None
+
+MIN_GROUP = 5  # annonces minimum pour qu'un quartier serve de référence
+PERCENTILES = (10, 25, 50, 75, 90)
+DPE_CLASSES = 'ABCDEFG'
+_DPE_CODES = {dpe: code for code, dpe in enumerate(DPE_CLASSES, 1)}
+
+# Niveau de la référence retenue pour une annonce
+LEVEL_NONE, LEVEL_GLOBAL, LEVEL_VILLE, LEVEL_QUARTIER = 0, 1, 2, 3
+LEVEL_NAMES = {LEVEL_NONE: None, LEVEL_GLOBAL: 'global',
+               LEVEL_VILLE: 'ville', LEVEL_QUARTIER: 'quartier'}
+
+
+def available() -> bool:
+    return np is not None
+
+
+def grouped_percentiles(codes, values, percentiles=PERCENTILES):
+    """
+    Centiles de `values` par groupe, sans boucle sur les groupes
+
+    Un seul tri lexicographique (groupe, valeur) range chaque groupe d'un
+    bloc; les centiles se lisent aux positions interpolées de chaque bloc
+    (même interpolation linéaire que np.percentile).
+
+    Returns:
+        (groupes distincts, effectifs, centiles [groupe x centile],
+         rang de chaque valeur dans son groupe, de 0 à 1)
+    """
+    order = np.lexsort((values, codes))
+    sorted_codes = codes[order]
+    sorted_values = values[order]
+    groups, starts, counts = np.unique(sorted_codes, return_index=True,
+                                       return_counts=True)
+    fractions = np.asarray(percentiles, dtype=float) / 100
+    positions = starts[:, None] + (counts[:, None] - 1) * fractions[None, :]
+    low = np.floor(positions).astype(np.int64)
+    high = np.minimum(low + 1, (starts + counts - 1)[:, None])
+    weight = positions - low
+    table = sorted_values[low] * (1 - weight) + sorted_values[high] * weight
+
+    # Rang dans le groupe: position dans le bloc trié, ramenée sur [0, 1]
+    block = np.repeat(np.arange(len(groups)), counts)
+    ranks = np.empty(len(values))
+    ranks[order] = ((np.arange(len(values)) - starts[block]) /
+                    np.maximum(counts[block] - 1, 1))
+    return groups, counts, table, ranks
+
+
+class MarketIndex:
+    """
+    €/m² des annonces, rangé en tableaux NumPy et mis à jour incrémentalement
+
+    Chaque annonce occupe une case des tableaux (clé: URL). sync() ne
+    relit que les annonces nouvelles ou modifiées; les références par
+    quartier sont recalculées d'un bloc, à la demande, après un changement.
+
+    Usage:
+        market = MarketIndex()
+        market.sync(annonces)
+        scores = market.scores(keys)  # {'price_m2': [...], 'deal': [...]}
+    """
+
+    def __init__(self, min_group: int = MIN_GROUP):
+        if np is None:
+            raise RuntimeError("NumPy requis pour l'analyse de marché "
+                               "(pip install numpy)")
+        self.min_group = min_group
+        self._lock = threading.Lock()
+        self._slots = {}  # clé -> case
+        self._sources = {}  # clé -> annonce indexée (même objet: inchangée)
+        self._free = []
+        self._villes = {None: 0}  # nom -> code (0 = inconnu)
+        self._quartiers = {None: 0}
+        self._size = 0
+        self._grow(1024)
+        self._results = None  # calculés à la demande après un changement
+
+    def _grow(self, capacity: int):
+        def resized(array, fill):
+            grown = np.full(capacity, fill, dtype=array.dtype)
+            grown[:len(array)] = array
+            return grown
+
+        if self._size == 0:
+            self.price = np.full(capacity, np.nan)
+            self.surface = np.full(capacity, np.nan)
+            self.ville = np.zeros(capacity, dtype=np.int32)
+            self.quartier = np.zeros(capacity, dtype=np.int32)
+            self.dpe = np.zeros(capacity, dtype=np.int8)
+            self.valid = np.zeros(capacity, dtype=bool)
+            return
+        self.price = resized(self.price, np.nan)
+        self.surface = resized(self.surface, np.nan)
+        self.ville = resized(self.ville, 0)
+        self.quartier = resized(self.quartier, 0)
+        self.dpe = resized(self.dpe, 0)
+        self.valid = resized(self.valid, False)
+
+    @staticmethod
+    def _code(codes: Dict, value) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+        return code
+
+    def _slot(self, key: str) -> int:
+        slot = self._slots.get(key)
+        if slot is not None:
+            return slot
+        if self._free:
+            slot = self._free.pop()
+        else:
+            if self._size == len(self.valid):
+                self._grow(2 * len(self.valid))
+            slot = self._size
+            self._size += 1
+        self._slots[key] = slot
+        return slot
+
+    def upsert(self, key: str, annonce: Dict):
+        """Ajoute ou met à jour une annonce"""
+        # Mêmes sources que list_fields() (vues liste et carte)
+        price = parse_number(annonce.get('prix_clean') or annonce.get('price'))
+        surface = parse_number(annonce.get('surface_clean') or
+                               annonce.get('surface'))
+        with self._lock:
+            slot = self._slot(key)
+            self._sources[key] = annonce
+            self.price[slot] = price or np.nan
+            self.surface[slot] = surface or np.nan
+            # Ville seule, comme les alertes: pas "quartier, ville" brut
+            self.ville[slot] = self._code(
+                self._villes,
+                city_name(annonce.get('ville') or annonce.get('location')))
+            self.quartier[slot] = self._code(self._quartiers,
+                                             annonce.get('quartier') or None)
+            self.dpe[slot] = _DPE_CODES.get(annonce.get('dpe'), 0)
+            self.valid[slot] = True
+            self._results = None
+
+    def load_records(self, records: List[Annonce]):
+        """
+        Remplit l'index d'un bloc depuis des Annonce (fichier .sla): prix et
+        surface sont déjà typés, les colonnes passent directement en NumPy
+        """
+        with self._lock:
+            self._slots, self._sources, self._free = {}, {}, []
+            self._size = 0
+            self._grow(max(len(records), 1024))
+            for slot, annonce in enumerate(records):
+                self._slots[annonce.url or str(annonce.id or '')] = slot
+            n = len(records)
+
+            def floats(attr, raw_attr):
+                return np.fromiter(
+                    (getattr(a, attr) or
+                     parse_number(getattr(a, raw_attr)) or np.nan
+                     for a in records), dtype=float, count=n)
+
+            def codes(table, names):
+                return np.fromiter((self._code(table, name or None)
+                                    for name in names),
+                                   dtype=np.int32, count=n)
+
+            self.price[:n] = floats('prix', 'price_text')
+            self.surface[:n] = floats('surface', 'surface_text')
+            self.ville[:n] = codes(self._villes,
+                                   (city_name(a.ville or a.location)
+                                    for a in records))
+            self.quartier[:n] = codes(self._quartiers,
+                                      (a.quartier for a in records))
+            self.dpe[:n] = np.fromiter((_DPE_CODES.get(a.dpe, 0)
+                                        for a in records),
+                                       dtype=np.int8, count=n)
+            # Une URL en double ne garde que sa dernière case
+            self.valid[list(self._slots.values())] = True
+            self._size = n
+            self._results = None
+
+    def remove(self, key: str):
+        with self._lock:
+            slot = self._slots.pop(key, None)
+            self._sources.pop(key, None)
+            if slot is None:
+                return
+            self.valid[slot] = False
+            self.price[slot] = np.nan
+            self._free.append(slot)
+            self._results = None
+
+    def sync(self, annonces: Iterable[Dict]) -> Dict[str, int]:
+        """
+        Aligne l'index sur une liste d'annonces (seules les annonces
+        nouvelles ou modifiées sont relues)
+
+        Returns:
+            {'added': n, 'updated': n, 'removed': n}
+        """
+        stats = {'added': 0, 'updated': 0, 'removed': 0}
+        seen = set()
+        for annonce in annonces:
+            key = annonce_key(annonce)
+            seen.add(key)
+            previous = self._sources.get(key)
+            if previous is annonce:
+                continue
+            if previous is None:
+                stats['added'] += 1
+            elif previous == annonce:
+                self._sources[key] = annonce
+                continue
+            else:
+                stats['updated'] += 1
+            self.upsert(key, annonce)
+        for key in [key for key in self._slots if key not in seen]:
+            self.remove(key)
+            stats['removed'] += 1
+        return stats
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _compute(self) -> Dict:
+        """Références par quartier / ville / global et score de chaque case"""
+        n = self._size
+        price, surface = self.price[:n], self.surface[:n]
+        ville, quartier = self.ville[:n], self.quartier[:n]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            price_m2 = np.where(self.valid[:n] & (surface > 0),
+                                price / surface, np.nan)
+        ok = np.isfinite(price_m2)
+        rows = np.flatnonzero(ok)
+        values = price_m2[rows]
+        median = PERCENTILES.index(50)
+
+        baseline = np.full(n, np.nan)
+        rank = np.full(n, np.nan)
+        level = np.zeros(n, dtype=np.int8)
+        groups = {}
+        n_quartiers = max(len(self._quartiers), 1)
+        if len(rows):
+            # Du plus large au plus précis: chaque niveau écrase le
+            # précédent là où son groupe est assez grand
+            for lvl, codes in (
+                (LEVEL_GLOBAL, np.zeros(len(rows), dtype=np.int64)),
+                (LEVEL_VILLE, ville[rows].astype(np.int64)),
+                (LEVEL_QUARTIER, ville[rows].astype(np.int64) * n_quartiers
+                 + quartier[rows]),
+            ):
+                keys, counts, table, ranks = grouped_percentiles(codes,
+                                                                 values)
+                groups[lvl] = (keys, counts, table)
+                where = np.searchsorted(keys, codes)
+                usable = counts[where] >= (1 if lvl == LEVEL_GLOBAL
+                                           else self.min_group)
+                if lvl == LEVEL_VILLE:
+                    usable &= ville[rows] != 0
+                elif lvl == LEVEL_QUARTIER:
+                    usable &= quartier[rows] != 0
+                target = rows[usable]
+                baseline[target] = table[where[usable], median]
+                rank[target] = ranks[usable]
+                level[target] = lvl
+        with np.errstate(divide='ignore', invalid='ignore'):
+            deal = 1 - price_m2 / baseline
+        by_dpe = None
+        if len(rows):
+            by_dpe = grouped_percentiles(self.dpe[rows].astype(np.int64),
+                                         values)[:3]
+        return {'price_m2': price_m2, 'baseline': baseline, 'deal': deal,
+                'rank': rank, 'level': level, 'groups': groups,
+                'by_dpe': by_dpe, 'n_quartiers': n_quartiers}
+
+    def results(self) -> Dict:
+        with self._lock:
+            if self._results is None:
+                self._results = self._compute()
+            return self._results
+
+    def scores(self, keys: List[str]) -> Dict[str, List]:
+        """
+        Colonnes triables alignées sur `keys`
+
+        Returns:
+            {'price_m2': €/m², 'deal': écart à la référence locale
+             (0.15 = 15 % moins cher), 'deal_rank': rang du €/m² dans le
+             groupe de référence (0 = le moins cher)}, None si inconnu
+        """
+        results = self.results()
+        slots = np.fromiter((self._slots.get(key, -1) for key in keys),
+                            dtype=np.int64, count=len(keys))
+        known = slots >= 0
+        columns = {}
+        for name, source, digits in (('price_m2', 'price_m2', 1),
+                                     ('deal', 'deal', 3),
+                                     ('deal_rank', 'rank', 3)):
+            values = np.full(len(keys), np.nan)
+            values[known] = results[source][slots[known]]
+            values = np.round(values, digits)
+            columns[name] = [None if v != v else v for v in values.tolist()]
+        return columns
+
+    def baselines(self) -> List[Dict]:
+        """Références €/m² par quartier (et par ville), triées"""
+        results = self.results()
+        villes = {code: name for name, code in self._villes.items()}
+        quartiers = {code: name for name, code in self._quartiers.items()}
+        n_quartiers = results['n_quartiers']
+        out = []
+        for lvl, (keys, counts, table) in sorted(results['groups'].items()):
+            for key, count, row in zip(keys.tolist(), counts.tolist(),
+                                       table.tolist()):
+                if lvl == LEVEL_QUARTIER:
+                    ville, quartier = divmod(key, n_quartiers)
+                    if not quartier:
+                        continue
+                elif lvl == LEVEL_VILLE:
+                    ville, quartier = key, 0
+                    if not ville:
+                        continue
+                else:
+                    ville, quartier = 0, 0
+                out.append({
+                    'level': LEVEL_NAMES[lvl],
+                    'ville': villes.get(ville),
+                    'quartier': quartiers.get(quartier),
+                    'count': count,
+                    'reference': count >= (1 if lvl == LEVEL_GLOBAL
+                                           else self.min_group),
+                    **{f'p{p}': round(v, 1)
+                       for p, v in zip(PERCENTILES, row)},
+                })
+        levels = {name: lvl for lvl, name in LEVEL_NAMES.items()}
+        out.sort(key=lambda r: (levels[r['level']], r['ville'] or '',
+                                r['quartier'] or ''))
+        return out
+
+    def dpe_baselines(self) -> List[Dict]:
+        """Médiane €/m² par classe DPE (toutes villes confondues)"""
+        by_dpe = self.results()['by_dpe']
+        if by_dpe is None:
+            return []
+        median = PERCENTILES.index(50)
+        return [
+            {'dpe': DPE_CLASSES[code - 1] if code else None, 'count': count,
+             'p50': round(row[median], 1)}
+            for code, count, row in zip(*(a.tolist() for a in by_dpe))
+        ]
+
+
+def annonce_key(annonce: Dict) -> str:
+    """Clé d'une annonce (même repli que le détail /api/annonces/<sid>)"""
+    return annonce.get('url') or str(annonce.get('id', ''))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Prix au m² de référence par quartier et bonnes affaires'
+    )
+    parser.add_argument('--input', default='annonces_enriched.json',
+                        help='Fichier d\'annonces (JSON ou .sla)')
+    parser.add_argument('--top', type=int, default=10,
+                        help='Bonnes affaires affichées (défaut: 10)')
+    parser.add_argument('--min-group', type=int, default=MIN_GROUP,
+                        help='Annonces minimum pour qu\'un quartier serve '
+                             f'de référence (défaut: {MIN_GROUP})')
+    args = parser.parse_args(argv)
+
+    if not available():
+        parser.error("NumPy requis pour l'analyse de marché "
+                     "(pip install numpy)")
+
+    market = MarketIndex(min_group=args.min_group)
+    if is_binary(args.input):
+        records = load(args.input)
+        market.load_records(records)
+        annonces = [a.to_dict() for a in records]
+    else:
+        annonces = load_dicts(args.input)
+        market.sync(annonces)
+    print(f"📂 {len(annonces)} annonces chargées depuis {args.input}")
+
+    print("\n🏘️  €/m² par quartier (médiane, p25-p75)")
+    for row in market.baselines():
+        if row['level'] != 'quartier':
+            continue
+        flag = '' if row['reference'] else '  (trop peu d\'annonces)'
+        print(f"   {row['ville'] or '?':<28} {row['quartier']:<22} "
+              f"{row['p50']:7.1f} €/m²  [{row['p25']:.1f} - {row['p75']:.1f}]"
+              f"  {row['count']:>5} annonces{flag}")
+
+    print("\n🔋 €/m² médian par DPE")
+    for row in market.dpe_baselines():
+        print(f"   {row['dpe'] or '?'}  {row['p50']:7.1f} €/m²  "
+              f"{row['count']:>5} annonces")
+
+    keys = [annonce_key(a) for a in annonces]
+    scores = market.scores(keys)
+    ranked = sorted(
+        (i for i, deal in enumerate(scores['deal']) if deal is not None),
+        key=lambda i: -scores['deal'][i]
+    )[:args.top]
+    print(f"\n💎 {len(ranked)} meilleures affaires (vs référence locale)")
+    for i in ranked:
+        fields = list_fields(annonces[i])
+        print(f"   {scores['deal'][i]:+6.1%}  {scores['price_m2'][i]:6.1f} €/m²"
+              f"  {fields['price']} € / {fields['surface']} m²  "
+              f"{fields['quartier'] or fields['ville'] or ''}\n"
+              f"          {annonces[i].get('url')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1258 @@
+#!/usr/bin/env python3
+"""
+Benchmarks du projet (serveur webview, export, ...)
+Usage: python3 bench.py server [--clients 50] [--requests 10]
+       python3 bench.py export [--annonces 10000]
+       python3 bench.py alerts [--rules 200] [--annonces 10000]
+       python3 bench.py startup [--repeat 10]
+       python3 bench.py browser [--pages 10]
+       python3 bench.py pipeline [--fetch-ms 300] [--extract-ms 200]
+       python3 bench.py records [--annonces 100000]
+       python3 bench.py workqueue [--workers 4] [--crash 1]
+       python3 bench.py images [--images 200000]
+       python3 bench.py e2e [--sizes 1000,10000] [--output e2e.json]
+                            [--compare e2e_baseline.json]
+"""
+
+import argparse
+import http.client
+import http.server
+import importlib.util
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+WEBVIEW_DIR = os.path.join(ROOT_DIR, 'webview')
+
+
+QUARTIERS = [
+    ('Lyon 3ème (69003)', 'Part-Dieu'), ('Lyon 6ème (69006)', 'Brotteaux'),
+    ('Lyon 7ème (69007)', 'Gerland'), ('Lyon 8ème (69008)', 'Monplaisir'),
+    ('Lyon 9ème (69009)', 'Vaise'), ('Tassin-la-Demi-Lune (69160)', 'Centre'),
+]
+
+
+def make_fake_annonces(count: int):
+    """Génère une liste d'annonces enrichies factices pour les benchmarks"""
+    annonces = []
+    for i in range(1, count + 1):
+        ville, quartier = QUARTIERS[i % len(QUARTIERS)]
+        price = 800 + i % 700
+        surface = 65 + i % 40
+        annonces.append({
+            'id': i,
+            'url': f'https://www.seloger.com/annonces/locations/{i}.htm',
+            'title': 'Appartement',
+            'price': f'{price} €',
+            'location': ville,
+            'surface': f'{surface} m²',
+            'bedrooms': '3 chambres',
+            'gps_latitude': 45.75 + (i % 100) / 1000,
+            'gps_longitude': 4.85 + (i % 70) / 1000,
+            'ville': ville,
+            'quartier': quartier,
+            'dpe': 'ABCDEFG'[i % 7],
+            'ges': 'ABCDEFG'[(i * 3) % 7],
+            'images': [
+                f'https://v.seloger.com/s/crop/590x330/visuels/{i}/{n}.jpg'
+                for n in range(8)
+            ],
+            'tags': ['Balcon', 'Parking', 'Ascenseur', 'Cave'][:1 + i % 4],
+            'surface_clean': str(surface),
+            'prix_clean': str(price),
+            'chambres_clean': '3',
+            'pieces_clean': '4',
+            'etage_clean': f'{i % 6}ème',
+            'location_clean': f'{quartier}, {ville}',
+            'date_recuperation': '2026-02-17T14:30:00',
+            'date_publication': '2026-02-10',
+            'description': (
+                f'Appartement de {surface} m² situé à {quartier}. ' * 4
+                + 'Honoraires charge locataire: 12 €/m². Dépôt de garantie: '
+                'un mois de loyer. Les informations sur les risques auxquels '
+                'ce bien est exposé sont disponibles sur Géorisques.'
+            ),
+        })
+    return annonces
+
+
+def timed(fn, repeat: int = 5) -> float:
+    """Meilleur temps d'exécution de fn() en secondes"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def start_fake_upstream(payload: bytes, latency: float):
+    """Démarre un serveur amont lent qui renvoie toujours le même JSON"""
+    counter = {'hits': 0}
+
+    class UpstreamHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            counter['hits'] += 1
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):  # noqa: A002
+            pass
+
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), UpstreamHandler)
+    httpd.daemon_threads = True
+    httpd.request_queue_size = 128
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, counter
+
+
+def run_clients(port: int, path: str, clients: int, requests_per_client: int):
+    """
+    Lance N clients concurrents en keep-alive sur le serveur
+
+    Returns:
+        (durée totale, liste des latences, nombre d'erreurs)
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    barrier = threading.Barrier(clients + 1)
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        barrier.wait()
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port,
+                                                  timeout=120)
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors[0] += 1
+        conn.close()
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, latencies, errors[0]
+
+
+def load_summary(duration: float, latencies, errors: int) -> dict:
+    """Requêtes/s et percentiles de latence (ms) d'une charge"""
+    total = len(latencies)
+    latencies = sorted(latencies)
+    return {
+        'rps': total / duration if duration else 0,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0,
+        'p95_ms': (latencies[max(0, int(total * 0.95) - 1)] * 1000
+                   if latencies else 0),
+        'errors': errors,
+    }
+
+
+def print_load_result(label: str, duration: float, latencies, errors: int):
+    """Affiche requêtes/s et percentiles de latence"""
+    summary = load_summary(duration, latencies, errors)
+    print(f"   {label:<28} {summary['rps']:8.1f} req/s | "
+          f"p50 {summary['p50_ms']:7.1f} ms | p95 {summary['p95_ms']:7.1f} ms"
+          f" | {errors} erreurs")
+
+
+def bench_server(args):
+    """Charge le serveur webview avec des clients concurrents"""
+    sys.path.insert(0, WEBVIEW_DIR)
+    import server
+
+    payload = json.dumps(make_fake_annonces(args.annonces)).encode('utf-8')
+    upstream, counter = start_fake_upstream(payload, args.latency)
+    upstream_url = f'http://127.0.0.1:{upstream.server_address[1]}/annonces'
+
+    server.print = lambda *a, **k: None
+    print(f"📊 {args.clients} clients x {args.requests} requêtes, "
+          f"{args.annonces} annonces, latence amont {args.latency * 1000:.0f} ms")
+
+    # Travailler dans un répertoire temporaire pour ne pas toucher au cache
+    old_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        server.MyHTTPRequestHandler.log_message = lambda *a, **k: None
+        server.DATA_URL = upstream_url
+        try:
+            for threaded in (False, True):
+                if not threaded and args.skip_single:
+                    continue
+                label = 'multi-thread' if threaded else 'mono-thread'
+                counter['hits'] = 0
+                server.dataset = server.AnnoncesDataset()
+                httpd = server.make_server(0, threaded=threaded)
+                threading.Thread(target=httpd.serve_forever,
+                                 daemon=True).start()
+                port = httpd.server_address[1]
+                try:
+                    result = run_clients(port, args.path, args.clients,
+                                         args.requests)
+                finally:
+                    httpd.shutdown()
+                    httpd.server_close()
+                print_load_result(label, *result)
+                print(f"   {'':<28} {counter['hits']} téléchargements amont")
+        finally:
+            os.chdir(old_cwd)
+            upstream.shutdown()
+
+
+def bench_export(args):
+    """Compare le JSON complet et le payload colonnes (taille, parsing)"""
+    sys.path.insert(0, ROOT_DIR)
+    from export import encode_columns, from_columns
+
+    annonces = make_fake_annonces(args.annonces)
+    full = json.dumps(annonces, ensure_ascii=False).encode('utf-8')
+    compact = encode_columns(annonces)
+
+    t_full = timed(lambda: json.loads(full))
+    t_compact = timed(lambda: json.loads(compact))
+    t_decode = timed(lambda: from_columns(json.loads(compact)))
+    print(f"📊 {args.annonces} annonces")
+    print(f"   JSON complet     {len(full) / 1024:10.1f} Ko | "
+          f"parse {t_full * 1000:8.2f} ms")
+    print(f"   Colonnes         {len(compact) / 1024:10.1f} Ko | "
+          f"parse {t_compact * 1000:8.2f} ms | "
+          f"parse + décodage {t_decode * 1000:8.2f} ms")
+    print(f"   Gain             {len(full) / len(compact):10.1f}x | "
+          f"parse {t_full / t_compact:6.1f}x")
+
+
+def make_fake_rules(count: int):
+    """Génère des règles d'alerte variées (ville, prix, surface, mots-clés)"""
+    rules = []
+    for i in range(count):
+        ville, quartier = QUARTIERS[i % len(QUARTIERS)]
+        rule = {
+            'name': f'regle-{i}',
+            'price_min': 700 + (i * 37) % 600,
+            'surface_min': 60 + (i * 13) % 40,
+        }
+        rule['price_max'] = rule['price_min'] + 100 + i % 300
+        if i % 5:
+            rule['villes'] = [quartier if i % 2 else ville.split(' (')[0]]
+        if i % 7 == 0:
+            rule['keywords'] = ['balcon', 'parking -cave', 'ascenseur'][i % 3]
+        rules.append(rule)
+    return rules
+
+
+def rule_accepts(rule, fields, keys, terms) -> bool:
+    """Tous les critères d'une règle testés un par un (référence)"""
+    if rule['city_keys'] and not rule['city_keys'] & keys:
+        return False
+    for name in ('price', 'surface'):
+        value = fields[name]
+        lo, hi = rule.get(f'{name}_min'), rule.get(f'{name}_max')
+        if lo is None and hi is None:
+            continue
+        if value is None or (lo is not None and value < lo) or \
+                (hi is not None and value > hi):
+            return False
+    if rule.get('pieces_min') and (fields['pieces'] or 0) < rule['pieces_min']:
+        return False
+    return rule['required'] <= terms and \
+        not any(set(group) <= terms for group in rule['excluded'])
+
+
+def bench_alerts(args):
+    """Compare le moteur d'alertes indexé à un parcours de toutes les règles"""
+    sys.path.insert(0, ROOT_DIR)
+    from alerts import AlertEngine, city_keys
+    from export import list_fields
+    from search_index import document_text, fold_accents, tokenize
+
+    annonces = make_fake_annonces(args.annonces)
+    for annonce in annonces:
+        annonce['description'] += ' ' + ' '.join(annonce['tags'])
+    engine = AlertEngine(make_fake_rules(args.rules))
+
+    def run_naive():
+        matched = 0
+        for annonce in annonces:
+            fields = list_fields(annonce)
+            keys = city_keys(fields['ville'])
+            keys.add(fold_accents(fields['quartier']).strip())
+            terms = set(tokenize(' '.join(document_text(annonce))))
+            matched += sum(1 for rule in engine.rules
+                           if rule_accepts(rule, fields, keys, terms))
+        return matched
+
+    def run_indexed():
+        engine.checked = 0
+        return sum(len(engine.match(annonce)) for annonce in annonces)
+
+    start = time.perf_counter()
+    expected = run_naive()
+    t_naive = time.perf_counter() - start
+    start = time.perf_counter()
+    got = run_indexed()
+    t_indexed = time.perf_counter() - start
+
+    print(f"📊 {args.rules} règles x {args.annonces} annonces")
+    print(f"   Toutes les règles {t_naive * 1000:10.1f} ms | "
+          f"{args.rules * args.annonces} couples testés")
+    print(f"   Index             {t_indexed * 1000:10.1f} ms | "
+          f"{engine.checked} couples testés")
+    print(f"   Gain              {t_naive / t_indexed:10.1f}x | "
+          f"{got} correspondances ({'✅' if got == expected else '❌'} "
+          f"référence: {expected})")
+
+
+# Démarrages à froid mesurés par bench_startup
+STARTUP_COMMANDS = [
+    ['-c', 'pass'],
+    ['seloger.py'],
+    ['seloger.py', 'scrape', '--help'],
+    ['seloger.py', 'enrich', '--help'],
+    ['seloger.py', 'serve', '--help'],
+    ['seloger.py', 'export', '--help'],
+    ['seloger.py', 'search', '--help'],
+]
+
+
+def bench_startup(args):
+    """Temps de démarrage à froid des sous-commandes (nouveau processus)"""
+    print(f"📊 Démarrage à froid, médiane de {args.repeat} lancements")
+    baseline = None
+    for command in STARTUP_COMMANDS:
+        durations = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable] + command, cwd=ROOT_DIR,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            durations.append(time.perf_counter() - start)
+        median = statistics.median(durations) * 1000
+        if baseline is None:
+            baseline = median
+            label, extra = 'python (interpréteur seul)', ''
+        else:
+            label = ' '.join(command)
+            extra = f' | +{median - baseline:6.1f} ms'
+        status = '' if result.returncode == 0 else \
+            f' (code {result.returncode})'
+        print(f"   {label:<32} {median:7.1f} ms{extra}{status}")
+
+
+# Ressources d'une page d'annonce de test: (catégorie, nombre, taille en Ko)
+BROWSER_ASSETS = {
+    'image': (12, 150),
+    'font': (3, 80),
+    'media': (1, 1500),
+    'tiers': (6, 40),
+}
+
+
+def make_listing_page(page: int, port: int) -> bytes:
+    """
+    Page d'annonce de test: le DOM utile plus ce qu'une vraie page charge
+    autour (photos, polices, vidéo, scripts et iframe tiers). 127.0.0.1 joue
+    le site, localhost les domaines tiers.
+    """
+    site = f'http://127.0.0.1:{port}'
+    tiers = f'http://localhost:{port}'
+    # Une police par type d'élément, pour qu'elles soient toutes chargées
+    fonts = ''.join(
+        f"@font-face{{font-family:f{i};src:url({site}/fonts/f{i}.woff2)}}"
+        f"{selector}{{font-family:f{i}}}"
+        for i, selector in zip(range(BROWSER_ASSETS['font'][0]),
+                               ('body', 'h1', 'span'))
+    )
+    images = ''.join(
+        f'<img src="{site}/img/{page}-{i}.jpg">'
+        for i in range(BROWSER_ASSETS['image'][0])
+    )
+    scripts = ''.join(
+        f'<script src="{tiers}/tag/{i}.js"></script>'
+        for i in range(BROWSER_ASSETS['tiers'][0] - 1)
+    )
+    return (
+        f'<!DOCTYPE html><html><head><meta charset="utf-8"><style>{fonts}'
+        f'</style></head><body><h1>Appartement {page} '
+        f'<span class="css-1x2e3ne">Centre, Lyon 3ème (69003)</span></h1>'
+        f'<div data-testid="cdp-main-features">3 pièces 2 chambres 68 m²</div>'
+        f'{images}<video src="{site}/media/visite-{page}.mp4" preload="auto">'
+        f'</video><iframe src="{tiers}/pub.html"></iframe>{scripts}'
+        f'</body></html>'
+    ).encode('utf-8')
+
+
+def start_listing_server(latency: float):
+    """Serveur de pages de test; compte les octets servis par catégorie"""
+    served = {}
+    lock = threading.Lock()
+
+    class ListingHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            path = self.path.split('?')[0]
+            if self.headers.get('Host', '').startswith('localhost'):
+                category = 'tiers'
+            elif path.startswith('/annonce/'):
+                category = 'page'
+            else:
+                category = {'img': 'image', 'fonts': 'font',
+                            'media': 'media'}.get(path.split('/')[1])
+            if category == 'page':
+                page = int(path.rsplit('/', 1)[1].split('.')[0])
+                body = make_listing_page(page, self.server.server_port)
+            elif category:
+                time.sleep(latency)
+                body = b'\0' * (BROWSER_ASSETS[category][1] * 1024)
+            else:
+                self.send_error(404)
+                return
+            with lock:
+                count, size = served.get(category, (0, 0))
+                served[category] = (count + 1, size + len(body))
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Cache-Control', 'max-age=3600')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):  # noqa: A002
+            pass
+
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), ListingHandler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, served, lock
+
+
+def bench_browser(args):
+    """Chargement d'annonces en mode normal vs léger (Chrome headless)"""
+    try:
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+    except ImportError:
+        print("❌ selenium n'est pas installé: pip install -r requirements.txt")
+        sys.exit(1)
+    from enrich_annonces import init_driver
+
+    httpd, served, lock = start_listing_server(args.latency)
+    port = httpd.server_port
+    print(f"📊 {args.pages} pages, latence des ressources "
+          f"{args.latency * 1000:.0f} ms")
+    try:
+        for light in (False, True):
+            driver = init_driver(light=light, allowed_domains=['127.0.0.1'],
+                                 home_url=None)
+            with lock:
+                served.clear()
+            durations = []
+            try:
+                for page in range(args.pages):
+                    start = time.perf_counter()
+                    driver.get(f'http://127.0.0.1:{port}/annonce/{page}.html')
+                    WebDriverWait(driver, 30).until(
+                        EC.presence_of_element_located((By.TAG_NAME, 'h1'))
+                    )
+                    durations.append(time.perf_counter() - start)
+            finally:
+                driver.quit()
+            with lock:
+                requests = sum(count for count, _ in served.values())
+                size = sum(size for _, size in served.values())
+                detail = ', '.join(
+                    f'{category} {count}' for category, (count, _)
+                    in sorted(served.items())
+                )
+            label = 'léger' if light else 'normal'
+            print(f"   {label:<7} {statistics.median(durations) * 1000:7.0f} "
+                  f"ms/page (médiane) | {size / args.pages / 1024:7.0f} "
+                  f"Ko/page | {requests / args.pages:5.1f} requêtes/page "
+                  f"({detail})")
+    finally:
+        httpd.shutdown()
+
+
+def busy_wait(seconds: float):
+    """Occupe le CPU (extraction simulée)"""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def bench_pipeline(args):
+    """Enrichissement séquentiel vs pipeline (chargement et extraction simulés)"""
+    from pipeline import Pipeline
+
+    fetch_s, extract_s = args.fetch_ms / 1000, args.extract_ms / 1000
+
+    def fetch(item):
+        time.sleep(fetch_s)  # Le navigateur travaille, le CPU attend
+        return item
+
+    def extract(item):
+        busy_wait(extract_s)
+        return item
+
+    print(f"📊 {args.annonces} annonces, chargement {args.fetch_ms:.0f} ms, "
+          f"extraction {args.extract_ms:.0f} ms (CPU)")
+    start = time.perf_counter()
+    for item in range(args.annonces):
+        extract(fetch(item))
+    sequential = time.perf_counter() - start
+    print(f"   Séquentiel {sequential:7.2f} s | "
+          f"{args.annonces / sequential:6.2f} annonces/s")
+
+    pipeline = Pipeline(fetch, extract, fetchers=args.browsers,
+                        extractors=args.extractors)
+    start = time.perf_counter()
+    for _ in pipeline.run(range(args.annonces)):
+        pass
+    piped = time.perf_counter() - start
+    print(f"   Pipeline   {piped:7.2f} s | "
+          f"{args.annonces / piped:6.2f} annonces/s | "
+          f"gain {sequential / piped:.2f}x")
+    pipeline.print_report()
+
+
+def measure_load(fn):
+    """(durée en s, mémoire retenue en octets) du chargement fn()"""
+    import gc
+    import tracemalloc
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    duration = time.perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return duration, retained
+
+
+def bench_records(args):
+    """Dicts JSON vs enregistrements Annonce au format binaire"""
+    import record
+
+    annonces = make_fake_annonces(args.annonces)
+    records = [record.Annonce.from_dict(a) for a in annonces]
+    json_data = json.dumps(annonces, ensure_ascii=False).encode('utf-8')
+    binary_data = record.dumps(records)
+    ok = record.loads(binary_data) == records
+    descriptions = [r.description_utf8 for r in records]
+    raw_descriptions = sum(len(d) for d in descriptions if d)
+    packed_descriptions = len(record._encode_fragments(descriptions))
+    del descriptions
+
+    t_json_dump = timed(lambda: json.dumps(annonces, ensure_ascii=False),
+                        args.repeat)
+    t_bin_dump = timed(lambda: record.dumps(records), args.repeat)
+    del annonces, records
+
+    json_load, json_memory = measure_load(lambda: json.loads(json_data))
+    bin_load, bin_memory = measure_load(lambda: record.loads(binary_data))
+    json_load = min(json_load, timed(lambda: json.loads(json_data),
+                                     args.repeat))
+    bin_load = min(bin_load, timed(lambda: record.loads(binary_data),
+                                   args.repeat))
+
+    print(f"📊 {args.annonces} annonces enrichies (round-trip "
+          f"{'✅' if ok else '❌'})")
+    print(f"   {'':<18} {'JSON + dicts':>14} {'.sla + Annonce':>16} {'gain':>7}")
+    for label, a, b, unit in (
+        ('Fichier', len(json_data) / 1e6, len(binary_data) / 1e6, 'Mo'),
+        ('Mémoire', json_memory / 1e6, bin_memory / 1e6, 'Mo'),
+        ('Chargement', json_load * 1000, bin_load * 1000, 'ms'),
+        ('Écriture', t_json_dump * 1000, t_bin_dump * 1000, 'ms'),
+    ):
+        print(f"   {label:<18} {a:11.1f} {unit} {b:13.1f} {unit} "
+              f"{a / b:6.1f}x")
+    print(f"   Par annonce        {json_memory / args.annonces:11.0f} o  "
+          f"{bin_memory / args.annonces:13.0f} o")
+    print(f"   Descriptions: {raw_descriptions / 1e6:.1f} Mo bruts -> "
+          f"{packed_descriptions / 1e6:.1f} Mo (phrases dédupliquées + zlib)")
+
+
+def bench_stats(args):
+    """Facettes par bitmaps vs parcours des annonces à chaque requête"""
+    from export import list_fields
+    from facets import FacetIndex
+
+    annonces = make_fake_annonces(args.annonces)
+    rows = [list_fields(a) for a in annonces]
+    start = time.perf_counter()
+    index = FacetIndex(annonces, rows)
+    build = time.perf_counter() - start
+    params = {'ville': QUARTIERS[0][0], 'price_min': '900',
+              'price_max': '1200', 'chambres_min': '2'}
+
+    def scan():
+        # Même calcul en parcourant les lignes (facette ville seulement)
+        counts = {}
+        for row in rows:
+            if (row['price'] is not None and 900 <= row['price'] <= 1200
+                    and (row['chambres'] or 0) >= 2):
+                counts[row['ville']] = counts.get(row['ville'], 0) + 1
+        return counts
+
+    t_all = timed(index.stats, args.repeat)
+    t_filtered = timed(lambda: index.stats(params), args.repeat)
+    t_scan = timed(scan, args.repeat)
+    print(f"📊 {args.annonces} annonces, index construit en "
+          f"{build * 1000:.0f} ms (une fois par version)")
+    print(f"   Sans filtre        {t_all * 1000:8.2f} ms")
+    print(f"   Filtres actifs     {t_filtered * 1000:8.2f} ms "
+          "(5 facettes + 2 histogrammes)")
+    print(f"   Parcours naïf      {t_scan * 1000:8.2f} ms (1 facette)")
+
+
+def bench_parquet(args):
+    """JSON + parsing des chaînes vs export Parquet typé (lecture analyste)"""
+    import shutil
+
+    import parquet_export
+    import record
+    from export import list_fields
+
+    if not parquet_export.available():
+        sys.exit("❌ pyarrow requis (pip install pyarrow)")
+    annonces = make_fake_annonces(args.annonces)
+    for i, annonce in enumerate(annonces):
+        # Un an d'historique: un jour de récupération par annonce
+        annonce['date_recuperation'] = (
+            f'2025-{1 + i % 12:02d}-{1 + i % 28:02d}T14:30:00')
+    tmp = tempfile.mkdtemp(prefix='bench_parquet_')
+    try:
+        json_path = os.path.join(tmp, 'annonces.json')
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(annonces, f, ensure_ascii=False)
+        parquet_dir = os.path.join(tmp, 'parquet')
+        start = time.perf_counter()
+        parquet_export.write([record.Annonce.from_dict(a)
+                              for a in annonces], parquet_dir)
+        t_write = time.perf_counter() - start
+        del annonces
+
+        def load_json():
+            with open(json_path, 'r', encoding='utf-8') as f:
+                return [list_fields(a) for a in json.load(f)]
+
+        expression = parquet_export.build_filter(price_max=900,
+                                                 surface_min=80)
+        t_json = timed(load_json, args.repeat)
+        t_full = timed(lambda: parquet_export.read_annonces(parquet_dir),
+                       args.repeat)
+        t_columns = timed(lambda: parquet_export.read_annonces(
+            parquet_dir, columns=['prix', 'surface', 'ville', 'quartier']),
+            args.repeat)
+        t_filtered = timed(lambda: parquet_export.read_annonces(
+            parquet_dir, filter=expression), args.repeat)
+        plan = parquet_export.scan_plan(
+            parquet_export.open_dataset(parquet_dir), expression)
+        json_size = os.path.getsize(json_path)
+        parquet_size = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(parquet_dir) for name in names)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"📊 {args.annonces} annonces sur 12 mois "
+          f"(export écrit en {t_write:.2f} s)")
+    print(f"   Taille: JSON {json_size / 1e6:.1f} Mo, Parquet "
+          f"{parquet_size / 1e6:.1f} Mo")
+    print(f"   JSON + parsing des prix/surfaces  {t_json * 1000:8.0f} ms")
+    print(f"   Parquet, toutes les colonnes      {t_full * 1000:8.0f} ms")
+    print(f"   Parquet, 4 colonnes               {t_columns * 1000:8.0f} ms")
+    print(f"   Parquet, prix <= 900, surf >= 80  {t_filtered * 1000:8.0f} ms "
+          f"({plan['row_groups_read']}/{plan['row_groups']} groupes lus)")
+
+
+def bench_images(args):
+    """Recherche de photos quasi identiques: index multi-index vs balayage"""
+    import random
+
+    from image_index import DEFAULT_RADIUS, HashIndex, hamming
+
+    rng = random.Random(42)
+    hashes = [rng.getrandbits(64) for _ in range(args.images)]
+    # Requêtes: moitié photos republiées (quelques bits changés), moitié
+    # photos inconnues
+    queries = []
+    for i in range(args.queries):
+        if i % 2:
+            queries.append(rng.getrandbits(64))
+            continue
+        value = rng.choice(hashes)
+        for bit in rng.sample(range(64), rng.randint(0, DEFAULT_RADIUS)):
+            value ^= 1 << bit
+        queries.append(value)
+
+    start = time.perf_counter()
+    index = HashIndex(DEFAULT_RADIUS)
+    for n, value in enumerate(hashes):
+        index.add(value, n)
+    build = time.perf_counter() - start
+    print(f"📊 {args.images} empreintes, {args.queries} requêtes, "
+          f"rayon {DEFAULT_RADIUS} bits | index construit en {build:.2f} s")
+
+    start = time.perf_counter()
+    indexed = [sorted(n for n, _ in index.query(value)) for value in queries]
+    took_index = (time.perf_counter() - start) / len(queries)
+
+    scanned_queries = queries[:args.scan_queries]
+    start = time.perf_counter()
+    scanned = [[n for n, h in enumerate(hashes)
+                if hamming(h, value) <= DEFAULT_RADIUS]
+               for value in scanned_queries]
+    took_scan = (time.perf_counter() - start) / len(scanned_queries)
+
+    ok = indexed[:len(scanned)] == scanned
+    found = sum(bool(matches) for matches in indexed)
+    print(f"   Multi-index {took_index * 1000:8.3f} ms/requête | "
+          f"{found} requêtes avec correspondance")
+    print(f"   Balayage    {took_scan * 1000:8.3f} ms/requête | "
+          f"gain {took_scan / took_index:.0f}x | "
+          f"{'✅ mêmes résultats' if ok else '❌ résultats différents'}")
+
+
+def queue_worker(path: str, fetch_s: float, lease: float,
+                 crash_after: int = 0):
+    """
+    Worker de file simulé (processus): chargement = sleep
+
+    crash_after > 0: le processus meurt brutalement (os._exit, sans rendre
+    ses baux) en tenant sa N-ième annonce.
+    """
+    from workqueue import Heartbeat, WorkQueue, claimed, worker_name
+
+    queue = WorkQueue(path, lease_seconds=lease)
+    worker = worker_name()
+    with Heartbeat(queue, worker):
+        for n, annonce in enumerate(claimed(queue, worker), 1):
+            if crash_after and n >= crash_after:
+                os._exit(1)
+            time.sleep(fetch_s)
+            queue.complete(worker, annonce['url'],
+                           {**annonce, 'enriched': True})
+    queue.close()
+
+
+def bench_workqueue(args):
+    """
+    Workers d'enrichissement simulés sur une file SQLite partagée
+
+    Vérifie que chaque annonce est enrichie exactement une fois, y compris
+    celles tenues par un worker tué (reprises à l'expiration du bail).
+    """
+    import multiprocessing
+
+    from workqueue import DONE, WorkQueue
+
+    fetch_s = args.fetch_ms / 1000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'queue.sqlite')
+        with WorkQueue(path) as queue:
+            queue.seed(make_fake_annonces(args.annonces))
+        print(f"📊 {args.annonces} annonces, {args.workers} workers "
+              f"(dont {args.crash} tués), chargement {args.fetch_ms:.0f} ms, "
+              f"bail {args.lease:.0f} s")
+
+        start = time.perf_counter()
+        processes = []
+        for n in range(args.workers):
+            crash_after = 3 if n < args.crash else 0
+            process = multiprocessing.Process(
+                target=queue_worker,
+                args=(path, fetch_s, args.lease, crash_after))
+            process.start()
+            processes.append(process)
+        for process in processes:
+            process.join()
+        took = time.perf_counter() - start
+
+        with WorkQueue(path) as queue:
+            counts = queue.counts()
+            per_worker = queue.workers(DONE)
+            results = [a['url'] for a in queue.results()]
+            retried = queue.retried()
+        expected = [a['url'] for a in make_fake_annonces(args.annonces)]
+    ideal = args.annonces * fetch_s / max(1, args.workers - args.crash)
+    print(f"   {took:6.2f} s | {args.annonces / took:6.1f} annonces/s | "
+          f"idéal {ideal:.2f} s (+ bail des workers tués)")
+    print(f"   {counts[DONE]} enrichies | {retried} reprises (bail expiré "
+          f"ou échec) | en attente {counts['pending']} | "
+          f"en cours {counts['leased']} | échec {counts['failed']}")
+    for worker, count in per_worker.items():
+        print(f"   - {worker}: {count}")
+    ok = results == expected and len(set(results)) == len(results)
+    print(f"   {'✅' if ok else '❌'} chaque annonce enrichie exactement "
+          f"une fois, dans l'ordre de la file")
+    if not ok:
+        sys.exit(1)
+
+
+# (libellé, chemin, lourd) - les réponses lourdes sont chargées par moins
+# de clients pour que la mesure reste raisonnable à 100k annonces
+E2E_ENDPOINTS = [
+    ('annonces', '/api/annonces', True),
+    ('columns', '/api/annonces/columns', True),
+    ('changes', '/api/annonces/changes?since=0', True),
+    ('stats', '/api/stats', False),
+    ('stats filtrées', '/api/stats?ville=Lyon%203%C3%A8me%20%2869003%29'
+                       '&price_max=1200&chambres_min=2', False),
+    ('recherche', '/api/annonces?q=balcon%20lumineux', False),
+    ('market', '/api/market', False),
+    ('détail', '/api/annonces/{sid}', False),
+]
+E2E_HEAVY_CLIENTS = 4
+E2E_HEAVY_REQUESTS = 2
+BROWSER_STEPS = ('loadAnnonces', 'renderAnnonces', 'updateMapMarkers')
+# Ce que la page affiche réellement (des temps sur une page vide ou des
+# cartes "Sans titre" ne mesurent rien)
+BROWSER_CHECK = '''
+const titles = Array.from(
+    document.querySelectorAll('.annonce-card .annonce-title'),
+    e => e.textContent);
+return {annonces: annoncesList.length, cards: titles.length,
+        untitled: titles.filter(t => t === 'Sans titre').length,
+        markers: markersLayer ? markersLayer.getLayers().length : 0};
+'''
+
+
+def git_revision():
+    """(commit courant, arbre modifié ?) pour comparer les mesures"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=ROOT_DIR, capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+
+def free_port() -> int:
+    """Port TCP libre sur 127.0.0.1"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_webview(changelog: str, port: int, dist: bool,
+                  timeout: float = 30):
+    """Lance webview/server.py dans un processus et attend qu'il écoute"""
+    command = [sys.executable, os.path.join(WEBVIEW_DIR, 'server.py'),
+               '--port', str(port), '--changelog', changelog]
+    if dist:
+        command.append('--dist')
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server.py s'est arrêté ({process.returncode})")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"server.py n'écoute pas sur le port {port}")
+
+
+def first_hit(port: int, path: str):
+    """Première requête (vues matérialisées à construire): (ms, octets)"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+    try:
+        start = time.perf_counter()
+        conn.request('GET', path)
+        response = conn.getresponse()
+        body = response.read()
+        elapsed = time.perf_counter() - start
+    finally:
+        conn.close()
+    if response.status != 200:
+        raise RuntimeError(f"{path}: HTTP {response.status}")
+    return elapsed * 1000, len(body)
+
+
+def e2e_storage(annonces, tmp: str) -> dict:
+    """Écriture/lecture JSON et .sla, alimentation du journal"""
+    import record
+    from synthetic import write_changelog
+
+    result = {}
+    for label, name in (('json', 'annonces.json'), ('sla', 'annonces.sla')):
+        path = os.path.join(tmp, name)
+        result[f'{label}_write_ms'] = timed(
+            lambda: record.save(path, annonces), 3) * 1000
+        result[f'{label}_read_ms'] = timed(
+            lambda: record.load_dicts(path), 3) * 1000
+        result[f'{label}_mb'] = os.path.getsize(path) / 1e6
+        os.remove(path)
+    changelog = os.path.join(tmp, 'changes.ndjson')
+    start = time.perf_counter()
+    write_changelog(changelog, annonces)
+    result['changelog_write_ms'] = (time.perf_counter() - start) * 1000
+    result['changelog_mb'] = os.path.getsize(changelog) / 1e6
+    return result
+
+
+def e2e_server(port: int, sid: str, args) -> dict:
+    """Premier appel puis charge concurrente de chaque endpoint"""
+    result = {}
+    for label, path, heavy in E2E_ENDPOINTS:
+        path = path.format(sid=sid)
+        cold_ms, size = first_hit(port, path)
+        clients = min(args.clients, E2E_HEAVY_CLIENTS) if heavy \
+            else args.clients
+        requests = min(args.requests, E2E_HEAVY_REQUESTS) if heavy \
+            else args.requests
+        summary = load_summary(*run_clients(port, path, clients, requests))
+        summary.update(cold_ms=cold_ms, kb=size / 1024, clients=clients)
+        result[label] = summary
+    return result
+
+
+def e2e_browser(port: int, size: int) -> dict:
+    """
+    Temps des étapes de app.js (performance.measure) en Chrome headless
+
+    Chaque visite vérifie d'abord le rendu (toutes les annonces chargées,
+    titres réels, marqueurs sur la carte): RuntimeError sinon.
+    """
+    from selenium.common.exceptions import WebDriverException
+    from selenium.webdriver.support.ui import WebDriverWait
+    from enrich_annonces import init_driver
+
+    def measures(driver, name):
+        return driver.execute_script(
+            "return performance.getEntriesByName(arguments[0], 'measure')"
+            ".map(e => e.duration)", name)
+
+    def wait_for(driver, name):
+        WebDriverWait(driver, 600).until(lambda d: measures(d, name))
+
+    try:
+        driver = init_driver(light=False, home_url=None)
+    except WebDriverException as e:
+        print(f"   ⏭️  Navigateur ignoré: {e.msg}")
+        return None
+    result = {}
+    try:
+        # Visite à froid (IndexedDB vide) puis rechargement (copie locale)
+        for visit in ('cold', 'warm'):
+            start = time.perf_counter()
+            if visit == 'cold':
+                driver.get(f'http://127.0.0.1:{port}/')
+            else:
+                driver.refresh()
+            wait_for(driver, 'loadAnnonces')
+            ready = (time.perf_counter() - start) * 1000
+            driver.execute_script("switchTab('map')")
+            wait_for(driver, 'updateMapMarkers')
+            shown = driver.execute_script(BROWSER_CHECK)
+            if shown['annonces'] != size or not shown['cards'] or \
+                    shown['untitled'] or not shown['markers']:
+                raise RuntimeError(
+                    f"Rendu incorrect ({visit}): {shown['annonces']}/{size} "
+                    f"annonces, {shown['cards']} cartes dont "
+                    f"{shown['untitled']} sans titre, "
+                    f"{shown['markers']} marqueurs")
+            steps = {'ready_ms': ready, 'markers': shown['markers']}
+            for name in BROWSER_STEPS:
+                durations = measures(driver, name)
+                steps[f'{name}_ms'] = durations[0]
+                steps[f'{name}_calls'] = len(durations)
+            result[visit] = steps
+    finally:
+        driver.quit()
+    return result
+
+
+def print_e2e(size: int, stages: dict):
+    """Affiche les mesures d'une taille de jeu de données"""
+    storage = stages['storage']
+    print(f"\n📦 {size} annonces")
+    print(f"   Génération          {storage['generate_ms']:9.0f} ms")
+    for label in ('json', 'sla'):
+        print(f"   {label.upper():<5} écriture {storage[f'{label}_write_ms']:9.0f}"
+              f" ms | lecture {storage[f'{label}_read_ms']:7.0f} ms | "
+              f"{storage[f'{label}_mb']:7.1f} Mo")
+    print(f"   Journal             {storage['changelog_write_ms']:9.0f} ms | "
+          f"{storage['changelog_mb']:.1f} Mo")
+    print(f"   {'endpoint':<15} {'1er appel':>10} {'req/s':>9} {'p50':>9} "
+          f"{'p95':>9} {'taille':>10}")
+    for label, m in stages['server'].items():
+        print(f"   {label:<15} {m['cold_ms']:7.1f} ms {m['rps']:9.1f} "
+              f"{m['p50_ms']:6.1f} ms {m['p95_ms']:6.1f} ms "
+              f"{m['kb']:7.0f} Ko" + (f" ❌ {m['errors']} erreurs"
+                                      if m['errors'] else ''))
+    for visit, steps in (stages.get('browser') or {}).items():
+        detail = ' | '.join(f"{name} {steps[f'{name}_ms']:.0f} ms"
+                            for name in BROWSER_STEPS)
+        print(f"   Navigateur {visit:<5} prêt en {steps['ready_ms']:.0f} ms"
+              f" | {detail}")
+
+
+def flatten_metrics(results: dict) -> dict:
+    """Mesures à plat: 'taille/étape/...' -> valeur (pour comparer)"""
+    flat = {}
+
+    def walk(prefix, value):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                walk(f'{prefix}/{key}' if prefix else key, item)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix] = value
+
+    walk('', results['sizes'])
+    return flat
+
+
+def print_comparison(results: dict, baseline: dict):
+    """Ratios par rapport à une exécution précédente (autre commit)"""
+    print(f"\n⚖️  Comparaison avec {baseline.get('commit')} "
+          f"({baseline.get('date')})")
+    for key, label in (('platform', 'Machine'), ('cpus', 'Nombre de CPU'),
+                       ('seed', 'Graine'), ('clients', 'Nombre de clients'),
+                       ('requests', 'Nombre de requêtes')):
+        if baseline.get(key) != results.get(key):
+            print(f"   ⚠️  {label} différent(e): {baseline.get(key)} -> "
+                  f"{results.get(key)}, ratios indicatifs seulement")
+    current, previous = flatten_metrics(results), flatten_metrics(baseline)
+    for key in sorted(current.keys() & previous.keys()):
+        if not key.endswith(('_ms', 'rps', '_mb', 'kb')) or not previous[key]:
+            continue
+        ratio = current[key] / previous[key]
+        # Plus de req/s = mieux, pour le reste moins = mieux
+        better = ratio > 1 if key.endswith('rps') else ratio < 1
+        mark = '  ' if 0.9 <= ratio <= 1.1 else ('✅' if better else '❌')
+        print(f"   {mark} {key:<48} {previous[key]:10.1f} -> "
+              f"{current[key]:10.1f} ({ratio:5.2f}x)")
+
+
+def bench_e2e(args):
+    """Jeu synthétique -> stockage -> serveur -> navigateur, par taille"""
+    from export import short_id
+    from synthetic import generate
+
+    commit, dirty = git_revision()
+    results = {
+        'commit': commit,
+        'dirty': dirty,
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'seed': args.seed,
+        'clients': args.clients,
+        'requests': args.requests,
+        'sizes': {},
+    }
+    print(f"📊 Bout en bout au commit {commit}{' (modifié)' if dirty else ''}"
+          f", {args.clients} clients x {args.requests} requêtes")
+    browser = not args.skip_browser
+    if browser and importlib.util.find_spec('selenium') is None:
+        print("⏭️  Navigateur ignoré: selenium n'est pas installé")
+        browser = False
+    for size in (int(s) for s in args.sizes.split(',')):
+        start = time.perf_counter()
+        annonces = list(generate(size, args.seed))
+        generate_ms = (time.perf_counter() - start) * 1000
+        with tempfile.TemporaryDirectory() as tmp:
+            stages = {'storage': e2e_storage(annonces, tmp)}
+            stages['storage']['generate_ms'] = generate_ms
+            sid = short_id(annonces[size // 2]['url'])
+            del annonces
+            port = free_port()
+            process = start_webview(os.path.join(tmp, 'changes.ndjson'),
+                                    port, args.dist)
+            try:
+                stages['server'] = e2e_server(port, sid, args)
+                if browser:
+                    stages['browser'] = e2e_browser(port, size)
+            finally:
+                process.terminate()
+                process.wait()
+        results['sizes'][str(size)] = stages
+        print_e2e(size, stages)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Mesures sauvegardées dans {args.output}")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print_comparison(results, json.load(f))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks du projet')
+    sub = parser.add_subparsers(dest='bench', required=True)
+
+    p_server = sub.add_parser('server', help='Charge du serveur webview')
+    p_server.add_argument('--clients', type=int, default=50,
+                          help='Nombre de clients concurrents (défaut: 50)')
+    p_server.add_argument('--requests', type=int, default=10,
+                          help='Requêtes par client (défaut: 10)')
+    p_server.add_argument('--annonces', type=int, default=500,
+                          help='Taille du jeu de données (défaut: 500)')
+    p_server.add_argument('--latency', type=float, default=0.2,
+                          help='Latence simulée de l\'amont en s (défaut: 0.2)')
+    p_server.add_argument('--path', default='/api/annonces',
+                          help='Chemin à charger (défaut: /api/annonces)')
+    p_server.add_argument('--skip-single', action='store_true',
+                          help='Ne pas mesurer le mode mono-thread')
+    p_server.set_defaults(func=bench_server)
+
+    p_export = sub.add_parser('export',
+                              help='Taille et parsing du payload colonnes')
+    p_export.add_argument('--annonces', type=int, default=10000,
+                          help='Taille du jeu de données (défaut: 10000)')
+    p_export.set_defaults(func=bench_export)
+
+    p_alerts = sub.add_parser('alerts',
+                              help='Moteur d\'alertes indexé vs parcours')
+    p_alerts.add_argument('--rules', type=int, default=200,
+                          help='Nombre de règles (défaut: 200)')
+    p_alerts.add_argument('--annonces', type=int, default=10000,
+                          help='Taille du jeu de données (défaut: 10000)')
+    p_alerts.set_defaults(func=bench_alerts)
+
+    p_startup = sub.add_parser('startup',
+                               help='Démarrage à froid des sous-commandes')
+    p_startup.add_argument('--repeat', type=int, default=10,
+                           help='Lancements par commande (défaut: 10)')
+    p_startup.set_defaults(func=bench_startup)
+
+    p_browser = sub.add_parser('browser',
+                               help='Enrichissement: mode normal vs léger')
+    p_browser.add_argument('--pages', type=int, default=10,
+                           help='Pages chargées par mode (défaut: 10)')
+    p_browser.add_argument('--latency', type=float, default=0.05,
+                           help='Latence par ressource en s (défaut: 0.05)')
+    p_browser.set_defaults(func=bench_browser)
+
+    p_parquet = sub.add_parser('parquet',
+                               help='Lecture JSON vs export Parquet')
+    p_parquet.add_argument('--annonces', type=int, default=100000,
+                           help='Taille du jeu de données (défaut: 100000)')
+    p_parquet.add_argument('--repeat', type=int, default=3,
+                           help='Répétitions par mesure (défaut: 3)')
+    p_parquet.set_defaults(func=bench_parquet)
+
+    p_stats = sub.add_parser('stats',
+                             help='Facettes /api/stats: bitmaps vs parcours')
+    p_stats.add_argument('--annonces', type=int, default=100000,
+                         help='Taille du jeu de données (défaut: 100000)')
+    p_stats.add_argument('--repeat', type=int, default=5,
+                         help='Répétitions par mesure (défaut: 5)')
+    p_stats.set_defaults(func=bench_stats)
+
+    p_pipeline = sub.add_parser('pipeline',
+                                help='Enrichissement séquentiel vs pipeline')
+    p_pipeline.add_argument('--annonces', type=int, default=20,
+                            help='Nombre d\'annonces (défaut: 20)')
+    p_pipeline.add_argument('--fetch-ms', type=float, default=300,
+                            help='Durée d\'un chargement (défaut: 300)')
+    p_pipeline.add_argument('--extract-ms', type=float, default=200,
+                            help='Durée d\'une extraction (défaut: 200)')
+    p_pipeline.add_argument('--browsers', type=int, default=1,
+                            help='Navigateurs simulés (défaut: 1)')
+    p_pipeline.add_argument('--extractors', type=int, default=1,
+                            help='Workers d\'extraction (défaut: 1)')
+    p_pipeline.set_defaults(func=bench_pipeline)
+
+    p_records = sub.add_parser('records',
+                               help='Dicts JSON vs Annonce binaire (.sla)')
+    p_records.add_argument('--annonces', type=int, default=100000,
+                           help='Taille du jeu de données (défaut: 100000)')
+    p_records.add_argument('--repeat', type=int, default=3,
+                           help='Mesures de temps par format (défaut: 3)')
+    p_records.set_defaults(func=bench_records)
+
+    p_images = sub.add_parser('images',
+                              help='Index de photos: multi-index vs balayage')
+    p_images.add_argument('--images', type=int, default=200000,
+                          help='Empreintes indexées (défaut: 200000)')
+    p_images.add_argument('--queries', type=int, default=2000,
+                          help='Requêtes sur l\'index (défaut: 2000)')
+    p_images.add_argument('--scan-queries', type=int, default=20,
+                          help='Requêtes par balayage complet (défaut: 20)')
+    p_images.set_defaults(func=bench_images)
+
+    p_queue = sub.add_parser('workqueue',
+                             help='Workers sur une file SQLite partagée')
+    p_queue.add_argument('--annonces', type=int, default=200,
+                         help='Annonces dans la file (défaut: 200)')
+    p_queue.add_argument('--workers', type=int, default=4,
+                         help='Processus workers (défaut: 4)')
+    p_queue.add_argument('--crash', type=int, default=1,
+                         help='Workers tués en cours de route (défaut: 1)')
+    p_queue.add_argument('--fetch-ms', type=float, default=20,
+                         help='Durée simulée d\'un chargement (défaut: 20 ms)')
+    p_queue.add_argument('--lease', type=float, default=2,
+                         help='Bail en secondes (défaut: 2)')
+    p_queue.set_defaults(func=bench_workqueue)
+
+    p_e2e = sub.add_parser('e2e',
+                           help='Stockage, serveur et navigateur sur un jeu '
+                                'synthétique')
+    p_e2e.add_argument('--sizes', default='1000,10000,100000',
+                       help='Tailles du jeu (défaut: 1000,10000,100000)')
+    p_e2e.add_argument('--seed', type=int, default=42,
+                       help='Graine du jeu synthétique (défaut: 42)')
+    p_e2e.add_argument('--clients', type=int, default=20,
+                       help='Clients concurrents par endpoint (défaut: 20)')
+    p_e2e.add_argument('--requests', type=int, default=10,
+                       help='Requêtes par client (défaut: 10)')
+    p_e2e.add_argument('--dist', action='store_true',
+                       help='Servir les fichiers de production (--dist)')
+    p_e2e.add_argument('--skip-browser', action='store_true',
+                       help='Ne pas mesurer le visualiseur dans Chrome')
+    p_e2e.add_argument('--output',
+                       help='Fichier JSON des mesures (commit, machine...)')
+    p_e2e.add_argument('--compare',
+                       help='Mesures JSON d\'un autre commit à comparer')
+    p_e2e.set_defaults(func=bench_e2e)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
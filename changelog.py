@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Journal des modifications des annonces
+Chaque ligne NDJSON décrit une insertion, une mise à jour ou une suppression,
+numérotée par un curseur (seq) strictement croissant.
+Écrit par scrap.py et enrich_annonces.py, lu par webview/server.py.
+"""
+
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: pas de verrou inter-processus
+    fcntl = None
+
+CHANGELOG_FILE = 'annonces_changes.ndjson'
+
+# Champs qui changent à chaque exécution sans que l'annonce change
+VOLATILE_FIELDS = ('id', 'date_recuperation')
+# Sources qui ne connaissent qu'une partie des champs: leurs valeurs
+# complètent l'annonce du journal (un nouveau scraping garde l'enrichissement)
+PARTIAL_SOURCES = ('scrap',)
+
+
+def annonce_key(annonce: Dict) -> Optional[str]:
+    """Clé stable d'une annonce (les ids sont réindexés à chaque scraping)"""
+    return annonce.get('url') or None
+
+
+def changed_fields(previous: Dict, annonce: Dict) -> List[str]:
+    """Champs modifiés entre deux versions d'une annonce (hors volatils)"""
+    keys = set(previous) | set(annonce)
+    return sorted(
+        k for k in keys
+        if k not in VOLATILE_FIELDS and previous.get(k) != annonce.get(k)
+    )
+
+
+class ChangeLog:
+    """Journal append-only des modifications d'annonces"""
+
+    def __init__(self, path: str = CHANGELOG_FILE):
+        self.path = path
+        # État rejoué, mis à jour incrémentalement à chaque écriture
+        self._cursor = 0
+        self._current = {}
+        self._offset = 0
+
+    def read(self, offset: int = 0) -> Tuple[List[Dict], int]:
+        """
+        Lit les entrées ajoutées depuis un offset en octets
+
+        Args:
+            offset: Position de départ dans le fichier
+
+        Returns:
+            (entrées lues, nouvel offset). Une ligne incomplète en fin de
+            fichier (écriture en cours) n'est pas consommée.
+        """
+        if not os.path.exists(self.path):
+            return [], 0
+        entries = []
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                line = line.strip()
+                if line:
+                    entries.append(json.loads(line))
+        return entries, offset
+
+    def _catch_up(self):
+        """Rejoue les entrées écrites depuis la dernière lecture"""
+        if os.path.getsize(self.path) < self._offset:
+            # Journal recréé: repartir de zéro
+            self._cursor, self._current, self._offset = 0, {}, 0
+        entries, self._offset = self.read(self._offset)
+        for entry in entries:
+            self._cursor = entry['seq']
+            if entry['op'] == 'remove':
+                self._current.pop(entry['url'], None)
+            else:
+                self._current[entry['url']] = entry['annonce']
+
+    def state(self) -> Tuple[int, Dict[str, Dict]]:
+        """
+        Rejoue le journal
+
+        Returns:
+            (dernier curseur, dictionnaire url -> annonce courante)
+        """
+        if not os.path.exists(self.path):
+            return 0, {}
+        self._catch_up()
+        return self._cursor, dict(self._current)
+
+    def record(self, annonces: List[Dict], remove_missing: bool = False,
+               source: Optional[str] = None) -> int:
+        """
+        Enregistre les différences entre les annonces fournies et le journal
+
+        Args:
+            annonces: Annonces fraîchement scrapées ou enrichies
+            remove_missing: Marquer comme supprimées les annonces connues
+                absentes de la liste (résultat complet d'un scraping)
+            source: Origine des modifications ('scrap', 'enrich', ...).
+                Une source de PARTIAL_SOURCES ne remplace pas l'annonce
+                connue: seuls ses champs sont comparés et mis à jour
+
+        Returns:
+            Nombre de modifications enregistrées
+        """
+        with open(self.path, 'a+b') as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                # Un autre processus a pu écrire depuis notre dernière lecture
+                self._catch_up()
+                cursor, current = self._cursor, self._current
+                now = time.time()
+                lines = []
+                seen = set()
+
+                for annonce in annonces:
+                    url = annonce_key(annonce)
+                    if not url or url in seen:
+                        continue
+                    seen.add(url)
+                    previous = current.get(url)
+                    entry = {'seq': cursor + 1, 'ts': now, 'url': url}
+                    if previous is None:
+                        entry['op'] = 'insert'
+                    else:
+                        if source in PARTIAL_SOURCES:
+                            annonce = {**previous, **annonce}
+                        changed = changed_fields(previous, annonce)
+                        if not changed:
+                            continue
+                        entry['op'] = 'update'
+                        entry['changed'] = changed
+                    if source:
+                        entry['source'] = source
+                    entry['annonce'] = annonce
+                    cursor += 1
+                    lines.append(entry)
+
+                if remove_missing:
+                    for url in current:
+                        if url not in seen:
+                            cursor += 1
+                            entry = {'seq': cursor, 'ts': now, 'url': url,
+                                     'op': 'remove'}
+                            if source:
+                                entry['source'] = source
+                            lines.append(entry)
+
+                if lines:
+                    f.write(b''.join(
+                        json.dumps(line, ensure_ascii=False).encode('utf-8')
+                        + b'\n' for line in lines
+                    ))
+                    f.flush()
+                    os.fsync(f.fileno())
+                    self._catch_up()
+                return len(lines)
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def collapse_changes(entries: List[Dict], since: int) -> Dict:
+    """
+    Résume les entrées postérieures à un curseur en une seule delta
+
+    Une annonce insérée puis modifiée apparaît comme insérée; une annonce
+    insérée puis supprimée n'apparaît pas du tout.
+
+    Returns:
+        {'inserted': [...], 'updated': [...], 'removed': [urls]}
+    """
+    first_op = {}
+    last = {}
+    for entry in entries:
+        if entry['seq'] <= since:
+            continue
+        url = entry['url']
+        first_op.setdefault(url, entry['op'])
+        last[url] = entry
+
+    inserted, updated, removed = [], [], []
+    for url, entry in last.items():
+        if entry['op'] == 'remove':
+            if first_op[url] != 'insert':
+                removed.append(url)
+        elif first_op[url] == 'insert':
+            inserted.append(entry['annonce'])
+        else:
+            updated.append(entry['annonce'])
+    return {'inserted': inserted, 'updated': updated, 'removed': removed}
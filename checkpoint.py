@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Enrichissement en flux avec point de reprise
+Les annonces sont lues une à une (tableau JSON ou NDJSON), chaque résultat
+est ajouté à un fichier NDJSON de reprise (fsync par lots), puis le fichier
+est compacté vers le format de sortie habituel (tableau JSON indenté).
+La mémoire ne dépend pas de la taille de l'entrée: seules les URLs déjà
+traitées sont gardées pour la reprise.
+"""
+
+import json
+import os
+import time
+from typing import Callable, Dict, Iterator, Optional, Set
+
+from record import BINARY_SUFFIX, Annonce, dumps, is_binary, load
+
+CHECKPOINT_SUFFIX = '.checkpoint.ndjson'
+DEFAULT_FSYNC_EVERY = 20  # annonces entre deux fsync
+DEFAULT_FSYNC_INTERVAL = 5.0  # secondes max entre deux fsync
+READ_CHUNK = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\r\n'
+
+
+def iter_annonces(path: str) -> Iterator[Dict]:
+    """
+    Lit un fichier d'annonces sans le charger en entier
+
+    Accepte un tableau JSON (sortie de scrap.py), du NDJSON (un objet par
+    ligne, comme un fichier de reprise) ou le format binaire .sla (chargé
+    d'un bloc, mais bien plus compact en mémoire que du JSON).
+    """
+    if is_binary(path):
+        for annonce in load(path):
+            yield annonce.to_dict()
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = f.read(READ_CHUNK)
+        pos = len(buffer) - len(buffer.lstrip(_WHITESPACE))
+        in_array = buffer[pos:pos + 1] == '['
+        if in_array:
+            pos += 1
+        eof = False
+        while True:
+            # Séparateurs entre deux objets
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE + ',':
+                pos += 1
+            if pos < len(buffer) and in_array and buffer[pos] == ']':
+                return
+            try:
+                if pos >= len(buffer):
+                    raise ValueError
+                annonce, end = _decoder.raw_decode(buffer, pos)
+            except ValueError:
+                # Objet coupé par la fin du bloc: lire la suite
+                if eof:
+                    if buffer[pos:].strip(_WHITESPACE):
+                        raise
+                    return
+                chunk = f.read(READ_CHUNK)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            yield annonce
+            pos = end
+
+
+class Checkpoint:
+    """
+    Fichier NDJSON de reprise, en ajout seul
+
+    Chaque annonce est écrite et vidée vers le système dès qu'elle est
+    enrichie (un plantage du script ne perd rien); fsync n'est appelé que
+    toutes les `fsync_every` annonces ou `fsync_interval` secondes (une
+    coupure de courant perd au plus ce lot).
+    """
+
+    def __init__(self, path: str, fsync_every: int = DEFAULT_FSYNC_EVERY,
+                 fsync_interval: float = DEFAULT_FSYNC_INTERVAL):
+        self.path = path
+        self.fsync_every = max(1, fsync_every)
+        self.fsync_interval = fsync_interval
+        self._repair()
+        self._file = open(path, 'a', encoding='utf-8')
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self.written = 0
+
+    def _repair(self):
+        """Tronque une dernière ligne incomplète (plantage en pleine écriture)"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if not size:
+                return
+            end = size
+            while end > 0:
+                f.seek(max(0, end - READ_CHUNK))
+                block = f.read(end - max(0, end - READ_CHUNK))
+                newline = block.rfind(b'\n')
+                if newline >= 0:
+                    end = max(0, end - len(block)) + newline + 1
+                    break
+                end -= len(block)
+            if end < size:
+                f.truncate(end)
+
+    def done_urls(self) -> Set[str]:
+        """URLs déjà présentes dans le fichier de reprise"""
+        self._file.flush()
+        done = set()
+        for annonce in iter_annonces(self.path):
+            if annonce.get('url'):
+                done.add(annonce['url'])
+        return done
+
+    def append(self, annonce: Dict):
+        self._file.write(json.dumps(annonce, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self.written += 1
+        self._pending += 1
+        if (self._pending >= self.fsync_every or
+                time.monotonic() - self._last_sync >= self.fsync_interval):
+            self.sync()
+
+    def sync(self):
+        """Force l'écriture du lot en cours sur le disque"""
+        if self._pending:
+            os.fsync(self._file.fileno())
+            self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.flush()
+        self.sync()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def compact(checkpoint_path: str, output_path: str,
+            visit: Optional[Callable[[Dict], None]] = None) -> int:
+    """
+    Réécrit un fichier de reprise en tableau JSON indenté, ou au format
+    binaire si output_path finit par .sla
+
+    Une URL enrichie plusieurs fois (doublons de l'entrée) ne garde que sa
+    dernière version. La sortie est écrite dans un fichier temporaire puis
+    renommée: une sortie existante n'est jamais à moitié réécrite.
+
+    Args:
+        visit: Appelée sur chaque annonce écrite (statistiques)
+
+    Returns:
+        Nombre d'annonces écrites
+    """
+    # 1er passage: dernière ligne de chaque URL
+    last = {}
+    for line, annonce in enumerate(iter_annonces(checkpoint_path)):
+        last[annonce.get('url') or line] = line
+    keep = set(last.values())
+    del last
+
+    tmp_path = f'{output_path}.tmp'
+    if output_path.endswith(BINARY_SUFFIX):
+        # Format colonnaire: toutes les annonces en mémoire, typées
+        records = []
+        for line, annonce in enumerate(iter_annonces(checkpoint_path)):
+            if line in keep:
+                records.append(Annonce.from_dict(annonce))
+                if visit:
+                    visit(annonce)
+        with open(tmp_path, 'wb') as out:
+            out.write(dumps(records))
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, output_path)
+        return len(records)
+
+    # 2e passage: mêmes octets que json.dump(..., indent=2)
+    count = 0
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        out.write('[')
+        for line, annonce in enumerate(iter_annonces(checkpoint_path)):
+            if line not in keep:
+                continue
+            text = json.dumps(annonce, ensure_ascii=False, indent=2)
+            out.write(',\n  ' if count else '\n  ')
+            out.write(text.replace('\n', '\n  '))
+            count += 1
+            if visit:
+                visit(annonce)
+        out.write('\n]' if count else ']')
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_path, output_path)
+    return count
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Lecture du fichier de cookies, partagée par le scraper et l'enrichisseur
+Formats acceptés: dictionnaire JSON simple (extract_cookies_selenium.py),
+liste JSON exportée du navigateur, ou chaîne "name=value; name2=value2".
+"""
+
+import json
+from typing import Dict, List
+
+COOKIES_FILE = '.cookies'
+SELOGER_DOMAIN = '.seloger.com'
+
+
+def read_cookies(path: str = COOKIES_FILE) -> List[Dict]:
+    """
+    Lit un fichier de cookies
+
+    Returns:
+        Liste de cookies {'name', 'value', 'domain', 'path'}
+    """
+    with open(path, 'r') as f:
+        content = f.read()
+
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        # Chaîne de cookies (format: name=value; name2=value2)
+        data = content.strip()
+
+    if isinstance(data, dict):
+        return [
+            {'name': name, 'value': value, 'domain': SELOGER_DOMAIN,
+             'path': '/'}
+            for name, value in data.items()
+        ]
+    if isinstance(data, list):
+        # Format export navigateur
+        return [
+            {'name': cookie.get('name'), 'value': cookie.get('value'),
+             'domain': cookie.get('domain', SELOGER_DOMAIN),
+             'path': cookie.get('path', '/')}
+            for cookie in data
+        ]
+    cookies = []
+    for cookie_pair in str(data).split(';'):
+        if '=' in cookie_pair:
+            name, value = cookie_pair.strip().split('=', 1)
+            cookies.append({'name': name, 'value': value,
+                            'domain': SELOGER_DOMAIN, 'path': '/'})
+    return cookies
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Pool de navigateurs Selenium pour l'enrichissement
+Chaque navigateur est recyclé après un nombre de pages ou au-delà d'un seuil
+de mémoire (RSS de chromedriver et de ses processus Chrome). Une session
+morte (Chrome planté, fenêtre fermée) est détectée, relancée, et l'annonce
+en cours est réessayée.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from metrics import REGISTRY
+
+try:
+    import psutil
+except ImportError:  # Repli sur /proc (Linux), sinon pas de mesure mémoire
+    psutil = None
+
+DEFAULT_MAX_PAGES = 50
+DEFAULT_MAX_RSS_MB = 1500
+DEFAULT_RETRIES = 2
+
+DRIVER_RECYCLES = REGISTRY.counter(
+    'seloger_driver_recycles_total', 'Navigateurs relancés par motif'
+)
+
+# Messages Selenium/ChromeDriver d'une session inutilisable
+DEAD_SESSION_MARKERS = (
+    'invalid session id', 'session deleted', 'chrome not reachable',
+    'disconnected', 'no such window', 'target window already closed',
+    'tab crashed', 'session not created', 'connection refused',
+    'max retries exceeded',
+)
+
+
+def is_dead_session_error(error: Exception) -> bool:
+    """Indique si une exception signale un navigateur mort"""
+    if type(error).__name__ in ('InvalidSessionIdException',
+                                'NoSuchWindowException'):
+        return True
+    if isinstance(error, (ConnectionError, BrokenPipeError)):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in DEAD_SESSION_MARKERS)
+
+
+def _proc_children(pid: int):
+    """PIDs des enfants directs d'un processus (Linux, via /proc)"""
+    children = []
+    try:
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                children.extend(int(child) for child in f.read().split())
+    except OSError:
+        pass
+    return children
+
+
+def _proc_rss(pid: int) -> int:
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def process_tree_rss(pid: int) -> Optional[int]:
+    """
+    Mémoire résidente (octets) d'un processus et de ses descendants
+
+    Returns:
+        None si la mesure est impossible sur ce système
+    """
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return None
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+    if not os.path.exists(f'/proc/{pid}'):
+        return None
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        total += _proc_rss(current)
+        stack.extend(_proc_children(current))
+    return total
+
+
+class ManagedDriver:
+    """Navigateur du pool, avec son nombre de pages et sa mémoire"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+        self.started_at = time.time()
+
+    @property
+    def pid(self) -> Optional[int]:
+        """PID de chromedriver (parent des processus Chrome)"""
+        service = getattr(self.driver, 'service', None)
+        process = getattr(service, 'process', None)
+        return getattr(process, 'pid', None)
+
+    def rss(self) -> Optional[int]:
+        pid = self.pid
+        return process_tree_rss(pid) if pid else None
+
+    def is_alive(self) -> bool:
+        """Sonde la session (un appel WebDriver minimal)"""
+        try:
+            self.driver.execute_script('return 1')
+            return True
+        except Exception:
+            return False
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception:
+            # Déjà mort: rien à fermer proprement
+            pass
+
+
+class DriverPool:
+    """
+    Pool de navigateurs créés à la demande par factory()
+
+    Usage:
+        pool = DriverPool(init_driver)
+        details = pool.run(extract_details, url)
+        pool.close()
+    """
+
+    def __init__(self, factory: Callable, size: int = 1,
+                 max_pages: int = DEFAULT_MAX_PAGES,
+                 max_rss_mb: Optional[float] = DEFAULT_MAX_RSS_MB,
+                 retries: int = DEFAULT_RETRIES):
+        self.factory = factory
+        self.size = size
+        self.max_pages = max_pages
+        self.max_rss = max_rss_mb * 1024 * 1024 if max_rss_mb else None
+        self.retries = retries
+        self._idle = []
+        self._created = 0
+        self._lock = threading.Lock()
+        # Réveille les threads qui attendent un navigateur libre
+        self._cond = threading.Condition(self._lock)
+        self._all = set()
+        self.recycled = {}  # motif -> nombre de navigateurs relancés
+
+    def _new_driver(self) -> ManagedDriver:
+        managed = ManagedDriver(self.factory())
+        with self._lock:
+            self._all.add(managed)
+        return managed
+
+    def acquire(self) -> ManagedDriver:
+        """Prend un navigateur libre (en crée un si le pool n'est pas plein)"""
+        with self._cond:
+            while not self._idle and self._created >= self.size:
+                self._cond.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+        try:
+            return self._new_driver()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, managed: ManagedDriver):
+        """Rend un navigateur au pool, ou le recycle s'il a trop servi"""
+        reason = None
+        if self.max_pages and managed.pages >= self.max_pages:
+            reason = 'pages'
+        elif self.max_rss:
+            rss = managed.rss()
+            if rss is not None and rss > self.max_rss:
+                reason = 'rss'
+        if reason:
+            self.discard(managed, reason)
+            return
+        with self._cond:
+            self._idle.append(managed)
+            self._cond.notify()
+
+    def discard(self, managed: ManagedDriver, reason: str):
+        """Ferme un navigateur et libère sa place dans le pool"""
+        print(f"♻️  Navigateur relancé ({reason}, {managed.pages} pages)")
+        managed.quit()
+        with self._cond:
+            self._all.discard(managed)
+            self._created -= 1
+            self.recycled[reason] = self.recycled.get(reason, 0) + 1
+            self._cond.notify()
+        DRIVER_RECYCLES.inc(reason=reason)
+
+    def run(self, fn: Callable, *args, **kwargs):
+        """
+        Exécute fn(driver, *args) sur un navigateur du pool
+
+        Si la session est morte, le navigateur est relancé et fn réessayée
+        (au plus `retries` fois). Les autres erreurs sont propagées.
+        """
+        attempt = 0
+        while True:
+            managed = self.acquire()
+            try:
+                result = fn(managed.driver, *args, **kwargs)
+            except Exception as e:
+                dead = is_dead_session_error(e) or not managed.is_alive()
+                if not dead:
+                    managed.pages += 1
+                    self.release(managed)
+                    raise
+                self.discard(managed, 'dead')
+                attempt += 1
+                if attempt > self.retries:
+                    raise
+                print(f"    🔁 Session morte, nouvel essai "
+                      f"({attempt}/{self.retries})")
+                continue
+            managed.pages += 1
+            self.release(managed)
+            return result
+
+    def close(self):
+        """Ferme tous les navigateurs"""
+        with self._cond:
+            drivers = list(self._all)
+            self._all.clear()
+            self._idle = []
+            self._created = 0
+        for managed in drivers:
+            managed.quit()
@@ -6,24 +6,74 @@ Extrait: images, tags, DPE, GES, localisation
 
 import json
 import argparse
+import functools
+import itertools
 import time
 import random
 import os
 import re
 from datetime import datetime
-from typing import Dict
-from lxml import html
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.by import By
-from webdriver_manager.chrome import ChromeDriverManager
-
-
-def init_driver():
-    """Initialise le driver Selenium"""
+from typing import Dict, List, Optional
+
+from changelog import CHANGELOG_FILE, ChangeLog
+from checkpoint import (CHECKPOINT_SUFFIX, DEFAULT_FSYNC_EVERY, Checkpoint,
+                        compact, iter_annonces)
+from cookies import COOKIES_FILE, read_cookies
+from driver_pool import (DEFAULT_MAX_PAGES, DEFAULT_MAX_RSS_MB,
+                         DEFAULT_RETRIES, DriverPool, is_dead_session_error)
+from metrics import REGISTRY, time_stage
+from pipeline import DEFAULT_QUEUE_SIZE, Pipeline
+from workqueue import (DEFAULT_LEASE, DEFAULT_MAX_ATTEMPTS, Heartbeat,
+                       WorkQueue, claimed, print_status, worker_name)
+
+ANNONCES_ENRICHED = REGISTRY.counter(
+    'seloger_annonces_enriched_total', 'Annonces enrichies'
+)
+EXTRACT_FALLBACKS = REGISTRY.counter(
+    'seloger_extract_fallbacks_total',
+    'Extractions dans le navigateur reprises avec lxml'
+)
+
+
+SELOGER_HOME = 'https://www.seloger.com'
+
+# Mode léger: on ne lit que le DOM et les attributs src des images.
+# Domaines autorisés (et leurs sous-domaines); datadome sert le défi anti-bot
+LIGHT_ALLOWED_DOMAINS = ('seloger.com', 'datadome.co')
+# Ressources bloquées par URL (polices, médias, images)
+LIGHT_BLOCKED_PATTERNS = (
+    '*.woff*', '*.ttf*', '*.otf*', '*.eot*',
+    '*.mp4*', '*.webm*', '*.m3u8*', '*.mp3*',
+    '*.jpg*', '*.jpeg*', '*.png*', '*.gif*', '*.webp*', '*.avif*', '*.ico*',
+)
+
+
+def host_resolver_rules(allowed_domains) -> str:
+    """Règle Chrome qui rend introuvable tout domaine hors de la liste"""
+    excludes = []
+    for domain in allowed_domains:
+        excludes += [f'EXCLUDE {domain}', f'EXCLUDE *.{domain}']
+    return ', '.join(['MAP * ~NOTFOUND'] + excludes)
+
+
+def init_driver(light: bool = False,
+                allowed_domains=LIGHT_ALLOWED_DOMAINS,
+                home_url: str = SELOGER_HOME):
+    """
+    Initialise le driver Selenium
+
+    Args:
+        light: Mode léger (chargement "eager", images, médias, polices et
+            domaines tiers bloqués)
+        allowed_domains: Domaines joignables en mode léger
+        home_url: Page visitée pour poser les cookies (None = aucune)
+    """
+    # Imports différés: selenium n'est chargé que pour enrichir
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+    from webdriver_manager.chrome import ChromeDriverManager
+
     chrome_options = Options()
     chrome_options.add_argument('--headless')
     chrome_options.add_argument('--no-sandbox')
@@ -36,33 +86,282 @@ def init_driver():
         'user-agent=Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
         '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
     )
+    if light:
+        # Rendre la main dès le DOM prêt, sans attendre images et iframes
+        chrome_options.page_load_strategy = 'eager'
+        chrome_options.add_experimental_option('prefs', {
+            'profile.managed_default_content_settings.images': 2,
+            'profile.default_content_setting_values.notifications': 2,
+        })
+        chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+        chrome_options.add_argument('--autoplay-policy=user-gesture-required')
+        chrome_options.add_argument(
+            f'--host-resolver-rules={host_resolver_rules(allowed_domains)}'
+        )
     
     driver = webdriver.Chrome(
         service=Service(ChromeDriverManager().install()),
         options=chrome_options
     )
+    if light:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs',
+                               {'urls': list(LIGHT_BLOCKED_PATTERNS)})
+    
+    if not home_url:
+        return driver
     
     # Charger les cookies
-    driver.get("https://www.seloger.com")
+    driver.get(home_url)
     time.sleep(2)
     
-    if os.path.exists('.cookies'):
-        with open('.cookies', 'r') as f:
-            cookies_data = json.load(f)
-            if isinstance(cookies_data, dict):
-                for name, value in cookies_data.items():
-                    driver.add_cookie({
-                        'name': name,
-                        'value': value,
-                        'domain': '.seloger.com'
-                    })
+    if os.path.exists(COOKIES_FILE):
+        for cookie in read_cookies(COOKIES_FILE):
+            driver.add_cookie({
+                'name': cookie['name'],
+                'value': cookie['value'],
+                'domain': cookie['domain']
+            })
     
     return driver
 
 
-def extract_details(driver, url: str) -> Dict:
-    """Extrait les détails d'une annonce depuis les zones structurées"""
-    details = {
+# Nœuds lus sur une page d'annonce: clé -> XPaths essayés dans l'ordre
+# (le premier non vide l'emporte). Évalués par lxml ou dans le navigateur.
+DETAIL_XPATHS = {
+    'prix': (
+        "//h1//span[contains(@class, 'css-1ln7jbg')]//text()",
+        # Fallback: chercher dans tout le H1
+        "//h1//span[contains(text(), '€')]//text()",
+    ),
+    'carac': ("//div[contains(@class, 'css-2h4925')]//text()",),
+    'location': ("//h1//span[contains(@class, 'css-1x2e3ne')]//text()",),
+    'description': (
+        "//h2[contains(text(), 'Description') or "
+        "contains(text(), 'description')]"
+        "/following-sibling::div//text()[normalize-space()]",
+        # Essayer un autre sélecteur
+        "//div[contains(@class, 'description') or "
+        "contains(@class, 'Description')]//text()[normalize-space()]",
+    ),
+    'tags': (
+        "//h2[contains(text(), 'Caractéristiques')]"
+        "/following-sibling::ul//li//text()[normalize-space()]",
+    ),
+    'images': ("//img/@src",),
+    'dpe': (
+        "//h3[contains(text(), 'Diagnostic de Performance')]"
+        "/following-sibling::div//text()[normalize-space()]",
+    ),
+    'ges': (
+        "//h3[contains(text(), 'mission') or contains(text(), 'GES')]"
+        "/following-sibling::div//text()[normalize-space()]",
+    ),
+}
+
+# Évalue DETAIL_XPATHS dans la page et ne renvoie que les textes et
+# attributs trouvés, en une chaîne JSON compacte
+EXTRACT_SCRIPT = """
+const xpaths = arguments[0];
+const nodes = {};
+for (const [key, candidates] of Object.entries(xpaths)) {
+    nodes[key] = [];
+    for (const xpath of candidates) {
+        const result = document.evaluate(
+            xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+        );
+        for (let i = 0; i < result.snapshotLength; i++) {
+            nodes[key].push(result.snapshotItem(i).nodeValue);
+        }
+        if (nodes[key].length) break;
+    }
+}
+return JSON.stringify(nodes);
+"""
+
+
+def collect_nodes(doc) -> Dict[str, List[str]]:
+    """Textes et attributs de DETAIL_XPATHS depuis un DOM lxml"""
+    nodes = {}
+    for key, candidates in DETAIL_XPATHS.items():
+        nodes[key] = []
+        for xpath in candidates:
+            nodes[key] = [str(value) for value in doc.xpath(xpath)]
+            if nodes[key]:
+                break
+    return nodes
+
+
+def collect_nodes_in_page(driver) -> Optional[Dict[str, List[str]]]:
+    """
+    Textes et attributs de DETAIL_XPATHS évalués dans le navigateur
+
+    Évite de transférer page_source et de reconstruire le DOM avec lxml.
+
+    Returns:
+        None si le résultat est inutilisable (extraction lxml à faire)
+    """
+    payload = driver.execute_script(EXTRACT_SCRIPT, DETAIL_XPATHS)
+    try:
+        nodes = json.loads(payload) if payload else None
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(nodes, dict) or set(nodes) != set(DETAIL_XPATHS):
+        return None
+    return nodes
+
+
+def parse_details(doc, details: Dict) -> Dict:
+    """Remplit details depuis le DOM lxml d'une page d'annonce"""
+    return interpret_nodes(collect_nodes(doc), details)
+
+
+def interpret_nodes(nodes: Dict[str, List[str]], details: Dict) -> Dict:
+    """Remplit details depuis les nœuds extraits (voir DETAIL_XPATHS)"""
+    # === EXTRACTION DES DONNÉES STRUCTURÉES ===
+    
+    # 1. Extraire le prix depuis le H1
+    prix_elements = nodes['prix']
+    if prix_elements:
+        prix_text = ''.join([str(t).strip() for t in prix_elements])
+        # Extraire le montant
+        match_prix = re.search(r'(\d+(?:\s*\d+)*)\s*€', prix_text)
+        if match_prix:
+            details['prix_clean'] = match_prix.group(1).replace(' ', '')
+    
+    # 2. Extraire les caractéristiques (pièces, chambres, surface, étage)
+    carac_h1 = nodes['carac']
+    if carac_h1:
+        carac_text = ' '.join([str(t).strip() for t in carac_h1])
+        
+        # Extraire le nombre de pièces
+        match_pieces = re.search(r'(\d+)\s*pièces?', carac_text)
+        if match_pieces:
+            details['pieces_clean'] = match_pieces.group(1)
+        
+        # Extraire le nombre de chambres
+        match_chambres = re.search(r'(\d+)\s*chambres?', carac_text)
+        if match_chambres:
+            details['chambres_clean'] = match_chambres.group(1)
+        
+        # Extraire la surface
+        match_surface = re.search(r'(\d+(?:[.,]\d+)?)\s*m[²2]', carac_text)
+        if match_surface:
+            details['surface_clean'] = match_surface.group(1)
+        
+        # Extraire l'étage
+        match_etage = re.search(
+            r'(\d+(?:er|ème)?)\s*étage',
+            carac_text
+        )
+        if match_etage:
+            details['etage_clean'] = match_etage.group(1)
+    
+    # 3. Extraire le quartier/localisation depuis le H1
+    location_elements = nodes['location']
+    if location_elements:
+        location_full = ' '.join(
+            [str(t).strip() for t in location_elements]
+        )
+        details['location_clean'] = location_full
+        
+        # Parser la ville et le quartier
+        # Format attendu: "Le Grand Trou, Lyon 8ème (69008)"
+        match = re.search(
+            r'([^,]+),\s*([^(]+)\s*\((\d+)\)',
+            location_full
+        )
+        if match:
+            details['quartier'] = match.group(1).strip()
+            ville_arr = match.group(2).strip()
+            code_postal = match.group(3).strip()
+            details['ville'] = f"{ville_arr} ({code_postal})"
+        else:
+            # Fallback: essayer d'extraire au moins la ville
+            match_ville = re.search(
+                r'(Lyon\s+\d+(?:ème|er)?)',
+                location_full
+            )
+            if match_ville:
+                details['ville'] = match_ville.group(1)
+    
+    # 4. Extraire la description complète
+    description_elements = nodes['description']
+    if description_elements:
+        description_text = ' '.join([
+            str(t).strip() for t in description_elements
+            if str(t).strip()
+        ])
+        # Nettoyer le texte
+        description_text = re.sub(r'\s+', ' ', description_text)
+        description_text = description_text.replace(
+            'Voir plus', ''
+        ).strip()
+        details['description'] = description_text
+    
+    # 5. Extraire les tags/caractéristiques
+    carac_section = nodes['tags']
+    tags = []
+    for text in carac_section:
+        text = str(text).strip()
+        if text and len(text) > 1 and text not in tags:
+            if text not in [
+                'Voir', 'plus', 'moins', 'caractéristiques'
+            ]:
+                tags.append(text)
+    details['tags'] = tags[:15]
+    
+    # 6. Extraire les images
+    img_urls = nodes['images']
+    seen_images = set()
+    for img_url in img_urls:
+        if not img_url or 'placeholder' in img_url.lower():
+            continue
+        if 'icon' in img_url.lower() or 'logo' in img_url.lower():
+            continue
+        if img_url in seen_images:
+            continue
+            
+        if img_url.startswith('//'):
+            img_url = 'https:' + img_url
+        elif img_url.startswith('/'):
+            img_url = 'https://www.seloger.com' + img_url
+        
+        if any(ext in img_url.lower()
+               for ext in ['.jpg', '.jpeg', '.png', '.webp']):
+            details['images'].append(img_url)
+            seen_images.add(img_url)
+    
+    # 7. Extraire DPE
+    dpe_section = nodes['dpe']
+    for text in dpe_section:
+        text = str(text).strip()
+        if len(text) == 1 and text in 'ABCDEFG':
+            details['dpe'] = text
+            break
+        match = re.search(r'\b([A-G])\b', text)
+        if match:
+            details['dpe'] = match.group(1)
+            break
+    
+    # 8. Extraire GES
+    ges_section = nodes['ges']
+    for text in ges_section:
+        text = str(text).strip()
+        if len(text) == 1 and text in 'ABCDEFG':
+            details['ges'] = text
+            break
+        match = re.search(r'\b([A-G])\b', text)
+        if match:
+            details['ges'] = match.group(1)
+            break
+    
+    return details
+
+
+def empty_details() -> Dict:
+    """Champs d'enrichissement d'une annonce, vides"""
+    return {
         'gps_latitude': None,
         'gps_longitude': None,
         'ville': None,
@@ -81,282 +380,411 @@ def extract_details(driver, url: str) -> Dict:
         'date_publication': None,
         'description': None,
     }
-    
+
+
+def fetch_page(driver, url: str, mode: str = 'script') -> Optional[tuple]:
+    """
+    Charge une annonce dans le navigateur et récupère de quoi l'extraire
+
+    Args:
+        mode: 'script' (XPaths évalués dans le navigateur, repli sur
+            page_source en cas d'échec) ou 'lxml' (page_source)
+
+    Returns:
+        ('nodes', nœuds extraits) ou ('html', page_source), à passer à
+        extract_page; None si la page n'a pas pu être chargée
+    """
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.common.by import By
+
     try:
-        driver.get(url)
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.TAG_NAME, "h1"))
-        )
-        time.sleep(3)
+        with time_stage('selenium_load'):
+            driver.get(url)
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located((By.TAG_NAME, "h1"))
+            )
+        with time_stage('wait'):
+            time.sleep(3)
         
         # Cliquer sur "Voir plus" pour déplier la description complète
         try:
-            voir_plus_button = WebDriverWait(driver, 5).until(
-                EC.element_to_be_clickable((By.XPATH,
-                    "//button[contains(text(), 'Voir plus') or "
-                    "contains(text(), 'voir plus')]"))
-            )
-            driver.execute_script("arguments[0].scrollIntoView(true);",
-                                voir_plus_button)
-            time.sleep(0.5)
-            voir_plus_button.click()
-            time.sleep(1)
+            with time_stage('selenium_load'):
+                voir_plus_button = WebDriverWait(driver, 5).until(
+                    EC.element_to_be_clickable((By.XPATH,
+                        "//button[contains(text(), 'Voir plus') or "
+                        "contains(text(), 'voir plus')]"))
+                )
+                driver.execute_script("arguments[0].scrollIntoView(true);",
+                                    voir_plus_button)
+                time.sleep(0.5)
+                voir_plus_button.click()
+                time.sleep(1)
         except Exception:
             # Pas de bouton "Voir plus" ou déjà déplié
             pass
         
-        page_source = driver.page_source
-        doc = html.fromstring(page_source.encode('utf-8'))
-        
-        # === EXTRACTION DES DONNÉES STRUCTURÉES ===
-        
-        # 1. Extraire le prix depuis le H1
-        prix_elements = doc.xpath(
-            "//h1//span[contains(@class, 'css-1ln7jbg')]//text()"
-        )
-        if not prix_elements:
-            # Fallback: chercher dans tout le H1
-            prix_elements = doc.xpath(
-                "//h1//span[contains(text(), '€')]//text()"
-            )
+        if mode == 'script':
+            try:
+                with time_stage('script_extract'):
+                    nodes = collect_nodes_in_page(driver)
+            except Exception as e:
+                if is_dead_session_error(e):
+                    raise
+                nodes = None
+            if nodes is not None:
+                return ('nodes', nodes)
+            EXTRACT_FALLBACKS.inc()
         
-        if prix_elements:
-            prix_text = ''.join([str(t).strip() for t in prix_elements])
-            # Extraire le montant
-            match_prix = re.search(r'(\d+(?:\s*\d+)*)\s*€', prix_text)
-            if match_prix:
-                details['prix_clean'] = match_prix.group(1).replace(' ', '')
+        with time_stage('page_source'):
+            return ('html', driver.page_source)
         
-        # 2. Extraire les caractéristiques (pièces, chambres, surface, étage)
-        carac_h1 = doc.xpath(
-            "//div[contains(@class, 'css-2h4925')]//text()"
-        )
-        if carac_h1:
-            carac_text = ' '.join([str(t).strip() for t in carac_h1])
-            
-            # Extraire le nombre de pièces
-            match_pieces = re.search(r'(\d+)\s*pièces?', carac_text)
-            if match_pieces:
-                details['pieces_clean'] = match_pieces.group(1)
-            
-            # Extraire le nombre de chambres
-            match_chambres = re.search(r'(\d+)\s*chambres?', carac_text)
-            if match_chambres:
-                details['chambres_clean'] = match_chambres.group(1)
-            
-            # Extraire la surface
-            match_surface = re.search(r'(\d+(?:[.,]\d+)?)\s*m[²2]', carac_text)
-            if match_surface:
-                details['surface_clean'] = match_surface.group(1)
-            
-            # Extraire l'étage
-            match_etage = re.search(
-                r'(\d+(?:er|ème)?)\s*étage',
-                carac_text
-            )
-            if match_etage:
-                details['etage_clean'] = match_etage.group(1)
-        
-        # 3. Extraire le quartier/localisation depuis le H1
-        location_elements = doc.xpath(
-            "//h1//span[contains(@class, 'css-1x2e3ne')]//text()"
-        )
-        if location_elements:
-            location_full = ' '.join(
-                [str(t).strip() for t in location_elements]
-            )
-            details['location_clean'] = location_full
-            
-            # Parser la ville et le quartier
-            # Format attendu: "Le Grand Trou, Lyon 8ème (69008)"
-            match = re.search(
-                r'([^,]+),\s*([^(]+)\s*\((\d+)\)',
-                location_full
-            )
-            if match:
-                details['quartier'] = match.group(1).strip()
-                ville_arr = match.group(2).strip()
-                code_postal = match.group(3).strip()
-                details['ville'] = f"{ville_arr} ({code_postal})"
-            else:
-                # Fallback: essayer d'extraire au moins la ville
-                match_ville = re.search(
-                    r'(Lyon\s+\d+(?:ème|er)?)',
-                    location_full
-                )
-                if match_ville:
-                    details['ville'] = match_ville.group(1)
-        
-        # 4. Extraire la description complète
-        description_elements = doc.xpath(
-            "//h2[contains(text(), 'Description') or "
-            "contains(text(), 'description')]"
-            "/following-sibling::div//text()[normalize-space()]"
-        )
-        if not description_elements:
-            # Essayer un autre sélecteur
-            description_elements = doc.xpath(
-                "//div[contains(@class, 'description') or "
-                "contains(@class, 'Description')]//text()[normalize-space()]"
-            )
-        
-        if description_elements:
-            description_text = ' '.join([
-                str(t).strip() for t in description_elements
-                if str(t).strip()
-            ])
-            # Nettoyer le texte
-            description_text = re.sub(r'\s+', ' ', description_text)
-            description_text = description_text.replace(
-                'Voir plus', ''
-            ).strip()
-            details['description'] = description_text
-        
-        # 5. Extraire les tags/caractéristiques
-        carac_section = doc.xpath(
-            "//h2[contains(text(), 'Caractéristiques')]"
-            "/following-sibling::ul//li//text()[normalize-space()]"
-        )
-        tags = []
-        for text in carac_section:
-            text = str(text).strip()
-            if text and len(text) > 1 and text not in tags:
-                if text not in [
-                    'Voir', 'plus', 'moins', 'caractéristiques'
-                ]:
-                    tags.append(text)
-        details['tags'] = tags[:15]
-        
-        # 6. Extraire les images
-        img_urls = doc.xpath("//img/@src")
-        seen_images = set()
-        for img_url in img_urls:
-            if not img_url or 'placeholder' in img_url.lower():
-                continue
-            if 'icon' in img_url.lower() or 'logo' in img_url.lower():
-                continue
-            if img_url in seen_images:
-                continue
-                
-            if img_url.startswith('//'):
-                img_url = 'https:' + img_url
-            elif img_url.startswith('/'):
-                img_url = 'https://www.seloger.com' + img_url
-            
-            if any(ext in img_url.lower()
-                   for ext in ['.jpg', '.jpeg', '.png', '.webp']):
-                details['images'].append(img_url)
-                seen_images.add(img_url)
-        
-        # 7. Extraire DPE
-        dpe_section = doc.xpath(
-            "//h3[contains(text(), 'Diagnostic de Performance')]"
-            "/following-sibling::div//text()[normalize-space()]"
-        )
-        for text in dpe_section:
-            text = str(text).strip()
-            if len(text) == 1 and text in 'ABCDEFG':
-                details['dpe'] = text
-                break
-            match = re.search(r'\b([A-G])\b', text)
-            if match:
-                details['dpe'] = match.group(1)
-                break
-        
-        # 8. Extraire GES
-        ges_section = doc.xpath(
-            "//h3[contains(text(), 'mission') or contains(text(), 'GES')]"
-            "/following-sibling::div//text()[normalize-space()]"
-        )
-        for text in ges_section:
-            text = str(text).strip()
-            if len(text) == 1 and text in 'ABCDEFG':
-                details['ges'] = text
-                break
-            match = re.search(r'\b([A-G])\b', text)
-            if match:
-                details['ges'] = match.group(1)
-                break
+    except Exception as e:
+        if is_dead_session_error(e):
+            # Navigateur mort: le pool le relance et réessaie l'annonce
+            raise
+        print(f"    ⚠️  Erreur: {e}")
+        return None
+
+
+def extract_page(page: Optional[tuple]) -> Optional[Dict]:
+    """
+    Détails d'une annonce à partir du résultat de fetch_page
+
+    Sans navigateur: peut tourner dans un autre thread ou processus.
+
+    Returns:
+        Les détails, ou None si la page manque ou n'a pas pu être analysée
+        (des champs vides écraseraient ceux déjà connus de l'annonce)
+    """
+    if page is None:
+        return None
+    details = empty_details()
+    kind, content = page
+    try:
+        if kind == 'nodes':
+            interpret_nodes(content, details)
+            return details
         
-        return details
+        from lxml import html
+        with time_stage('dom_build'):
+            doc = html.fromstring(content.encode('utf-8'))
         
+        with time_stage('xpath_extract'):
+            parse_details(doc, details)
     except Exception as e:
         print(f"    ⚠️  Erreur: {e}")
-        return details
+        return None
+    return details
+
+
+def extract_details(driver, url: str, mode: str = 'script') -> Optional[Dict]:
+    """Extrait les détails d'une annonce depuis les zones structurées"""
+    return extract_page(fetch_page(driver, url, mode))
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description='Enrichit les annonces SeLoger'
     )
     parser.add_argument('--input', default='annonces.json',
-                       help='Fichier JSON d\'entrée')
+                       help='Fichier d\'entrée (JSON, NDJSON ou .sla)')
     parser.add_argument('--output', default='annonces_enriched.json',
-                       help='Fichier JSON de sortie')
+                       help='Fichier de sortie JSON, ou binaire si .sla')
     parser.add_argument('--limit', type=int,
                        help='Nombre max d\'annonces à traiter')
+    parser.add_argument('--checkpoint',
+                       help='Fichier NDJSON de reprise '
+                            f'(défaut: <output>{CHECKPOINT_SUFFIX})')
+    parser.add_argument('--restart', action='store_true',
+                       help='Ignorer le fichier de reprise et tout refaire')
+    parser.add_argument('--keep-checkpoint', action='store_true',
+                       help='Garder le fichier de reprise après la '
+                            'compaction')
+    parser.add_argument('--fsync-every', type=int, default=DEFAULT_FSYNC_EVERY,
+                       help='fsync du fichier de reprise toutes les N '
+                            f'annonces (défaut: {DEFAULT_FSYNC_EVERY})')
+    parser.add_argument('--quiet', '-q', action='store_true',
+                       help='Ne pas afficher le détail de chaque annonce')
+    parser.add_argument('--metrics-json',
+                       help='Écrire un résumé JSON des métriques')
+    parser.add_argument('--changelog', default=CHANGELOG_FILE,
+                       help=f'Journal des modifications (défaut: {CHANGELOG_FILE})')
+    parser.add_argument('--light', action='store_true',
+                       help='Mode léger: bloquer images, médias, polices et '
+                            'domaines tiers, chargement "eager"')
+    parser.add_argument('--allow-domain', action='append', default=[],
+                       help='Domaine joignable en mode léger, en plus de: '
+                            f'{", ".join(LIGHT_ALLOWED_DOMAINS)} '
+                            '(option répétable)')
+    parser.add_argument('--extract', choices=('script', 'lxml'),
+                       default='script',
+                       help='Extraction: XPaths évalués dans le navigateur '
+                            '(défaut, repli sur lxml) ou page_source '
+                            'reparsé avec lxml')
+    parser.add_argument('--browsers', type=int, default=1,
+                       help='Navigateurs qui chargent les pages en '
+                            'parallèle (défaut: 1)')
+    parser.add_argument('--extractors', type=int, default=1,
+                       help='Workers d\'extraction (défaut: 1)')
+    parser.add_argument('--extract-processes', action='store_true',
+                       help='Extraire dans des processus plutôt que des '
+                            'threads (utile avec --extract lxml)')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                       help='Pages en attente d\'extraction, au plus '
+                            f'(défaut: {DEFAULT_QUEUE_SIZE})')
+    parser.add_argument('--max-pages-per-driver', type=int,
+                       default=DEFAULT_MAX_PAGES,
+                       help='Relancer le navigateur après N pages '
+                            f'(défaut: {DEFAULT_MAX_PAGES}, 0 = jamais)')
+    parser.add_argument('--max-rss-mb', type=float, default=DEFAULT_MAX_RSS_MB,
+                       help='Relancer le navigateur au-delà de cette mémoire '
+                            f'(défaut: {DEFAULT_MAX_RSS_MB} Mo, 0 = jamais)')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                       help='Nouveaux essais d\'une annonce si le navigateur '
+                            f'meurt (défaut: {DEFAULT_RETRIES})')
+    parser.add_argument('--alerts',
+                       help='Fichier JSON de règles d\'alerte à tester sur '
+                            'chaque annonce enrichie')
+    parser.add_argument('--profile', nargs='?', const='profile',
+                       help='Profiler chaque étape (stats cProfile + '
+                            'flamegraph SVG) dans ce répertoire')
+    parser.add_argument('--queue',
+                       help='File de travail SQLite partagée entre '
+                            'plusieurs workers (remplace le fichier de '
+                            'reprise; --input y est ajouté s\'il existe)')
+    parser.add_argument('--lease', type=float, default=DEFAULT_LEASE,
+                       help='Bail d\'une annonce sans heartbeat, avant '
+                            f'reprise par un autre worker (défaut: '
+                            f'{DEFAULT_LEASE:.0f} s)')
+    parser.add_argument('--max-attempts', type=int,
+                       default=DEFAULT_MAX_ATTEMPTS,
+                       help='Prises max d\'une annonce dans la file avant '
+                            f'échec (défaut: {DEFAULT_MAX_ATTEMPTS})')
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    
+    if args.profile:
+        import profiling
+        profiling.enable(args.profile)
     
     print('\n╔══════════════════════════════════════════════════════════╗')
     print('║      SeLoger Enrichisseur - Détails des Annonces        ║')
     print('╚══════════════════════════════════════════════════════════╝\n')
     
-    # Charger les annonces
-    with open(args.input, 'r', encoding='utf-8') as f:
-        annonces = json.load(f)
-    
-    print(f'📂 {len(annonces)} annonces chargées depuis {args.input}')
-    
-    if args.limit:
-        annonces = annonces[:args.limit]
-        print(f'⚠️  Limitation à {len(annonces)} annonces')
+    queue = checkpoint = None
+    done = set()
+    if args.queue:
+        # File partagée: les annonces sont prises une à une avec un bail,
+        # les résultats déposés dans la base (qui sert de reprise)
+        queue = WorkQueue(args.queue, lease_seconds=args.lease,
+                          max_attempts=args.max_attempts)
+        worker = worker_name()
+        if os.path.exists(args.input):
+            annonces = iter_annonces(args.input)
+            if args.limit:
+                annonces = itertools.islice(annonces, args.limit)
+            added = queue.seed(annonces)
+            print(f'📥 {added} nouvelles annonces de {args.input} ajoutées '
+                  f'à la file')
+        print(f'🤝 Worker {worker} sur la file {args.queue}')
+        print_status(queue)
+        annonces = claimed(queue, worker)
+    else:
+        # Les annonces sont lues au fil de l'eau; les résultats vont dans
+        # le fichier de reprise, compacté vers --output à la fin
+        checkpoint_path = args.checkpoint or args.output + CHECKPOINT_SUFFIX
+        if args.restart and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        checkpoint = Checkpoint(checkpoint_path, fsync_every=args.fsync_every)
+        done = checkpoint.done_urls()
+        if done:
+            print(f'⏩ Reprise: {len(done)} annonces déjà enrichies dans '
+                  f'{checkpoint_path}')
+        
+        annonces = iter_annonces(args.input)
+        print(f'📂 Lecture en flux de {args.input}')
+        if args.limit:
+            annonces = itertools.islice(annonces, args.limit)
+            print(f'⚠️  Limitation à {args.limit} annonces')
     
     print('🌐 Initialisation du navigateur...')
-    driver = init_driver()
+    if args.light:
+        print('🪶 Mode léger: images, médias, polices et domaines tiers bloqués')
+    factory = functools.partial(
+        init_driver, light=args.light,
+        allowed_domains=LIGHT_ALLOWED_DOMAINS + tuple(args.allow_domain)
+    )
+    pool = DriverPool(factory, size=args.browsers,
+                      max_pages=args.max_pages_per_driver,
+                      max_rss_mb=args.max_rss_mb, retries=args.retries)
+    pool.release(pool.acquire())
     print('✅ Navigateur prêt\n')
-    print(f'🔍 Enrichissement de {len(annonces)} annonces...\n')
+    print('🔍 Enrichissement des annonces...\n')
     
-    enriched = []
-    for i, annonce in enumerate(annonces, 1):
-        print(f"[{i}/{len(annonces)}] {annonce.get('url', '?')}...")
-        details = extract_details(driver, annonce['url'])
-        enriched_annonce = {**annonce, **details}
-        enriched.append(enriched_annonce)
-        
-        ville = details['ville'] or 'N/A'
-        quartier = details['quartier'] or 'N/A'
-        n_images = len(details['images'])
-        n_tags = len(details['tags'])
-        desc_len = len(details['description']) if details['description'] else 0
-        print(f"    ✅ {ville} | {quartier} | {n_images} img | "
-              f"{n_tags} tags | desc: {desc_len} car.")
-        
-        if i < len(annonces):
+    # Chaque annonce enrichie est publiée tout de suite dans le journal
+    # (le serveur la pousse aux navigateurs ouverts)
+    changelog = ChangeLog(args.changelog)
+    n_changes = 0
+    # Les mots-clés des alertes portent souvent sur la description
+    engine = None
+    if args.alerts:
+        from alerts import ALERTS_STATE_FILE, AlertEngine
+        engine = AlertEngine.from_file(args.alerts, state_file=ALERTS_STATE_FILE)
+    n_alerts = 0
+
+    skipped = 0
+    # Annonces dont la page n'a pas pu être chargée ou analysée
+    n_failed = 0
+
+    def todo():
+        nonlocal skipped
+        for annonce in annonces:
+            if annonce.get('url') in done:
+                skipped += 1
+                continue
+            yield annonce
+
+    def fetch(annonce: Dict):
+        try:
+            page = pool.run(fetch_page, annonce['url'], mode=args.extract)
+        except Exception as e:
+            print(f"    ❌ Navigateur indisponible après "
+                  f"{args.retries} essais: {e}")
+            page = None
+        return page
+
+    def pause():
+        with time_stage('wait'):
             time.sleep(random.uniform(2, 4))
+
+    # Les navigateurs chargent la page suivante pendant l'extraction
+    pipeline = Pipeline(fetch, extract_page, fetchers=args.browsers,
+                        extractors=args.extractors,
+                        queue_size=args.queue_size,
+                        processes=args.extract_processes, pause=pause)
+    i = 0
+    # Seul le worker qui termine la dernière annonce de la file l'exporte
+    last_in_queue = False
+    heartbeat = Heartbeat(queue, worker).start() if queue else None
+    try:
+        for annonce, details in pipeline.run(todo()):
+            i += 1
+            if not args.quiet:
+                print(f"[{i}] {annonce.get('url', '?')}")
+            url = annonce['url']
+            if details is None:
+                # Ni reprise ni journal: l'annonce sera retentée
+                n_failed += 1
+                if queue:
+                    remaining = queue.fail(worker, url,
+                                           'page non chargée ou illisible')
+                    last_in_queue |= remaining == 0
+                    print(f"    🔁 Rendue à la file: {url}")
+                else:
+                    print(f"    🔁 Échec, retentée à la prochaine exécution: "
+                          f"{url}")
+                continue
+            enriched_annonce = {**annonce, **details}
+            if queue:
+                remaining = queue.complete(worker, url, enriched_annonce)
+                if remaining is None:
+                    # Bail expiré, annonce déjà terminée par un autre worker
+                    print(f"    ⏩ Déjà enrichie ailleurs: {url}")
+                    continue
+                last_in_queue |= remaining == 0
+            else:
+                checkpoint.append(enriched_annonce)
+            n_changes += changelog.record([enriched_annonce], source='enrich')
+            if engine:
+                # Fichier d'état réécrit une seule fois, à la fin
+                n_alerts += engine.process([enriched_annonce], save=False)
+            ANNONCES_ENRICHED.inc()
+            
+            if not args.quiet:
+                ville = details['ville'] or 'N/A'
+                quartier = details['quartier'] or 'N/A'
+                n_images = len(details['images'])
+                n_tags = len(details['tags'])
+                desc_len = len(details['description']) if details['description'] else 0
+                print(f"    ✅ {ville} | {quartier} | {n_images} img | "
+                      f"{n_tags} tags | desc: {desc_len} car.")
+            elif i % 25 == 0:
+                print(f"[{i}] annonces enrichies")
+    finally:
+        if engine:
+            engine.save_state()
+        if queue:
+            # Arrêt (ou Ctrl+C): les annonces encore tenues repartent tout
+            # de suite chez les autres, sans attendre la fin du bail
+            heartbeat.stop()
+            queue.release(worker)
     
-    driver.quit()
+    if checkpoint:
+        checkpoint.close()
+    pool.close()
+    pipeline.print_report()
+    if skipped:
+        print(f'⏩ {skipped} annonces déjà enrichies ignorées')
+    if pool.recycled:
+        print(f'♻️  Navigateurs relancés: {pool.recycled}')
     
-    with open(args.output, 'w', encoding='utf-8') as f:
-        json.dump(enriched, f, ensure_ascii=False, indent=2)
+    # Statistiques, calculées pendant la compaction
+    stats = {'gps': 0, 'dpe': 0, 'images': 0, 'tags': 0, 'description': 0}
+
+    def count_fields(annonce: Dict):
+        stats['gps'] += bool(annonce.get('gps_latitude'))
+        stats['dpe'] += bool(annonce.get('dpe'))
+        stats['images'] += bool(annonce.get('images'))
+        stats['tags'] += bool(annonce.get('tags'))
+        stats['description'] += bool(annonce.get('description'))
     
-    print(f'\n💾 {len(enriched)} annonces sauvegardées dans {args.output}')
+    # La file a pu se vider sur un bail expiré, pendant une prise
+    last_in_queue |= bool(queue and queue.emptied)
+    total = None
+    with time_stage('json_write'):
+        if not queue:
+            total = compact(checkpoint_path, args.output, visit=count_fields)
+            # Avec des échecs, la reprise reste pour les retenter
+            if not args.keep_checkpoint and not n_failed:
+                os.remove(checkpoint_path)
+        elif last_in_queue:
+            total = queue.export(args.output, visit=count_fields)
+    if queue:
+        print()
+        print_status(queue)
+        queue.close()
     
-    # Statistiques
-    stats = {
-        'gps': sum(1 for a in enriched if a['gps_latitude']),
-        'dpe': sum(1 for a in enriched if a['dpe']),
-        'images': sum(1 for a in enriched if a['images']),
-        'tags': sum(1 for a in enriched if a['tags']),
-        'description': sum(1 for a in enriched if a.get('description')),
-    }
+    if total is None:
+        print(f'\n🤝 {i} annonces traitées par ce worker; la sortie est '
+              f'écrite par celui qui termine la file (ou: python3 '
+              f'workqueue.py --queue {args.queue} export --output '
+              f'{args.output})')
+    else:
+        print(f'\n💾 {total} annonces sauvegardées dans {args.output} '
+              f'({i} enrichies par cette exécution)')
+    if n_failed and not queue:
+        print(f'⚠️  {n_failed} annonces non enrichies, absentes de la sortie; '
+              f'relancez la même commande pour les retenter '
+              f'(reprise gardée: {checkpoint_path})')
+    print(f'📝 {n_changes} modifications ajoutées à {args.changelog}')
+    if engine:
+        print(f'🔔 {n_alerts} nouvelles alertes')
+    
+    if total is not None:
+        print('\n📈 Statistiques:')
+        print(f"   - Coordonnées GPS: {stats['gps']}/{total}")
+        print(f"   - DPE: {stats['dpe']}/{total}")
+        print(f"   - Images: {stats['images']}/{total}")
+        print(f"   - Tags: {stats['tags']}/{total}")
+        print(f"   - Descriptions: {stats['description']}/{total}")
+    
+    if args.metrics_json:
+        REGISTRY.write_summary(args.metrics_json)
+        print(f'📈 Métriques écrites dans {args.metrics_json}')
     
-    print('\n📈 Statistiques:')
-    print(f"   - Coordonnées GPS: {stats['gps']}/{len(enriched)}")
-    print(f"   - DPE: {stats['dpe']}/{len(enriched)}")
-    print(f"   - Images: {stats['images']}/{len(enriched)}")
-    print(f"   - Tags: {stats['tags']}/{len(enriched)}")
-    print(f"   - Descriptions: {stats['description']}/{len(enriched)}")
+    if args.profile:
+        profiling.dump()
     
     print('\n✅ Enrichissement terminé!\n')
 
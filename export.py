@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Export compact (colonnes) des annonces pour les vues liste et carte du webview
+Les descriptions, images et tags restent dans le détail de chaque annonce,
+chargé à la demande via /api/annonces/<sid>.
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import re
+from typing import Dict, List, Optional
+
+from record import load_dicts
+
+COLUMNAR_VERSION = 1
+
+# Colonnes texte à faible cardinalité, encodées par dictionnaire
+DICT_COLUMNS = ('title', 'ville', 'quartier', 'dpe', 'ges')
+NUMERIC_COLUMNS = ('price', 'surface', 'pieces', 'chambres', 'lat', 'lng')
+
+_NUMBER_RE = re.compile(r'\d+(?:[.,]\d+)?')
+
+
+def short_id(url: str) -> str:
+    """Identifiant court et stable d'une annonce (8 caractères)"""
+    digest = hashlib.blake2b(url.encode('utf-8'), digest_size=6).digest()
+    return base64.urlsafe_b64encode(digest).decode('ascii')
+
+
+def parse_number(value) -> Optional[float]:
+    """Extrait un nombre de "1 200 €", "105,5 m²", "3 chambres", 4..."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str) and value.isdecimal():
+        # Champs *_clean ("1200"): pas besoin des expressions régulières
+        return float(value)
+    text = re.sub(r'(?<=\d)[\s  ](?=\d)', '', str(value))
+    match = _NUMBER_RE.search(text)
+    if not match:
+        return None
+    return float(match.group(0).replace(',', '.'))
+
+
+def _compact(number: Optional[float], digits: int = 0):
+    """Arrondit et convertit en int quand c'est possible (JSON plus court)"""
+    if number is None:
+        return None
+    number = round(number, digits)
+    return int(number) if number == int(number) else number
+
+
+def list_fields(annonce: Dict) -> Dict:
+    """
+    Valeurs d'une annonce utiles aux vues liste et carte
+
+    Accepte le format de scrap.py (chaînes brutes) et celui de
+    enrich_annonces.py (champs *_clean, GPS, ville/quartier).
+    """
+    images = annonce.get('images') or []
+    return {
+        'sid': short_id(annonce.get('url') or str(annonce.get('id', ''))),
+        'title': annonce.get('title') or None,
+        'price': _compact(parse_number(
+            annonce.get('prix_clean') or annonce.get('price'))),
+        'surface': _compact(parse_number(
+            annonce.get('surface_clean') or annonce.get('surface')), 1),
+        'pieces': _compact(parse_number(annonce.get('pieces_clean'))),
+        'chambres': _compact(parse_number(
+            annonce.get('chambres_clean') or annonce.get('bedrooms'))),
+        'ville': annonce.get('ville') or annonce.get('location') or None,
+        'quartier': annonce.get('quartier') or None,
+        'dpe': annonce.get('dpe') or None,
+        'ges': annonce.get('ges') or None,
+        'lat': _compact(parse_number(annonce.get('gps_latitude')), 5),
+        'lng': _compact(parse_number(annonce.get('gps_longitude')), 5),
+        'image': images[0] if images else None,
+    }
+
+
+def to_columns(annonces: List[Dict],
+               rows: Optional[List[Dict]] = None) -> Dict:
+    """
+    Convertit une liste d'annonces en payload colonnes
+
+    Args:
+        rows: list_fields() des annonces, s'ils sont déjà calculés
+
+    Returns:
+        {'version', 'count', 'columns': {nom: [valeurs]},
+         'dictionaries': {nom: [valeurs distinctes]}}
+        Les colonnes de DICT_COLUMNS contiennent des indices dans
+        le dictionnaire correspondant.
+    """
+    if rows is None:
+        rows = [list_fields(annonce) for annonce in annonces]
+    names = ('sid',) + DICT_COLUMNS + NUMERIC_COLUMNS + ('image',)
+    columns = {name: [row[name] for row in rows] for name in names}
+
+    dictionaries = {}
+    for name in DICT_COLUMNS:
+        codes = {}
+        encoded = []
+        for value in columns[name]:
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(codes)
+            encoded.append(code)
+        columns[name] = encoded
+        dictionaries[name] = list(codes)
+
+    return {
+        'version': COLUMNAR_VERSION,
+        'count': len(rows),
+        'columns': columns,
+        'dictionaries': dictionaries,
+    }
+
+
+def from_columns(payload: Dict) -> List[Dict]:
+    """Reconstruit les lignes (champs de list_fields) depuis le payload"""
+    columns = payload['columns']
+    dictionaries = payload['dictionaries']
+    decoded = {
+        name: ([dictionaries[name][code] for code in values]
+               if name in dictionaries else values)
+        for name, values in columns.items()
+    }
+    return [
+        {name: values[i] for name, values in decoded.items()}
+        for i in range(payload['count'])
+    ]
+
+
+def encode_columns(annonces: List[Dict]) -> bytes:
+    """Payload colonnes sérialisé en JSON compact"""
+    return json.dumps(
+        to_columns(annonces), ensure_ascii=False, separators=(',', ':')
+    ).encode('utf-8')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Export compact (colonnes) des annonces pour le webview'
+    )
+    parser.add_argument('--input', default='annonces_enriched.json',
+                        help='Fichier d\'entrée (JSON ou .sla)')
+    parser.add_argument('--output', default='webview/annonces_columns.json',
+                        help='Fichier de sortie')
+    args = parser.parse_args(argv)
+
+    annonces = load_dicts(args.input)
+    print(f'📂 {len(annonces)} annonces chargées depuis {args.input}')
+
+    data = encode_columns(annonces)
+    with open(args.output, 'wb') as f:
+        f.write(data)
+
+    full_size = len(json.dumps(annonces, ensure_ascii=False).encode('utf-8'))
+    print(f'💾 {len(data)} octets écrits dans {args.output} '
+          f'({full_size / max(len(data), 1):.1f}x plus petit que le JSON '
+          'complet)')
+
+
+if __name__ == '__main__':
+    main()
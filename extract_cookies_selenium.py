@@ -4,11 +4,8 @@ Script pour extraire automatiquement les cookies SeLoger avec Selenium
 L'utilisateur navigue manuellement, puis les cookies sont sauvegardés
 """
 
+import argparse
 import json
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
 
 
 class CookieExtractor:
@@ -17,6 +14,11 @@ class CookieExtractor:
     def __init__(self):
         """Initialise le navigateur Chrome"""
         print("🌐 Initialisation du navigateur Chrome...")
+        # Imports différés: selenium n'est chargé qu'au lancement du navigateur
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+        from selenium.webdriver.chrome.options import Options
+        from webdriver_manager.chrome import ChromeDriverManager
         
         # Configuration de Chrome
         chrome_options = Options()
@@ -157,8 +159,11 @@ Quand vous avez terminé :
         print("✅ Navigateur fermé")
 
 
-def main():
+def main(argv=None):
     """Fonction principale"""
+    argparse.ArgumentParser(
+        description='Extrait les cookies SeLoger avec un navigateur Chrome'
+    ).parse_args(argv)
     print("""
 ╔══════════════════════════════════════════════════════════╗
 ║     Extracteur de Cookies SeLoger avec Selenium         ║
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Facettes et histogrammes des annonces (ville, quartier, DPE, chambres,
+pièces; prix et surface)
+L'index est construit une fois par version des données. Chaque valeur de
+facette est un bitmap des annonces (entier Python: bit i = annonce i), les
+intervalles de prix et de surface se résolvent sur l'ordre trié avec des
+bitmaps de préfixe par bloc. Un filtre se réduit alors à des ET binaires
+et chaque compteur à un bit_count(), sans parcourir les annonces.
+
+Usage: python3 facets.py --input annonces_enriched.json [--ville "Lyon 3ème (69003)"]
+"""
+
+import argparse
+import bisect
+import math
+from typing import Dict, Iterable, List, Optional
+
+from export import list_fields
+from record import load_dicts
+
+HISTOGRAM_BINS = 20
+RANGE_BLOCK = 1024  # annonces par bitmap de préfixe (ordre trié)
+
+# Facette -> champ de list_fields()
+FACETS = ('ville', 'quartier', 'dpe', 'chambres', 'pieces')
+HISTOGRAMS = ('price', 'surface')
+
+# Paramètres de filtre (query string de /api/stats) -> facette ou
+# histogramme qu'ils restreignent
+FILTER_PARAMS = {
+    'ville': 'ville', 'quartier': 'quartier', 'dpe': 'dpe',
+    'chambres_min': 'chambres', 'pieces_min': 'pieces',
+    'price_min': 'price', 'price_max': 'price',
+    'surface_min': 'surface', 'surface_max': 'surface',
+}
+
+
+def _bitmap(rows: Iterable[int], size: int) -> int:
+    """Bitmap (entier) des lignes données"""
+    buffer = bytearray((size + 7) // 8)
+    for row in rows:
+        buffer[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def nice_step(span: float, bins: int = HISTOGRAM_BINS) -> float:
+    """Pas d'histogramme "rond" (1, 2, 2.5 ou 5 x 10^k) pour ~bins classes"""
+    if span <= 0:
+        return 1.0
+    raw = span / bins
+    scale = 10 ** math.floor(math.log10(raw))
+    for factor in (1, 2, 2.5, 5, 10):
+        if factor * scale >= raw:
+            return factor * scale
+    return 10 * scale
+
+
+class RangeIndex:
+    """
+    Lignes dont une valeur numérique est dans [min, max]
+
+    Les lignes sont triées par valeur; prefix[j] est le bitmap des j *
+    RANGE_BLOCK premières. Un intervalle = différence de deux préfixes,
+    corrigée ligne à ligne aux deux bords (au plus 2 blocs).
+    """
+
+    def __init__(self, values: List[Optional[float]]):
+        self.size = len(values)
+        pairs = sorted((value, row) for row, value in enumerate(values)
+                       if value is not None)
+        self.values = [value for value, _ in pairs]
+        self.rows = [row for _, row in pairs]
+        self.known = _bitmap(self.rows, self.size)
+        self.prefix = [0]
+        current = 0
+        for start in range(0, len(self.rows), RANGE_BLOCK):
+            current |= _bitmap(self.rows[start:start + RANGE_BLOCK],
+                               self.size)
+            self.prefix.append(current)
+
+    def _upto(self, position: int) -> int:
+        """Bitmap des `position` premières lignes triées"""
+        block, extra = divmod(position, RANGE_BLOCK)
+        bitmap = self.prefix[block]
+        start = block * RANGE_BLOCK
+        for row in self.rows[start:start + extra]:
+            bitmap |= 1 << row
+        return bitmap
+
+    def select(self, low: Optional[float], high: Optional[float]) -> int:
+        """Bitmap des lignes de valeur connue dans [low, high]"""
+        first = 0 if low is None else bisect.bisect_left(self.values, low)
+        last = (len(self.values) if high is None
+                else bisect.bisect_right(self.values, high))
+        if first >= last:
+            return 0
+        return self._upto(last) & ~self._upto(first)
+
+
+class FacetIndex:
+    """
+    Index de facettes d'une version des données
+
+    Usage:
+        index = FacetIndex(annonces)
+        stats = index.stats({'ville': 'Lyon 3ème (69003)', 'price_max': '900'})
+    """
+
+    def __init__(self, annonces: List[Dict],
+                 rows: Optional[List[Dict]] = None):
+        if rows is None:
+            rows = [list_fields(annonce) for annonce in annonces]
+        self.size = len(rows)
+        self.all = (1 << self.size) - 1
+        self.urls = {annonce.get('url'): row
+                     for row, annonce in enumerate(annonces)
+                     if annonce.get('url')}
+
+        # Facette -> {valeur: bitmap}
+        self.facets = {}
+        for name in FACETS:
+            by_value = {}
+            for row, fields in enumerate(rows):
+                value = fields[name]
+                if value is not None:
+                    by_value.setdefault(value, []).append(row)
+            self.facets[name] = {
+                value: _bitmap(members, self.size)
+                for value, members in by_value.items()
+            }
+
+        self.ranges = {}
+        self.histograms = {}
+        for name in HISTOGRAMS:
+            values = [fields[name] for fields in rows]
+            index = self.ranges[name] = RangeIndex(values)
+            self.histograms[name] = self._histogram_bins(index)
+
+    def _histogram_bins(self, index: RangeIndex) -> Dict:
+        """Classes de l'histogramme (bornes "rondes" entre p1 et p99)"""
+        values = index.values
+        if not values:
+            return {'start': 0, 'step': 1, 'bins': []}
+        low = values[int(0.01 * (len(values) - 1))]
+        high = values[int(0.99 * (len(values) - 1))]
+        step = nice_step(high - low)
+        start = math.floor(low / step) * step
+        count = max(1, math.ceil((high - start) / step) + 1)
+        # Valeurs hors [p1, p99] comptées dans la première / dernière classe
+        bins = []
+        for i in range(count):
+            lo = None if i == 0 else start + i * step
+            hi = None if i == count - 1 else start + (i + 1) * step
+            bitmap = index.select(lo, hi)
+            if hi is not None:
+                # Classe semi-ouverte [lo, hi[
+                bitmap &= ~index.select(hi, hi)
+            bins.append(bitmap)
+        return {'start': start, 'step': step, 'bins': bins}
+
+    def _filter(self, name: str, params: Dict[str, str]) -> int:
+        """Bitmap du filtre portant sur une facette ou un histogramme"""
+        if name in ('ville', 'quartier', 'dpe'):
+            value = params.get(name)
+            if not value:
+                return self.all
+            bitmap = 0
+            for item in value.split(','):
+                bitmap |= self.facets[name].get(item, 0)
+            return bitmap
+        if name in ('chambres', 'pieces'):
+            minimum = _number(params.get(f'{name}_min'))
+            if not minimum:
+                return self.all
+            bitmap = 0
+            for value, members in self.facets[name].items():
+                if value >= minimum:
+                    bitmap |= members
+            return bitmap
+        low = _number(params.get(f'{name}_min'))
+        high = _number(params.get(f'{name}_max'))
+        if low is None and high is None:
+            return self.all
+        index = self.ranges[name]
+        bitmap = index.select(low, high)
+        if not low:
+            # Comme le filtre du visualiseur: valeur inconnue comptée 0
+            bitmap |= self.all & ~index.known
+        return bitmap
+
+    def stats(self, params: Optional[Dict[str, str]] = None,
+              matched_urls: Optional[Iterable[str]] = None) -> Dict:
+        """
+        Facettes et histogrammes, restreints aux filtres actifs
+
+        Chaque facette est comptée avec tous les filtres sauf le sien: le
+        nombre affiché pour une option est celui qu'on obtiendrait en la
+        choisissant.
+
+        Args:
+            params: Filtres (voir FILTER_PARAMS), valeurs de query string
+            matched_urls: Annonces retenues par une recherche plein texte
+        """
+        params = params or {}
+        base = self.all
+        if matched_urls is not None:
+            base = _bitmap((self.urls[url] for url in matched_urls
+                            if url in self.urls), self.size)
+        filters = {name: self._filter(name, params)
+                   for name in FACETS + HISTOGRAMS}
+
+        def without(excluded: str) -> int:
+            mask = base
+            for name, bitmap in filters.items():
+                if name != excluded:
+                    mask &= bitmap
+            return mask
+
+        matched = without(None)
+        facets = {}
+        for name in FACETS:
+            mask = without(name)
+            counts = [(value, (bitmap & mask).bit_count())
+                      for value, bitmap in self.facets[name].items()]
+            facets[name] = [
+                {'value': value, 'count': count}
+                for value, count in sorted(counts, key=_facet_order)
+                if count
+            ]
+        histograms = {}
+        for name in HISTOGRAMS:
+            mask = without(name)
+            spec = self.histograms[name]
+            histograms[name] = {
+                'start': _compact(spec['start']),
+                'step': _compact(spec['step']),
+                'counts': [(bitmap & mask).bit_count()
+                           for bitmap in spec['bins']],
+            }
+        return {
+            'total': self.size,
+            'matched': matched.bit_count(),
+            'filters': {k: v for k, v in params.items()
+                        if k in FILTER_PARAMS},
+            'facets': facets,
+            'histograms': histograms,
+        }
+
+
+def _facet_order(item):
+    """Nombres dans l'ordre croissant, textes par effectif puis nom"""
+    value, count = item
+    if isinstance(value, (int, float)):
+        return (0, value, '')
+    return (1, -count, str(value))
+
+
+def _number(value: Optional[str]) -> Optional[float]:
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"Nombre invalide: {value}")
+
+
+def _compact(number: float):
+    return int(number) if number == int(number) else number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Facettes et histogrammes des annonces'
+    )
+    parser.add_argument('--input', default='annonces_enriched.json',
+                        help='Fichier d\'annonces (JSON ou .sla)')
+    for param in FILTER_PARAMS:
+        parser.add_argument(f'--{param.replace("_", "-")}', dest=param,
+                            help=f'Filtre {param}')
+    args = parser.parse_args(argv)
+
+    annonces = load_dicts(args.input)
+    index = FacetIndex(annonces)
+    params = {name: getattr(args, name) for name in FILTER_PARAMS
+              if getattr(args, name) is not None}
+    stats = index.stats(params)
+    print(f"📊 {stats['matched']}/{stats['total']} annonces")
+    for name, values in stats['facets'].items():
+        shown = ', '.join(f"{v['value']} ({v['count']})" for v in values[:8])
+        print(f"   {name:<9} {shown}")
+    for name, histogram in stats['histograms'].items():
+        print(f"   {name:<9} pas {histogram['step']} depuis "
+              f"{histogram['start']}: {histogram['counts']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Index des photos par empreinte perceptuelle (détection des republications)
+Une annonce republiée change d'URL et de texte mais garde ses photos.
+Chaque image (téléchargée une fois dans un cache local) est réduite à une
+empreinte dHash de 64 bits, stable au redimensionnement, à la
+recompression JPEG et aux retouches légères. Deux photos sont "les mêmes"
+si leurs empreintes diffèrent d'au plus `radius` bits.
+
+Les empreintes sont rangées dans une table multi-index: 4 tables sur des
+tranches de 16 bits. Deux empreintes à moins de `radius` bits ont au moins
+une tranche à moins de radius // 4 bits (principe des tiroirs): une
+recherche ne visite que quelques seaux, au lieu de comparer toutes les
+images.
+
+Usage: python3 image_index.py --input annonces_enriched.json
+       python3 image_index.py --input annonces_enriched.json --offline
+       python3 image_index.py --folder photos/   # doublons d'un dossier
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from checkpoint import iter_annonces
+from metrics import time_stage
+
+try:
+    from PIL import Image
+except ImportError:  # Calcul des empreintes indisponible (pip install Pillow)
+    Image = None
+
+CACHE_DIR = 'image_cache'
+HASHES_FILE = 'image_hashes.json'
+REPOSTS_FILE = 'reposts.json'
+
+HASH_SIZE = 8  # empreinte de HASH_SIZE x HASH_SIZE bits
+CHUNKS = 4  # tranches de l'index multi-index
+CHUNK_BITS = HASH_SIZE * HASH_SIZE // CHUNKS
+DEFAULT_RADIUS = 6  # bits différents (sur 64) entre deux photos identiques
+DEFAULT_MIN_SHARED = 2  # photos communes pour lier deux annonces
+# Photo retrouvée dans plus d'annonces que ça: logo, visuel d'agence
+DEFAULT_MAX_SHARED = 20
+DOWNLOAD_TIMEOUT = 15
+DEFAULT_WORKERS = 8
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp')
+
+
+def available() -> bool:
+    return Image is not None
+
+
+def _require():
+    if Image is None:
+        raise RuntimeError("Pillow requis pour les empreintes d'images "
+                           "(pip install Pillow)")
+
+
+def dhash(source) -> int:
+    """
+    Empreinte dHash d'une image (chemin ou fichier ouvert)
+
+    Image en niveaux de gris réduite à 9x8: chaque bit dit si un pixel est
+    plus clair que son voisin de droite.
+    """
+    _require()
+    with Image.open(source) as image:
+        # JPEG: décodage directement à taille réduite (bien plus rapide)
+        image.draft('L', (HASH_SIZE * 8, HASH_SIZE * 8))
+        small = image.convert('L').resize((HASH_SIZE + 1, HASH_SIZE),
+                                          Image.LANCZOS)
+        pixels = small.tobytes()
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] >
+                                    pixels[offset + col + 1])
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def informative(value: int) -> bool:
+    """Empreinte d'une vraie photo (pas d'un aplat ou d'un dégradé)"""
+    bits = value.bit_count()
+    return HASH_SIZE <= bits <= HASH_SIZE * (HASH_SIZE - 1)
+
+
+def format_hash(value: int) -> str:
+    return f'{value:016x}'
+
+
+class HashIndex:
+    """
+    Table multi-index d'empreintes de 64 bits
+
+    Usage:
+        index = HashIndex()
+        index.add(dhash('a.jpg'), 'annonce-1')
+        index.query(dhash('b.jpg'))  # [('annonce-1', 3)]
+    """
+
+    def __init__(self, radius: int = DEFAULT_RADIUS):
+        self.radius = radius
+        self.items = {}  # empreinte -> [éléments]
+        # Tranche i -> {valeur de la tranche: [empreintes]}
+        self.tables = [{} for _ in range(CHUNKS)]
+        self._masks = {}  # rayon de tranche -> masques à au plus r bits
+
+    def __len__(self) -> int:
+        return sum(len(items) for items in self.items.values())
+
+    @staticmethod
+    def _chunks(value: int) -> List[int]:
+        mask = (1 << CHUNK_BITS) - 1
+        return [(value >> (i * CHUNK_BITS)) & mask for i in range(CHUNKS)]
+
+    def _chunk_masks(self, radius: int) -> List[int]:
+        """Masques de CHUNK_BITS bits avec au plus `radius` bits à 1"""
+        masks = self._masks.get(radius)
+        if masks is None:
+            masks = [0]
+            for r in range(1, radius + 1):
+                for bits in itertools.combinations(range(CHUNK_BITS), r):
+                    masks.append(sum(1 << bit for bit in bits))
+            self._masks[radius] = masks
+        return masks
+
+    def add(self, value: int, item):
+        items = self.items.get(value)
+        if items is None:
+            items = self.items[value] = []
+            for table, chunk in zip(self.tables, self._chunks(value)):
+                table.setdefault(chunk, []).append(value)
+        items.append(item)
+
+    def query(self, value: int,
+              radius: Optional[int] = None) -> List[Tuple[object, int]]:
+        """(élément, distance) des empreintes à au plus `radius` bits"""
+        radius = self.radius if radius is None else radius
+        masks = self._chunk_masks(radius // CHUNKS)
+        seen = set()
+        found = []
+        for table, chunk in zip(self.tables, self._chunks(value)):
+            for mask in masks:
+                for candidate in table.get(chunk ^ mask, ()):
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    distance = (candidate ^ value).bit_count()
+                    if distance <= radius:
+                        found.extend((item, distance)
+                                     for item in self.items[candidate])
+        return found
+
+
+def link_annonces(hashes: Dict[str, List[int]],
+                  radius: int = DEFAULT_RADIUS,
+                  min_shared: int = DEFAULT_MIN_SHARED,
+                  max_shared: int = DEFAULT_MAX_SHARED) -> List[List[str]]:
+    """
+    Groupes d'annonces qui partagent des photos quasi identiques
+
+    Deux annonces sont liées si elles ont au moins `min_shared` photos en
+    commun (ou toutes les photos de la moins illustrée). Les groupes sont
+    les composantes connexes de ces liens.
+
+    Args:
+        hashes: Clé d'annonce -> empreintes de ses photos
+    """
+    photos = {key: {value for value in values if informative(value)}
+              for key, values in hashes.items()}
+    index = HashIndex(radius)
+    for key, values in photos.items():
+        for value in values:
+            index.add(value, key)
+
+    parent = {}
+
+    def find(key):
+        parent.setdefault(key, key)
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    for key, values in photos.items():
+        shared = Counter()
+        for value in values:
+            matches = {other for other, _ in index.query(value)
+                       if other != key}
+            if len(matches) < max_shared:
+                shared.update(matches)
+        for other, count in shared.items():
+            if count >= min(min_shared, len(values), len(photos[other])):
+                parent[find(key)] = find(other)
+
+    groups = {}
+    for key in parent:
+        groups.setdefault(find(key), []).append(key)
+    return sorted((sorted(members) for members in groups.values()
+                   if len(members) > 1), key=lambda g: (-len(g), g))
+
+
+def cache_path(cache_dir: str, url: str) -> str:
+    """Fichier du cache local pour une URL d'image"""
+    suffix = os.path.splitext(url.split('?')[0])[1].lower()
+    if suffix not in IMAGE_SUFFIXES:
+        suffix = '.img'
+    name = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, name[:2], name + suffix)
+
+
+def fetch_image(session, url: str, cache_dir: str,
+                offline: bool = False) -> Optional[str]:
+    """Chemin de l'image en cache, téléchargée si besoin (None si absente)"""
+    path = cache_path(cache_dir, url)
+    if os.path.exists(path):
+        return path
+    if offline:
+        return None
+    try:
+        response = session.get(url, timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+    except OSError as e:  # requests.RequestException en hérite
+        print(f"    ⚠️  {url}: {e}")
+        return None
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(response.content)
+    os.replace(tmp_path, path)
+    return path
+
+
+def hash_file(path: str) -> Optional[int]:
+    try:
+        return dhash(path)
+    except (OSError, ValueError) as e:  # Fichier tronqué ou illisible
+        print(f"    ⚠️  {path}: {e}")
+        return None
+
+
+def image_session():
+    """Session HTTP aux en-têtes de navigateur pour télécharger les images"""
+    import requests
+
+    from scrap import get_realistic_headers
+
+    session = requests.Session()
+    headers = get_realistic_headers()
+    headers['Accept'] = 'image/avif,image/webp,image/*,*/*;q=0.8'
+    headers['Sec-Fetch-Dest'] = 'image'
+    session.headers.update(headers)
+    return session
+
+
+def hash_urls(urls: Iterable[str], known: Dict[str, int],
+              cache_dir: str = CACHE_DIR, offline: bool = False,
+              workers: int = DEFAULT_WORKERS) -> Dict[str, int]:
+    """
+    Empreintes des images pas encore connues (téléchargement et calcul en
+    parallèle)
+
+    Returns:
+        URL -> empreinte, pour les images nouvellement calculées
+    """
+    _require()
+    todo = sorted({url for url in urls if url not in known})
+    if not todo:
+        return {}
+    session = None if offline else image_session()
+
+    def compute(url: str) -> Tuple[str, Optional[int]]:
+        with time_stage('image_fetch'):
+            path = fetch_image(session, url, cache_dir, offline)
+        if path is None:
+            return url, None
+        with time_stage('image_hash'):
+            return url, hash_file(path)
+
+    computed = {}
+    with ThreadPoolExecutor(max(1, workers)) as executor:
+        for i, (url, value) in enumerate(executor.map(compute, todo), 1):
+            if value is not None:
+                computed[url] = value
+            if i % 500 == 0:
+                print(f"   {i}/{len(todo)} images")
+    return computed
+
+
+def hash_folder(folder: str) -> Dict[str, int]:
+    """Chemin relatif -> empreinte, pour chaque image d'un dossier"""
+    _require()
+    hashes = {}
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            if not name.lower().endswith(IMAGE_SUFFIXES):
+                continue
+            path = os.path.join(root, name)
+            value = hash_file(path)
+            if value is not None:
+                hashes[os.path.relpath(path, folder)] = value
+    return hashes
+
+
+def load_hashes(path: str = HASHES_FILE) -> Dict[str, int]:
+    """Empreintes déjà calculées (URL -> entier)"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return {url: int(value, 16) for url, value in json.load(f).items()}
+
+
+def save_hashes(hashes: Dict[str, int], path: str = HASHES_FILE):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({url: format_hash(value)
+                   for url, value in sorted(hashes.items())}, f)
+    os.replace(tmp_path, path)
+
+
+def annonce_summary(annonce: Dict) -> Dict:
+    return {key: annonce.get(key)
+            for key in ('url', 'title', 'price', 'location', 'surface')}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Détection des annonces republiées par leurs photos'
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--input', default='annonces_enriched.json',
+                        help='Annonces enrichies (JSON, NDJSON ou .sla)')
+    source.add_argument('--folder',
+                        help='Grouper les images quasi identiques d\'un '
+                             'dossier (sans annonces)')
+    parser.add_argument('--cache', default=CACHE_DIR,
+                        help=f'Cache local des images (défaut: {CACHE_DIR})')
+    parser.add_argument('--hashes', default=HASHES_FILE,
+                        help='Empreintes déjà calculées '
+                             f'(défaut: {HASHES_FILE})')
+    parser.add_argument('--offline', action='store_true',
+                        help='Ne rien télécharger: seulement les images du '
+                             'cache')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help='Téléchargements en parallèle '
+                             f'(défaut: {DEFAULT_WORKERS})')
+    parser.add_argument('--radius', type=int, default=DEFAULT_RADIUS,
+                        help='Bits différents tolérés entre deux photos '
+                             f'(défaut: {DEFAULT_RADIUS})')
+    parser.add_argument('--min-shared', type=int, default=DEFAULT_MIN_SHARED,
+                        help='Photos communes pour lier deux annonces '
+                             f'(défaut: {DEFAULT_MIN_SHARED})')
+    parser.add_argument('--max-shared', type=int, default=DEFAULT_MAX_SHARED,
+                        help='Photo ignorée au-delà de N annonces (logo) '
+                             f'(défaut: {DEFAULT_MAX_SHARED})')
+    parser.add_argument('--output', default=REPOSTS_FILE,
+                        help=f'Groupes d\'annonces liées (défaut: {REPOSTS_FILE})')
+    args = parser.parse_args(argv)
+
+    if not available():
+        parser.error("Pillow requis pour les empreintes d'images "
+                     "(pip install Pillow)")
+
+    if args.folder:
+        start = time.perf_counter()
+        hashes = hash_folder(args.folder)
+        groups = link_annonces({path: [value]
+                                for path, value in hashes.items()},
+                               radius=args.radius, min_shared=1,
+                               max_shared=len(hashes) + 1)
+        print(f"🖼️  {len(hashes)} images dans {args.folder} en "
+              f"{time.perf_counter() - start:.2f} s, "
+              f"{len(groups)} groupes de quasi-doublons")
+        for group in groups:
+            print(f"   - {', '.join(group)}")
+        return
+
+    annonces = {}
+    for annonce in iter_annonces(args.input):
+        if annonce.get('url') and annonce.get('images'):
+            annonces[annonce['url']] = annonce
+    urls = {url for annonce in annonces.values() for url in annonce['images']}
+    print(f"📂 {len(annonces)} annonces avec photos, {len(urls)} images")
+
+    known = load_hashes(args.hashes)
+    start = time.perf_counter()
+    computed = hash_urls(urls, known, cache_dir=args.cache,
+                         offline=args.offline, workers=args.workers)
+    if computed:
+        known.update(computed)
+        save_hashes(known, args.hashes)
+    missing = sum(url not in known for url in urls)
+    print(f"🔑 {len(computed)} nouvelles empreintes en "
+          f"{time.perf_counter() - start:.1f} s "
+          f"({missing} images indisponibles)")
+
+    start = time.perf_counter()
+    groups = link_annonces(
+        {url: [known[image] for image in annonce['images'] if image in known]
+         for url, annonce in annonces.items()},
+        radius=args.radius, min_shared=args.min_shared,
+        max_shared=args.max_shared,
+    )
+    print(f"🔗 {len(groups)} groupes d'annonces aux photos communes "
+          f"({sum(map(len, groups))} annonces) en "
+          f"{time.perf_counter() - start:.2f} s")
+    for group in groups[:10]:
+        print("   - " + ' | '.join(
+            f"{annonces[url].get('price') or '?'} "
+            f"{annonces[url].get('location') or ''}".strip()
+            for url in group))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump([[annonce_summary(annonces[url]) for url in group]
+                   for group in groups], f, ensure_ascii=False, indent=2)
+    print(f"💾 Groupes écrits dans {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Métriques légères (compteurs et histogrammes de latence) sans dépendance
+Exportables au format texte Prometheus (webview/server.py, /metrics)
+ou en résumé JSON de fin d'exécution (scrap.py, enrich_annonces.py).
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Optional
+
+STAGE_METRIC = 'seloger_stage_seconds'
+
+# Bornes des histogrammes de latence, en secondes
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels: Dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: tuple, extra: Optional[Dict] = None) -> str:
+    items = list(key) + list((extra or {}).items())
+    if not items:
+        return ''
+    inner = ','.join(
+        '{}="{}"'.format(
+            k, str(v).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n')
+        )
+        for k, v in items
+    )
+    return '{' + inner + '}'
+
+
+class Counter:
+    """Compteur monotone, éventuellement étiqueté"""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def prometheus_lines(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} counter'
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                yield f'{self.name}{_format_labels(key)} {value}'
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {_format_labels(key) or 'total': value
+                    for key, value in sorted(self._values.items())}
+
+
+class Histogram:
+    """Histogramme de durées (somme, nombre, répartition par bornes)"""
+
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    'counts': [0] * len(self.buckets), 'sum': 0.0,
+                    'count': 0, 'max': 0.0,
+                }
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+            series['max'] = max(series['max'], value)
+
+    def prometheus_lines(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series['counts']):
+                    cumulative += count
+                    labels = _format_labels(key, {'le': bound})
+                    yield f'{self.name}_bucket{labels} {cumulative}'
+                labels = _format_labels(key, {'le': '+Inf'})
+                yield f'{self.name}_bucket{labels} {series["count"]}'
+                yield f'{self.name}_sum{_format_labels(key)} {series["sum"]}'
+                yield (f'{self.name}_count{_format_labels(key)} '
+                       f'{series["count"]}')
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {
+                _format_labels(key) or 'total': {
+                    'count': series['count'],
+                    'total_s': round(series['sum'], 6),
+                    'mean_s': round(series['sum'] / series['count'], 6),
+                    'max_s': round(series['max'], 6),
+                }
+                for key, series in sorted(self._series.items())
+            }
+
+
+class MetricsRegistry:
+    """Ensemble des métriques d'un processus"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        # Appelé avec le nom de l'étape, retourne un context manager
+        # (utilisé par profiling.py pour profiler chaque étape)
+        self.stage_hook = None
+
+    def _get(self, cls, name: str, help_text: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            return metric
+
+    def counter(self, name: str, help_text: str = '') -> Counter:
+        return self._get(Counter, name, help_text)
+
+    def histogram(self, name: str, help_text: str = '',
+                  buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    @contextmanager
+    def time_stage(self, stage: str):
+        """Mesure la durée d'une étape du pipeline (histogramme par étape)"""
+        hook = self.stage_hook(stage) if self.stage_hook else nullcontext()
+        start = time.perf_counter()
+        try:
+            with hook:
+                yield
+        finally:
+            self.histogram(
+                STAGE_METRIC, 'Durée des étapes du pipeline'
+            ).observe(time.perf_counter() - start, stage=stage)
+
+    def to_prometheus(self) -> str:
+        """Toutes les métriques au format texte Prometheus"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.prometheus_lines())
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> Dict:
+        """Résumé JSON de l'exécution"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            'started_at': self.started_at,
+            'duration_s': round(time.time() - self.started_at, 3),
+            'metrics': {metric.name: metric.summary() for metric in metrics},
+        }
+
+    def write_summary(self, path: str):
+        """Écrit le résumé JSON dans un fichier"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+
+
+REGISTRY = MetricsRegistry()
+
+
+def time_stage(stage: str):
+    """Raccourci: REGISTRY.time_stage(stage)"""
+    return REGISTRY.time_stage(stage)
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Export Parquet des annonces pour l'analyse (pandas, DuckDB, Polars...)
+Colonnes typées (prix et surface en float, pièces en int, date de
+récupération en timestamp, images et tags en listes), partitionnées par
+jour de récupération et par ville. Chaque export ajoute ses fichiers sans
+réécrire les précédents; une annonce déjà exportée le même jour est
+ignorée. Les filtres sont poussés à la lecture: les partitions écartent
+jours et villes, les statistiques min/max des groupes de lignes (triés par
+prix) écartent les tranches de prix ou de surface hors filtre.
+
+Usage: python3 parquet_export.py write --input annonces_enriched.json
+       python3 parquet_export.py query --price-max 900 --surface-min 50
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import date, datetime
+from typing import List, Optional
+
+from export import parse_number
+from record import Annonce, load
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+except ImportError:  # Export Parquet indisponible (pip install pyarrow)
+    pa = None
+
+DEFAULT_DIR = 'annonces_parquet'
+ROW_GROUP_SIZE = 1024  # lignes par groupe (granularité du saut par min/max)
+COMPRESSION = 'zstd'
+UNKNOWN_VILLE = 'inconnue'
+
+
+def available() -> bool:
+    return pa is not None
+
+
+def _require():
+    if pa is None:
+        raise RuntimeError("pyarrow requis pour l'export Parquet "
+                           "(pip install pyarrow)")
+
+
+def partition_schema():
+    return pa.schema([('scrape_date', pa.date32()), ('ville', pa.string())])
+
+
+def annonce_schema():
+    """Schéma des fichiers (hors colonnes de partition)"""
+    text_list = pa.list_(pa.string())
+    category = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('url', pa.string()),
+        ('id', pa.int64()),
+        ('title', pa.string()),
+        ('prix', pa.float64()),
+        ('surface', pa.float64()),
+        ('pieces', pa.int32()),
+        ('chambres', pa.int32()),
+        ('etage', pa.string()),
+        ('quartier', category),
+        ('location', pa.string()),
+        ('lat', pa.float64()),
+        ('lng', pa.float64()),
+        ('dpe', category),
+        ('ges', category),
+        ('tags', text_list),
+        ('images', text_list),
+        ('searches', text_list),
+        ('description', pa.string()),
+        ('date_recuperation', pa.timestamp('us')),
+        ('date_publication', pa.string()),
+        ('enriched', pa.bool_()),
+        # Textes bruts de scrap.py ("1 200 €"), gardés pour référence
+        ('price_text', pa.string()),
+        ('surface_text', pa.string()),
+        ('bedrooms_text', pa.string()),
+        # Clés sans colonne dédiée (JSON)
+        ('extra', pa.string()),
+    ])
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _as_int(value: Optional[float]) -> Optional[int]:
+    return None if value is None else int(value)
+
+
+def to_table(annonces: List[Annonce], export_date: Optional[date] = None):
+    """
+    Table Arrow typée des annonces, colonnes de partition comprises
+
+    Les annonces non enrichies (sans date de récupération) sont rangées au
+    jour de l'export.
+    """
+    _require()
+    export_date = export_date or date.today()
+    fetched = [_parse_datetime(a.date_recuperation) for a in annonces]
+    columns = {
+        'url': [a.url for a in annonces],
+        'id': [a.id for a in annonces],
+        'title': [a.title for a in annonces],
+        # Champs *_clean, sinon textes bruts de scrap.py
+        'prix': [a.prix if a.prix is not None
+                 else parse_number(a.price_text) for a in annonces],
+        'surface': [a.surface if a.surface is not None
+                    else parse_number(a.surface_text) for a in annonces],
+        'pieces': [a.pieces for a in annonces],
+        'chambres': [a.chambres if a.chambres is not None
+                     else _as_int(parse_number(a.bedrooms_text))
+                     for a in annonces],
+        'etage': [a.etage for a in annonces],
+        'quartier': [a.quartier for a in annonces],
+        'location': [a.location for a in annonces],
+        'lat': [a.lat for a in annonces],
+        'lng': [a.lng for a in annonces],
+        'dpe': [a.dpe for a in annonces],
+        'ges': [a.ges for a in annonces],
+        'tags': [None if a.tags is None else list(a.tags) for a in annonces],
+        'images': [a.images for a in annonces],
+        'searches': [None if a.searches is None else list(a.searches)
+                     for a in annonces],
+        'description': [a.description for a in annonces],
+        'date_recuperation': fetched,
+        'date_publication': [a.date_publication for a in annonces],
+        'enriched': [a.enriched for a in annonces],
+        'price_text': [a.price_text for a in annonces],
+        'surface_text': [a.surface_text for a in annonces],
+        'bedrooms_text': [a.bedrooms_text for a in annonces],
+        'extra': [None if not a.extra else
+                  json.dumps(a.extra, ensure_ascii=False) for a in annonces],
+    }
+    schema = annonce_schema()
+    arrays = [pa.array(columns[field.name], type=field.type)
+              for field in schema]
+    arrays.append(pa.array([ts.date() if ts else export_date
+                            for ts in fetched], type=pa.date32()))
+    arrays.append(pa.array([a.ville or a.location or UNKNOWN_VILLE
+                            for a in annonces], type=pa.string()))
+    full_schema = pa.schema(list(schema) + list(partition_schema()))
+    return pa.Table.from_arrays(arrays, schema=full_schema)
+
+
+def open_dataset(path: str = DEFAULT_DIR):
+    """Dataset Parquet partitionné (lecture paresseuse, filtres poussés)"""
+    _require()
+    return ds.dataset(path, format='parquet',
+                      partitioning=ds.partitioning(partition_schema(),
+                                                   flavor='hive'))
+
+
+def read_annonces(path: str = DEFAULT_DIR, filter=None,
+                  columns: Optional[List[str]] = None):
+    """
+    Table Arrow des annonces exportées
+
+    Usage:
+        import pyarrow.dataset as ds
+        table = read_annonces(filter=ds.field('prix') <= 900)
+        df = table.to_pandas()
+    """
+    return open_dataset(path).to_table(columns=columns, filter=filter)
+
+
+def _exported_keys(path: str) -> set:
+    """(url, jour) déjà présents dans l'export (deux colonnes lues)"""
+    if not os.path.isdir(path):
+        return set()
+    table = open_dataset(path).to_table(columns=['url', 'scrape_date'])
+    return set(zip(table.column('url').to_pylist(),
+                   table.column('scrape_date').to_pylist()))
+
+
+def write(annonces: List[Annonce], path: str = DEFAULT_DIR,
+          export_date: Optional[date] = None) -> int:
+    """
+    Ajoute des annonces à l'export partitionné
+
+    Returns:
+        Nombre d'annonces écrites (hors annonces déjà exportées ce jour-là)
+    """
+    table = to_table(annonces, export_date)
+    existing = _exported_keys(path)
+    if existing:
+        keep = [
+            (url, day) not in existing
+            for url, day in zip(table.column('url').to_pylist(),
+                                table.column('scrape_date').to_pylist())
+        ]
+        table = table.filter(pa.array(keep, type=pa.bool_()))
+    if not table.num_rows:
+        return 0
+    # Tri par prix dans chaque partition: groupes de lignes à min/max
+    # serrés, sautés par les filtres sur le prix
+    table = table.sort_by([('scrape_date', 'ascending'),
+                           ('ville', 'ascending'), ('prix', 'ascending')])
+    stamp = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+    ds.write_dataset(
+        table, path, format='parquet',
+        partitioning=ds.partitioning(partition_schema(), flavor='hive'),
+        basename_template=f'part-{stamp}-{{i}}.parquet',
+        existing_data_behavior='overwrite_or_ignore',
+        max_rows_per_group=ROW_GROUP_SIZE,
+        min_rows_per_group=min(ROW_GROUP_SIZE, table.num_rows),
+        file_options=ds.ParquetFileFormat().make_write_options(
+            compression=COMPRESSION),
+    )
+    return table.num_rows
+
+
+def build_filter(price_min=None, price_max=None, surface_min=None,
+                 surface_max=None, ville=None, since=None):
+    """Expression de filtre Arrow (None = pas de filtre)"""
+    _require()
+    conditions = []
+    if price_min is not None:
+        conditions.append(ds.field('prix') >= price_min)
+    if price_max is not None:
+        conditions.append(ds.field('prix') <= price_max)
+    if surface_min is not None:
+        conditions.append(ds.field('surface') >= surface_min)
+    if surface_max is not None:
+        conditions.append(ds.field('surface') <= surface_max)
+    if ville:
+        conditions.append(ds.field('ville') == ville)
+    if since:
+        conditions.append(ds.field('scrape_date') >= since)
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None \
+            else expression & condition
+    return expression
+
+
+def scan_plan(dataset, expression) -> dict:
+    """Fichiers et groupes de lignes retenus par le filtre, sur le total"""
+    files = list(dataset.get_fragments())
+    kept = list(dataset.get_fragments(filter=expression)) \
+        if expression is not None else files
+    groups = sum(f.num_row_groups for f in files)
+    kept_groups = sum(
+        len(f.split_by_row_group(filter=expression,
+                                 schema=dataset.schema))
+        if expression is not None else f.num_row_groups
+        for f in kept
+    )
+    return {'files': len(files), 'files_read': len(kept),
+            'row_groups': groups, 'row_groups_read': kept_groups}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Export Parquet partitionné des annonces'
+    )
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_write = sub.add_parser('write', help='Ajouter des annonces à l\'export')
+    p_write.add_argument('--input', default='annonces_enriched.json',
+                         help='Fichier d\'annonces (JSON ou .sla)')
+    p_write.add_argument('--output', default=DEFAULT_DIR,
+                         help=f'Répertoire de l\'export (défaut: {DEFAULT_DIR})')
+
+    p_query = sub.add_parser('query', help='Lire l\'export avec des filtres')
+    p_query.add_argument('--output', default=DEFAULT_DIR,
+                         help=f'Répertoire de l\'export (défaut: {DEFAULT_DIR})')
+    p_query.add_argument('--price-min', type=float)
+    p_query.add_argument('--price-max', type=float)
+    p_query.add_argument('--surface-min', type=float)
+    p_query.add_argument('--surface-max', type=float)
+    p_query.add_argument('--ville', help='Ville exacte (partition)')
+    p_query.add_argument('--since', type=date.fromisoformat,
+                         help='Premier jour de récupération (AAAA-MM-JJ)')
+    args = parser.parse_args(argv)
+
+    if not available():
+        parser.error("pyarrow requis pour l'export Parquet "
+                     "(pip install pyarrow)")
+
+    if args.command == 'write':
+        annonces = load(args.input)
+        start = time.perf_counter()
+        written = write(annonces, args.output)
+        print(f"💾 {written}/{len(annonces)} annonces ajoutées à "
+              f"{args.output} en {time.perf_counter() - start:.2f} s "
+              f"({len(annonces) - written} déjà exportées)")
+        return
+
+    dataset = open_dataset(args.output)
+    expression = build_filter(args.price_min, args.price_max,
+                              args.surface_min, args.surface_max,
+                              args.ville, args.since)
+    start = time.perf_counter()
+    table = dataset.to_table(filter=expression)
+    took = time.perf_counter() - start
+    plan = scan_plan(dataset, expression)
+    print(f"📊 {table.num_rows} annonces en {took * 1000:.0f} ms "
+          f"(fichiers lus: {plan['files_read']}/{plan['files']}, "
+          f"groupes de lignes: {plan['row_groups_read']}/"
+          f"{plan['row_groups']})")
+    if table.num_rows:
+        # Médiane nulle si aucune valeur connue ("Prix sur demande")
+        prix, surface = (pc.approximate_median(table.column(name)).as_py()
+                         for name in ('prix', 'surface'))
+        print(f"   Prix médian {'?' if prix is None else f'{prix:.0f}'} €, "
+              f"surface médiane "
+              f"{'?' if surface is None else f'{surface:.0f}'} m²")
+
+
+if __name__ == '__main__':
+    main()
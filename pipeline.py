@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Enrichissement en pipeline: chargement des pages et extraction en parallèle
+Les navigateurs déposent les pages brutes dans une file bornée, vidée par
+un pool d'extraction (threads ou processus). Le débit est limité par
+l'étape la plus lente au lieu de la somme des deux. Les résultats sortent
+dans l'ordre de l'entrée.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+DEFAULT_QUEUE_SIZE = 8
+
+_DONE = object()  # Fin de la file (un par extracteur)
+
+
+class StageClock:
+    """Temps cumulé des workers d'une étape, par état"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.items = 0
+        self.seconds = {}  # état -> secondes cumulées
+        self._lock = threading.Lock()
+
+    def add(self, state: str, seconds: float, items: int = 0):
+        with self._lock:
+            self.seconds[state] = self.seconds.get(state, 0.0) + seconds
+            self.items += items
+
+    def share(self, state: str, wall: float) -> float:
+        """Part du temps disponible (wall x workers) passée dans cet état"""
+        if wall <= 0:
+            return 0.0
+        return self.seconds.get(state, 0.0) / (wall * self.workers)
+
+
+class Pipeline:
+    """
+    fetch(item) -> brut, puis extract(brut) -> résultat
+
+    Usage:
+        pipeline = Pipeline(fetch, extract, extractors=2)
+        for item, result in pipeline.run(items):
+            ...
+        pipeline.print_report()
+
+    Un chargement qui renvoie None (page perdue) saute l'extraction:
+    l'item sort avec le résultat None, à l'appelant de le rejouer.
+
+    Args:
+        fetch: Chargement (un appel par item, dans un thread "navigateur")
+        extract: Extraction (sans état partagé si processes=True)
+        fetchers: Threads de chargement (un par navigateur du pool)
+        extractors: Workers d'extraction
+        queue_size: Pages brutes en attente d'extraction, au plus
+        processes: Extraire dans un pool de processus (hors GIL)
+        pause: Appelée entre deux chargements d'un même thread (politesse)
+    """
+
+    def __init__(self, fetch: Callable, extract: Callable,
+                 fetchers: int = 1, extractors: int = 1,
+                 queue_size: int = DEFAULT_QUEUE_SIZE,
+                 processes: bool = False,
+                 pause: Optional[Callable[[], None]] = None):
+        self.fetch = fetch
+        self.extract = extract
+        self.fetchers = max(1, fetchers)
+        self.extractors = max(1, extractors)
+        self.queue_size = max(1, queue_size)
+        self.processes = processes
+        self.pause = pause
+        self.fetch_clock = StageClock(self.fetchers)
+        self.extract_clock = StageClock(self.extractors)
+        self.wall = 0.0
+        self.depth_max = 0
+        self._depth_sum = 0
+        self._depth_samples = 0
+        self._depth_lock = threading.Lock()
+
+    def _sample_depth(self, depth: int):
+        with self._depth_lock:
+            self._depth_sum += depth
+            self._depth_samples += 1
+            self.depth_max = max(self.depth_max, depth)
+
+    @property
+    def depth_mean(self) -> float:
+        return self._depth_sum / self._depth_samples if self._depth_samples \
+            else 0.0
+
+    def run(self, items: Iterable) -> Iterator[Tuple[object, object]]:
+        """Produit les couples (item, résultat) dans l'ordre de l'entrée"""
+        start = time.perf_counter()
+        source = enumerate(items)
+        source_lock = threading.Lock()
+        raw_queue = queue.Queue(maxsize=self.queue_size)
+        results = queue.Queue()
+        stop = threading.Event()
+        # Items en vol (chargés, en file, en extraction ou en attente de
+        # remise dans l'ordre): la mémoire reste bornée
+        slots = threading.Semaphore(
+            self.fetchers + self.queue_size + self.extractors
+        )
+        live_fetchers = [self.fetchers]
+        source_errors = []
+        executor = (ProcessPoolExecutor(self.extractors)
+                    if self.processes else None)
+
+        def put_raw(entry):
+            while not stop.is_set():
+                try:
+                    raw_queue.put(entry, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def fetcher():
+            first = True
+            try:
+                while not stop.is_set():
+                    waited = time.perf_counter()
+                    slots.acquire()
+                    if stop.is_set():
+                        break
+                    with source_lock:
+                        try:
+                            entry = next(source, None)
+                        except Exception as e:
+                            # Entrée illisible: remontée par run()
+                            source_errors.append(e)
+                            entry = None
+                    self.fetch_clock.add('blocked',
+                                         time.perf_counter() - waited)
+                    if entry is None:
+                        slots.release()
+                        break
+                    if not first and self.pause:
+                        paused = time.perf_counter()
+                        self.pause()
+                        self.fetch_clock.add('pause',
+                                             time.perf_counter() - paused)
+                    first = False
+                    seq, item = entry
+                    began = time.perf_counter()
+                    try:
+                        raw, error = self.fetch(item), None
+                    except Exception as e:
+                        raw, error = None, e
+                    done = time.perf_counter()
+                    self.fetch_clock.add('busy', done - began, items=1)
+                    put_raw((seq, item, raw, error))
+                    self.fetch_clock.add('blocked', time.perf_counter() - done)
+                    self._sample_depth(raw_queue.qsize())
+            finally:
+                with source_lock:
+                    live_fetchers[0] -= 1
+                    last = live_fetchers[0] == 0
+                if last:
+                    for _ in range(self.extractors):
+                        put_raw(_DONE)
+
+        def extractor():
+            while not stop.is_set():
+                waited = time.perf_counter()
+                entry = raw_queue.get()
+                began = time.perf_counter()
+                self.extract_clock.add('starved', began - waited)
+                if entry is _DONE:
+                    results.put(_DONE)
+                    return
+                self._sample_depth(raw_queue.qsize())
+                seq, item, raw, error = entry
+                result = None
+                if error is None and raw is not None:
+                    try:
+                        if executor is not None:
+                            result = executor.submit(self.extract, raw).result()
+                        else:
+                            result = self.extract(raw)
+                    except Exception as e:
+                        error = e
+                self.extract_clock.add('busy', time.perf_counter() - began,
+                                       items=1)
+                results.put((seq, item, result, error))
+
+        threads = (
+            [threading.Thread(target=fetcher, daemon=True,
+                              name=f'fetch-{i}')
+             for i in range(self.fetchers)] +
+            [threading.Thread(target=extractor, daemon=True,
+                              name=f'extract-{i}')
+             for i in range(self.extractors)]
+        )
+        for thread in threads:
+            thread.start()
+
+        pending = {}
+        next_seq = 0
+        finished = 0
+        try:
+            while finished < self.extractors:
+                entry = results.get()
+                if entry is _DONE:
+                    finished += 1
+                    continue
+                pending[entry[0]] = entry
+                while next_seq in pending:
+                    _, item, result, error = pending.pop(next_seq)
+                    next_seq += 1
+                    if error is not None:
+                        raise error
+                    yield item, result
+                    slots.release()
+            if source_errors:
+                raise source_errors[0]
+        finally:
+            stop.set()
+            # Débloquer les threads encore en attente
+            for _ in range(self.fetchers):
+                slots.release()
+            for _ in range(self.extractors):
+                try:
+                    raw_queue.put_nowait(_DONE)
+                except queue.Full:
+                    break
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+            self.wall = time.perf_counter() - start
+
+    def report(self) -> Dict:
+        """Utilisation de chaque étape et profondeur de la file"""
+        wall = self.wall
+        return {
+            'wall_seconds': round(wall, 3),
+            'items': self.extract_clock.items,
+            'fetch': {
+                'workers': self.fetchers,
+                'busy': round(self.fetch_clock.share('busy', wall), 3),
+                'pause': round(self.fetch_clock.share('pause', wall), 3),
+                'blocked': round(self.fetch_clock.share('blocked', wall), 3),
+            },
+            'extract': {
+                'workers': self.extractors,
+                'processes': self.processes,
+                'busy': round(self.extract_clock.share('busy', wall), 3),
+                'starved': round(self.extract_clock.share('starved', wall), 3),
+            },
+            'queue': {
+                'size': self.queue_size,
+                'depth_mean': round(self.depth_mean, 2),
+                'depth_max': self.depth_max,
+            },
+        }
+
+    def print_report(self):
+        r = self.report()
+        fetch, extract, q = r['fetch'], r['extract'], r['queue']
+        kind = 'processus' if self.processes else 'threads'
+        rate = r['items'] / r['wall_seconds'] if r['wall_seconds'] else 0
+        print(f"\n⚙️  Pipeline: {fetch['workers']} navigateur(s), "
+              f"{extract['workers']} extracteur(s) ({kind}), "
+              f"file de {q['size']}")
+        print(f"   Chargement : occupé {fetch['busy']:6.1%} | "
+              f"pause {fetch['pause']:6.1%} | "
+              f"bloqué (file pleine) {fetch['blocked']:6.1%}")
+        print(f"   Extraction : occupé {extract['busy']:6.1%} | "
+              f"en attente (file vide) {extract['starved']:6.1%}")
+        print(f"   File       : profondeur moyenne {q['depth_mean']:.2f}, "
+              f"max {q['depth_max']}")
+        print(f"   Débit      : {rate:.2f} annonces/s "
+              f"({r['items']} en {r['wall_seconds']:.1f} s)")
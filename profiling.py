@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Profilage par étape du pipeline (fetch, parse, extract, serialize)
+Chaque étape marquée par metrics.time_stage() est profilée avec cProfile;
+on écrit par étape un fichier de stats (.prof), des piles repliées (.folded,
+compatibles flamegraph.pl / speedscope) et un flamegraph SVG autonome.
+"""
+
+import cProfile
+import html
+import os
+import pstats
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from metrics import REGISTRY
+
+# Étapes de metrics.time_stage regroupées par étape de profilage
+# (les attentes volontaires ne sont pas profilées)
+PROFILE_STAGES = {
+    'http_fetch': 'fetch',
+    'selenium_load': 'fetch',
+    'page_source': 'fetch',
+    'dom_build': 'parse',
+    'xpath_extract': 'extract',
+    'script_extract': 'extract',
+    'json_write': 'serialize',
+}
+
+PROFILE_ENV = 'SELOGER_PROFILE'  # Variable d'environnement du serveur
+
+# Frames plus petites que cette fraction du total ignorées dans le flamegraph
+MIN_FRACTION = 0.001
+MAX_DEPTH = 80
+
+# Un seul cProfile actif à la fois dans le processus: depuis Python 3.12,
+# cProfile passe par sys.monitoring et un 2e enable() lève ValueError
+# ("Another profiling tool is already active")
+_ACTIVE = threading.Lock()
+
+
+def profile_stage_name(stage: str) -> Optional[str]:
+    """Étape de profilage d'une étape de métrique (None = non profilée)"""
+    if stage.startswith('view_'):
+        return 'serialize'
+    return PROFILE_STAGES.get(stage)
+
+
+class StageProfiler:
+    """
+    Un cProfile par étape et par thread, fusionnés à l'écriture
+
+    Un seul bloc est profilé à la fois: un bloc qui commence pendant qu'un
+    autre thread est profilé s'exécute sans profilage (serveur multi-thread).
+    """
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self._profiles = {}  # (étape, thread) -> cProfile.Profile
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def profile(self, stage: str):
+        """Profile le bloc si l'étape est profilée et pas déjà imbriquée"""
+        name = profile_stage_name(stage)
+        if name is None or getattr(self._local, 'active', False):
+            yield
+            return
+        if not _ACTIVE.acquire(blocking=False):
+            yield  # Un autre thread est déjà profilé
+            return
+
+        try:
+            key = (name, threading.get_ident())
+            with self._lock:
+                profiler = self._profiles.get(key)
+                if profiler is None:
+                    profiler = self._profiles[key] = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Autre outil de profilage actif (coverage, débogueur...)
+                yield
+                return
+            self._local.active = True
+            try:
+                yield
+            finally:
+                profiler.disable()
+                self._local.active = False
+        finally:
+            _ACTIVE.release()
+
+    def merged_stats(self) -> Dict[str, pstats.Stats]:
+        """Stats fusionnées (tous threads) par étape"""
+        with self._lock:
+            items = list(self._profiles.items())
+        merged = {}
+        for (name, _), profiler in items:
+            profiler.create_stats()
+            if not profiler.stats:
+                continue
+            if name in merged:
+                merged[name].add(profiler)
+            else:
+                merged[name] = pstats.Stats(profiler)
+        return merged
+
+    def dump(self) -> Dict[str, str]:
+        """
+        Écrit stats, piles repliées et flamegraph de chaque étape
+
+        Returns:
+            Dictionnaire étape -> chemin du flamegraph SVG
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        written = {}
+        for name, stats in sorted(self.merged_stats().items()):
+            base = os.path.join(self.output_dir, name)
+            stats.dump_stats(f'{base}.prof')
+            folded = folded_stacks(stats)
+            with open(f'{base}.folded', 'w', encoding='utf-8') as f:
+                for stack, value in folded.items():
+                    f.write(f'{stack} {value}\n')
+            with open(f'{base}.svg', 'w', encoding='utf-8') as f:
+                f.write(render_flamegraph(folded, f'Étape {name}'))
+            written[name] = f'{base}.svg'
+        return written
+
+
+def _frame_label(func) -> str:
+    filename, line, name = func
+    if filename == '~':
+        return name  # fonction C intégrée: "<built-in method ...>"
+    return f'{name} ({os.path.basename(filename)}:{line})'
+
+
+def folded_stacks(stats: pstats.Stats) -> Dict[str, int]:
+    """
+    Reconstruit des piles repliées ("a;b;c microsecondes") depuis les stats
+
+    cProfile ne garde que les arcs appelant -> appelé: le temps d'un nœud
+    est réparti entre ses appelés au prorata du temps de chaque arc.
+    """
+    raw = stats.stats
+    callees = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    roots = [func for func, value in raw.items() if not value[4]]
+    total = sum(raw[func][3] for func in roots) or 1.0
+    threshold = total * MIN_FRACTION
+    folded = {}
+
+    def walk(func, time_budget, path, labels):
+        _, _, tt, ct, _ = raw[func]
+        scale = time_budget / ct if ct else 0.0
+        stack = ';'.join(labels)
+        self_time = tt * scale
+        if self_time >= threshold / 10:
+            folded[stack] = folded.get(stack, 0) + int(self_time * 1e6)
+        if len(labels) >= MAX_DEPTH:
+            return
+        for child, edge_ct in callees.get(func, ()):
+            child_time = edge_ct * scale
+            if child in path or child_time < threshold:
+                continue
+            walk(child, child_time, path | {child},
+                 labels + [_frame_label(child)])
+
+    for root in roots:
+        walk(root, raw[root][3], {root}, [_frame_label(root)])
+    return {stack: value for stack, value in folded.items() if value > 0}
+
+
+def render_flamegraph(folded: Dict[str, int], title: str,
+                      width: int = 1200, row_height: int = 16) -> str:
+    """Flamegraph SVG autonome (survol = nom de la fonction et durée)"""
+    tree = {'children': {}, 'value': 0}
+    for stack, value in folded.items():
+        node = tree
+        node['value'] += value
+        for frame in stack.split(';'):
+            node = node['children'].setdefault(
+                frame, {'children': {}, 'value': 0}
+            )
+            node['value'] += value
+
+    total = tree['value'] or 1
+    rects = []
+    max_depth = [0]
+
+    def layout(node, x, depth):
+        for frame, child in sorted(node['children'].items()):
+            w = child['value'] / total * width
+            if w >= 0.5:
+                rects.append((x, depth, w, frame, child['value']))
+                max_depth[0] = max(max_depth[0], depth)
+                layout(child, x, depth + 1)
+            x += w
+
+    layout(tree, 0.0, 0)
+    height = (max_depth[0] + 1) * row_height + 40
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" '
+        f'height="{height}" font-family="monospace" font-size="11">',
+        f'<text x="4" y="16" font-size="14">{html.escape(title)} '
+        f'({total / 1e6:.3f} s)</text>',
+    ]
+    for x, depth, w, frame, value in rects:
+        y = height - (depth + 1) * row_height
+        # Couleur stable par nom de fonction
+        hue = 20 + hash(frame.split(' ')[0]) % 40
+        label = html.escape(frame)
+        chars = int(w / 7)
+        text = html.escape(frame[:chars - 2] + '..' if len(frame) > chars
+                           else frame) if chars > 3 else ''
+        parts.append(
+            f'<g><title>{label} — {value / 1e3:.1f} ms '
+            f'({value / total * 100:.1f}%)</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" '
+            f'height="{row_height - 1}" fill="hsl({hue},90%,60%)"/>'
+            f'<text x="{x + 2:.1f}" y="{y + row_height - 4}">{text}</text></g>'
+        )
+    parts.append('</svg>')
+    return '\n'.join(parts)
+
+
+_active = None
+
+
+def enable(output_dir: str) -> StageProfiler:
+    """Active le profilage par étape (hook sur metrics.time_stage)"""
+    global _active
+    _active = StageProfiler(output_dir)
+    REGISTRY.stage_hook = _active.profile
+    return _active
+
+
+def dump():
+    """Écrit les résultats du profilage actif et affiche les fichiers"""
+    if _active is None:
+        return {}
+    written = _active.dump()
+    for name, path in written.items():
+        print(f"🔥 Profil '{name}': {path}")
+    return written
@@ -0,0 +1,593 @@
+#!/usr/bin/env python3
+"""
+Enregistrement typé d'une annonce et format binaire des fichiers d'annonces
+Annonce remplace le dict à ~25 clés: attributs fixes (__slots__), nombres
+typés (prix, surface, pièces, GPS), chaînes répétitives partagées entre
+annonces. Le format binaire (.sla) est colonnaire: chaque champ est stocké
+d'un bloc (tableau de nombres, chaînes jointes ou dictionnaire) et se
+décode avec les primitives C de Python (array, bytes.split, zlib), sans
+dépendance. Les descriptions sont stockées phrase par phrase: les mentions
+répétées d'une annonce à l'autre (honoraires, ALUR, texte d'agence) ne
+sont écrites qu'une fois. JSON reste le format d'export.
+
+Usage: python3 record.py annonces_enriched.json annonces_enriched.sla
+       python3 record.py annonces_enriched.sla annonces_enriched.json
+"""
+
+import argparse
+import array
+import gc
+import json
+import operator
+import struct
+import sys
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+BINARY_SUFFIX = '.sla'
+MAGIC = b'SLA1'
+
+# Types de colonnes
+INT = 'i'  # entier (tableau 'q')
+FLOAT = 'f'  # flottant (tableau 'd')
+TEXT = 's'  # chaîne quelconque (chaînes jointes)
+DICT = 'd'  # chaîne répétitive (dictionnaire + indices)
+DICT_LIST = 'L'  # liste de chaînes répétitives
+BYTES = 'y'  # octets (blocs joints)
+BOOL = 'b'
+JSON_ = 'j'  # valeur JSON libre
+FRAGMENTS = 'p'  # texte long découpé en phrases dédupliquées, compressé
+
+# Conversions entre le dict JSON et les attributs typés
+INT_TEXT = 'int_text'  # "3" -> 3
+DECIMAL_TEXT = 'decimal_text'  # "68,5" -> 68.5
+UTF8 = 'utf8'  # texte long gardé en UTF-8, décodé à la lecture
+LINES = 'lines'  # liste d'URLs gardée en un seul bloc UTF-8
+
+# attribut, clé JSON, type de colonne, conversion
+SCHEMA = (
+    ('id', 'id', INT, None),
+    ('url', 'url', TEXT, None),
+    ('title', 'title', DICT, None),
+    ('price_text', 'price', DICT, None),
+    ('location', 'location', DICT, None),
+    ('surface_text', 'surface', DICT, None),
+    ('bedrooms_text', 'bedrooms', DICT, None),
+    ('searches', 'searches', DICT_LIST, None),
+    ('enriched', None, BOOL, None),
+    ('lat', 'gps_latitude', FLOAT, None),
+    ('lng', 'gps_longitude', FLOAT, None),
+    ('ville', 'ville', DICT, None),
+    ('quartier', 'quartier', DICT, None),
+    ('dpe', 'dpe', DICT, None),
+    ('ges', 'ges', DICT, None),
+    ('images_utf8', 'images', BYTES, LINES),
+    ('tags', 'tags', DICT_LIST, None),
+    ('surface', 'surface_clean', FLOAT, DECIMAL_TEXT),
+    ('prix', 'prix_clean', FLOAT, DECIMAL_TEXT),
+    ('chambres', 'chambres_clean', INT, INT_TEXT),
+    ('pieces', 'pieces_clean', INT, INT_TEXT),
+    ('etage', 'etage_clean', DICT, None),
+    ('location_clean', 'location_clean', DICT, None),
+    ('date_recuperation', 'date_recuperation', TEXT, None),
+    ('date_publication', 'date_publication', DICT, None),
+    ('description_utf8', 'description', FRAGMENTS, UTF8),
+    ('extra', None, JSON_, None),
+    ('missing', None, DICT_LIST, None),
+)
+
+# Clés écrites par scrap.py (toujours présentes dans l'export JSON)
+SCRAPED_KEYS = ('id', 'url', 'title', 'price', 'location', 'surface',
+                'bedrooms')
+# Clés ajoutées par enrich_annonces.py, dans l'ordre de empty_details()
+ENRICHED_KEYS = ('gps_latitude', 'gps_longitude', 'ville', 'quartier', 'dpe',
+                 'ges', 'images', 'tags', 'surface_clean', 'prix_clean',
+                 'chambres_clean', 'pieces_clean', 'etage_clean',
+                 'location_clean', 'date_recuperation', 'date_publication',
+                 'description')
+
+_SEP = '\x00'
+
+# Fin de phrase: les mentions légales et textes d'agence se répètent d'une
+# annonce à l'autre phrase par phrase (honoraires, ALUR, Géorisques...)
+_SENTENCE_END = b'. '
+FRAGMENTS_LEVEL = 6  # niveau zlib de la table des phrases
+
+_BY_KEY = {key: (attr, kind, conversion)
+           for attr, key, kind, conversion in SCHEMA if key}
+
+
+@dataclass(slots=True, eq=True)
+class Annonce:
+    """Annonce scrapée, éventuellement enrichie"""
+    id: Optional[int] = None
+    url: Optional[str] = None
+    title: Optional[str] = None
+    price_text: Optional[str] = None  # "1 200 €" (brut)
+    location: Optional[str] = None
+    surface_text: Optional[str] = None  # "68,5 m²" (brut)
+    bedrooms_text: Optional[str] = None  # "3 chambres" (brut)
+    searches: Optional[Tuple[str, ...]] = None
+    enriched: bool = False
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    ville: Optional[str] = None
+    quartier: Optional[str] = None
+    dpe: Optional[str] = None
+    ges: Optional[str] = None
+    images_utf8: bytes = b''  # URLs séparées par des sauts de ligne
+    tags: Optional[Tuple[str, ...]] = ()
+    surface: Optional[float] = None  # m²
+    prix: Optional[float] = None  # €
+    chambres: Optional[int] = None
+    pieces: Optional[int] = None
+    etage: Optional[str] = None  # "2ème"
+    location_clean: Optional[str] = None
+    date_recuperation: Optional[str] = None
+    date_publication: Optional[str] = None
+    description_utf8: Optional[bytes] = None
+    # Clés inconnues et valeurs non canoniques ("68,50"), rendues telles
+    # quelles par to_dict()
+    extra: Optional[Dict] = None
+    # Clés de scrap.py (ou d'enrich_annonces.py si enrichie) absentes du
+    # dict d'origine, que to_dict() n'écrit pas
+    missing: Optional[Tuple[str, ...]] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Annonce':
+        """Construit une annonce depuis le format JSON (scrap ou enrichi)"""
+        values = {}
+        extra = {}
+        for key, value in data.items():
+            spec = _BY_KEY.get(key)
+            if spec is None:
+                extra[key] = value
+                continue
+            attr, kind, conversion = spec
+            typed = _to_typed(value, kind, conversion)
+            values[attr] = typed
+            restored = _from_typed(typed, kind, conversion)
+            if restored != value or type(restored) is not type(value) or \
+                    (key == 'searches' and value is None):
+                # Valeur non représentable telle quelle: gardée à part
+                extra[key] = value
+        enriched = values['enriched'] = any(key in data
+                                            for key in ENRICHED_KEYS)
+        expected = SCRAPED_KEYS + ENRICHED_KEYS if enriched else SCRAPED_KEYS
+        missing = tuple(key for key in expected if key not in data)
+        if missing:
+            values['missing'] = missing
+        if extra:
+            values['extra'] = extra
+        return cls(**values)
+
+    def to_dict(self) -> Dict:
+        """
+        Annonce au format JSON: mêmes clés et valeurs que le dict passé à
+        from_dict(), y compris partiel (clés absentes non ajoutées)
+        """
+        missing = self.missing or ()
+        keys = [key for key in SCRAPED_KEYS if key not in missing]
+        if self.searches is not None:
+            keys.append('searches')
+        data = {}
+        for key in keys:
+            attr, kind, conversion = _BY_KEY[key]
+            data[key] = _from_typed(getattr(self, attr), kind, conversion)
+        extra = self.extra or {}
+        for key, value in extra.items():
+            if key not in _BY_KEY:
+                data[key] = value
+        if self.enriched:
+            for key in ENRICHED_KEYS:
+                if key in missing:
+                    continue
+                attr, kind, conversion = _BY_KEY[key]
+                data[key] = _from_typed(getattr(self, attr), kind,
+                                        conversion)
+        for key, value in extra.items():
+            if key in _BY_KEY:
+                data[key] = value
+        return data
+
+    @property
+    def images(self) -> List[str]:
+        return _from_typed(self.images_utf8, BYTES, LINES)
+
+    @property
+    def description(self) -> Optional[str]:
+        return _from_typed(self.description_utf8, FRAGMENTS, UTF8)
+
+
+def _to_typed(value, kind: str, conversion: Optional[str]):
+    if value is None:
+        return b'' if conversion == LINES else None
+    if conversion == UTF8:
+        return value.encode('utf-8') if isinstance(value, str) and \
+            _SEP not in value else None
+    if conversion == LINES:
+        if isinstance(value, list) and all(
+                isinstance(v, str) and _SEP not in v and '\n' not in v
+                for v in value):
+            return '\n'.join(value).encode('utf-8')
+        return b''
+    if conversion == INT_TEXT:
+        return int(value) if isinstance(value, str) and value.isdigit() \
+            else None
+    if conversion == DECIMAL_TEXT:
+        try:
+            return float(str(value).replace(',', '.'))
+        except ValueError:
+            return None
+    if kind == INT:
+        return value if type(value) is int else None
+    if kind == FLOAT:
+        return value if type(value) is float else None
+    # Le caractère NUL sépare les chaînes du format binaire: une valeur qui
+    # en contient reste dans extra (encodée en JSON)
+    if kind in (TEXT, DICT):
+        return value if isinstance(value, str) and _SEP not in value \
+            else None
+    if kind == DICT_LIST:
+        if isinstance(value, list) and all(
+                isinstance(v, str) and _SEP not in v for v in value):
+            return tuple(value)
+        return None
+    return value
+
+
+def _from_typed(value, kind: str, conversion: Optional[str]):
+    if conversion == UTF8:
+        return None if value is None else value.decode('utf-8')
+    if conversion == LINES:
+        return value.decode('utf-8').split('\n') if value else []
+    if conversion == INT_TEXT:
+        return None if value is None else str(value)
+    if conversion == DECIMAL_TEXT:
+        if value is None:
+            return None
+        if value.is_integer():
+            return str(int(value))
+        return repr(value).replace('.', ',')
+    if kind == DICT_LIST:
+        return None if value is None else list(value)
+    return value
+
+
+# --- Format binaire -----------------------------------------------------
+
+_ALL_ATTRS = operator.attrgetter(*(attr for attr, _, _, _ in SCHEMA))
+_HEADER = struct.Struct('<4sII')  # magic, nombre d'annonces, de colonnes
+_COLUMN = struct.Struct('<B1sQ')  # longueur du nom, type, taille
+
+
+def _array_bytes(typecode: str, values) -> bytes:
+    data = array.array(typecode, values)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data.tobytes()
+
+
+def _array_from(typecode: str, blob: bytes) -> array.array:
+    data = array.array(typecode)
+    data.frombytes(blob)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data
+
+
+def _pack_parts(parts: List[bytes]) -> bytes:
+    """Blocs de longueur variable: nombre, tailles, puis contenus"""
+    return (struct.pack('<I', len(parts)) + _array_bytes('Q', map(len, parts))
+            + b''.join(parts))
+
+
+def _unpack_parts(blob: bytes) -> List[bytes]:
+    (count,) = struct.unpack_from('<I', blob)
+    sizes = _array_from('Q', blob[4:4 + 8 * count])
+    parts, offset = [], 4 + 8 * count
+    for size in sizes:
+        parts.append(blob[offset:offset + size])
+        offset += size
+    return parts
+
+
+def _null_mask(values) -> bytes:
+    """Un octet par valeur: 1 si nulle"""
+    if None not in values:
+        return bytes(len(values))
+    return bytes([value is None for value in values])
+
+
+def _encode_texts(values: List[Optional[str]]) -> bytes:
+    """Masque des valeurs nulles + chaînes jointes par NUL"""
+    mask = _null_mask(values)
+    if any(mask):
+        values = ['' if value is None else value for value in values]
+    joined = _SEP.join(values)
+    if joined.count(_SEP) != max(len(values) - 1, 0):
+        # Valeur contenant NUL (Annonce construite à la main)
+        joined = _SEP.join(value.replace(_SEP, '') for value in values)
+    return _pack_parts([mask, joined.encode('utf-8')])
+
+
+def _decode_texts(blob: bytes) -> List[Optional[str]]:
+    mask, joined = _unpack_parts(blob)
+    texts = joined.decode('utf-8').split(_SEP) if mask else []
+    if any(mask):
+        return [None if null else text for text, null in zip(texts, mask)]
+    return texts
+
+
+def _encode_bytes(values: List[Optional[bytes]]) -> bytes:
+    """Masque des valeurs nulles + blocs joints par NUL (UTF-8 sans NUL)"""
+    mask = bytes(value is None for value in values)
+    return _pack_parts([mask, b'\x00'.join(value or b'' for value in values)])
+
+
+def _decode_bytes(blob: bytes) -> List[Optional[bytes]]:
+    mask, joined = _unpack_parts(blob)
+    blocks = joined.split(b'\x00') if mask else []
+    if any(mask):
+        return [None if null else block for block, null in zip(blocks, mask)]
+    return blocks
+
+
+def _encode_dict(values: List[Optional[str]]) -> bytes:
+    """Dictionnaire des valeurs distinctes + indice par annonce (0 = nul)"""
+    distinct = [value for value in dict.fromkeys(values) if value is not None]
+    index = dict(zip(distinct, range(1, len(distinct) + 1)))
+    index[None] = 0
+    return _pack_parts([_encode_texts(distinct),
+                        _array_bytes('I', map(index.__getitem__, values))])
+
+
+def _decode_dict(blob: bytes) -> List[Optional[str]]:
+    table_blob, indices_blob = _unpack_parts(blob)
+    indices = _array_from('I', indices_blob)
+    table = [None] + _decode_texts(table_blob)
+    return [table[i] for i in indices]
+
+
+def _encode_dict_list(values) -> bytes:
+    """Listes: tailles (-1 = nulle) + éléments aplatis (dictionnaire)"""
+    sizes = [-1 if value is None else len(value) for value in values]
+    items = [item for value in values if value for item in value]
+    return _pack_parts([_array_bytes('q', sizes), _encode_dict(items)])
+
+
+def _decode_dict_list(blob: bytes) -> List:
+    sizes_blob, items_blob = _unpack_parts(blob)
+    items = _decode_dict(items_blob)
+    values, offset = [], 0
+    for size in _array_from('q', sizes_blob):
+        if size < 0:
+            values.append(None)
+        elif size == 0:
+            values.append(())
+        else:
+            values.append(tuple(items[offset:offset + size]))
+            offset += size
+    return values
+
+
+def _encode_fragments(values: List[Optional[bytes]]) -> bytes:
+    """
+    Textes longs découpés en phrases (recollées exactement par le même
+    séparateur); chaque phrase distincte n'est stockée qu'une fois, la
+    table est compressée avec zlib et chaque annonce garde ses indices
+    """
+    counts, indices, index = [], [], {}
+    for value in values:
+        if value is None:
+            counts.append(-1)
+            continue
+        parts = value.split(_SENTENCE_END)
+        counts.append(len(parts))
+        for part in parts:
+            i = index.get(part)
+            if i is None:
+                i = index[part] = len(index)
+            indices.append(i)
+    table = zlib.compress(b'\x00'.join(index), FRAGMENTS_LEVEL)
+    return _pack_parts([_array_bytes('q', counts), _array_bytes('I', indices),
+                        table])
+
+
+def _decode_fragments(blob: bytes) -> List[Optional[bytes]]:
+    counts_blob, indices_blob, table_blob = _unpack_parts(blob)
+    table = zlib.decompress(table_blob).split(b'\x00')
+    parts = list(map(table.__getitem__, _array_from('I', indices_blob)))
+    join = _SENTENCE_END.join
+    values, offset = [], 0
+    for count in _array_from('q', counts_blob).tolist():
+        if count < 0:
+            values.append(None)
+        else:
+            end = offset + count
+            values.append(join(parts[offset:end]))
+            offset = end
+    return values
+
+
+def _encode_numbers(values, typecode: str) -> bytes:
+    mask = _null_mask(values)
+    if any(mask):
+        values = [0 if value is None else value for value in values]
+    return _pack_parts([mask, _array_bytes(typecode, values)])
+
+
+def _decode_numbers(blob: bytes, typecode: str) -> List:
+    mask, data = _unpack_parts(blob)
+    numbers = _array_from(typecode, data).tolist()
+    if any(mask):
+        return [None if null else n for n, null in zip(numbers, mask)]
+    return numbers
+
+
+def _encode_column(kind: str, values: List) -> bytes:
+    if kind == INT:
+        return _encode_numbers(values, 'q')
+    if kind == FLOAT:
+        return _encode_numbers(values, 'd')
+    if kind == BOOL:
+        return bytes(bool(value) for value in values)
+    if kind == TEXT:
+        return _encode_texts(values)
+    if kind == BYTES:
+        return _encode_bytes(values)
+    if kind == FRAGMENTS:
+        return _encode_fragments(values)
+    if kind == DICT:
+        return _encode_dict(values)
+    if kind == DICT_LIST:
+        return _encode_dict_list(values)
+    if kind == JSON_:
+        return _encode_texts([
+            None if value is None else json.dumps(value, ensure_ascii=False)
+            for value in values
+        ])
+    raise ValueError(f'Type de colonne inconnu: {kind}')
+
+
+def _decode_column(kind: str, blob: bytes) -> List:
+    if kind == INT:
+        return _decode_numbers(blob, 'q')
+    if kind == FLOAT:
+        return _decode_numbers(blob, 'd')
+    if kind == BOOL:
+        return [bool(b) for b in blob]
+    if kind == TEXT:
+        return _decode_texts(blob)
+    if kind == BYTES:
+        return _decode_bytes(blob)
+    if kind == FRAGMENTS:
+        return _decode_fragments(blob)
+    if kind == DICT:
+        return _decode_dict(blob)
+    if kind == DICT_LIST:
+        return _decode_dict_list(blob)
+    if kind == JSON_:
+        return [None if text is None else json.loads(text)
+                for text in _decode_texts(blob)]
+    raise ValueError(f'Type de colonne inconnu: {kind}')
+
+
+@contextmanager
+def _gc_paused():
+    """
+    Suspend le ramasse-miettes cyclique: des centaines de milliers de
+    tuples et d'objets créés d'un coup le déclencheraient à répétition,
+    à parcourir tout le tas pour rien
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def dumps(annonces: List[Annonce]) -> bytes:
+    """Encode des annonces au format binaire colonnaire"""
+    with _gc_paused():
+        return _dumps(annonces)
+
+
+def _dumps(annonces: List[Annonce]) -> bytes:
+    chunks = [_HEADER.pack(MAGIC, len(annonces), len(SCHEMA))]
+    # Transposition annonces -> colonnes en C (attrgetter + zip)
+    columns = list(zip(*map(_ALL_ATTRS, annonces))) or [()] * len(SCHEMA)
+    for (attr, _, kind, _), values in zip(SCHEMA, columns):
+        payload = _encode_column(kind, list(values))
+        name = attr.encode('ascii')
+        chunks.append(_COLUMN.pack(len(name), kind.encode('ascii'),
+                                   len(payload)))
+        chunks.append(name)
+        chunks.append(payload)
+    return b''.join(chunks)
+
+
+def loads(data: bytes) -> List[Annonce]:
+    """Décode des annonces au format binaire colonnaire"""
+    with _gc_paused():
+        return _loads(data)
+
+
+def _loads(data: bytes) -> List[Annonce]:
+    magic, count, n_columns = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('Fichier d\'annonces binaire invalide')
+    offset = _HEADER.size
+    columns = {}
+    for _ in range(n_columns):
+        name_len, kind, size = _COLUMN.unpack_from(data, offset)
+        offset += _COLUMN.size
+        name = data[offset:offset + name_len].decode('ascii')
+        offset += name_len
+        columns[name] = _decode_column(kind.decode('ascii'),
+                                       data[offset:offset + size])
+        offset += size
+    # Colonne absente (fichier plus ancien): valeur par défaut
+    defaults = Annonce()
+    rows = [columns.get(attr) or [getattr(defaults, attr)] * count
+            for attr, _, _, _ in SCHEMA]
+    return list(map(Annonce, *rows))
+
+
+def is_binary(path: str) -> bool:
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def load(path: str) -> List[Annonce]:
+    """Annonces d'un fichier binaire (.sla) ou JSON"""
+    if is_binary(path):
+        with open(path, 'rb') as f:
+            return loads(f.read())
+    with open(path, 'r', encoding='utf-8') as f:
+        return [Annonce.from_dict(a) for a in json.load(f)]
+
+
+def load_dicts(path: str) -> List[Dict]:
+    """Annonces d'un fichier binaire ou JSON, au format dict (JSON)"""
+    if is_binary(path):
+        return [annonce.to_dict() for annonce in load(path)]
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save(path: str, annonces: Iterable):
+    """
+    Écrit des annonces (Annonce ou dict): binaire si le chemin finit par
+    .sla, JSON indenté sinon
+    """
+    if path.endswith(BINARY_SUFFIX):
+        records = [a if isinstance(a, Annonce) else Annonce.from_dict(a)
+                   for a in annonces]
+        with open(path, 'wb') as f:
+            f.write(dumps(records))
+        return
+    dicts = [a.to_dict() if isinstance(a, Annonce) else a for a in annonces]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(dicts, f, ensure_ascii=False, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Convertit un fichier d\'annonces JSON <-> binaire (.sla)'
+    )
+    parser.add_argument('input', help='Fichier d\'entrée (.json ou .sla)')
+    parser.add_argument('output', help='Fichier de sortie (.json ou .sla)')
+    args = parser.parse_args(argv)
+
+    annonces = load(args.input)
+    save(args.output, annonces)
+    print(f'💾 {len(annonces)} annonces écrites dans {args.output}')
+
+
+if __name__ == '__main__':
+    main()
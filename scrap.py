@@ -1,5 +1,3 @@
-import requests
-from lxml import html
 import argparse
 import json
 import os
@@ -7,6 +5,18 @@ import time
 import random
 from typing import Dict, List, Optional
 
+from changelog import CHANGELOG_FILE, ChangeLog
+from cookies import COOKIES_FILE, read_cookies
+from metrics import REGISTRY, time_stage
+from record import save as save_annonces
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'seloger_http_requests_total', 'Requêtes HTTP vers SeLoger par statut'
+)
+ANNONCES_PARSED = REGISTRY.counter(
+    'seloger_annonces_parsed_total', 'Annonces extraites des pages de liste'
+)
+
 def get_realistic_headers():
     """
     Génère des headers réalistes pour éviter la détection
@@ -33,13 +43,19 @@ def get_realistic_headers():
 class SeLogerScraper:
     """Scraper pour les annonces immobilières SeLoger"""
 
-    def __init__(self, cookies_file: str = '.cookies'):
+    def __init__(self, cookies_file: str = COOKIES_FILE,
+                 max_requests: Optional[int] = None, quiet: bool = False):
         """
         Initialise le scraper avec les cookies
         
         Args:
             cookies_file: Chemin vers le fichier de cookies
+            max_requests: Budget global de requêtes HTTP (None = illimité)
+            quiet: Ne pas afficher chaque annonce extraite
         """
+        # Import différé: requests n'est chargé que pour scraper
+        import requests
+
         self._s = requests.Session()
         self.cookies_file = cookies_file
         
@@ -53,13 +69,30 @@ class SeLogerScraper:
         self._last_request_time = 0
         self._min_delay = 2  # Minimum 2 secondes entre requêtes
         
+        # Budget de requêtes partagé par toutes les recherches de la session
+        self.max_requests = max_requests
+        self.requests_made = 0
+        self._home_visited = False
+        self.quiet = quiet
+        # Faux dès qu'une recherche s'arrête avant la fin de ses résultats
+        # (erreur, blocage, budget, max_pages atteint): la liste obtenue
+        # n'est alors pas complète
+        self.complete = True
+        
+    def _has_budget(self) -> bool:
+        """Indique s'il reste des requêtes dans le budget global"""
+        if self.max_requests is None:
+            return True
+        return self.requests_made < self.max_requests
+        
     def _wait_before_request(self):
         """Attend un délai aléatoire avant la requête pour éviter la détection"""
         elapsed = time.time() - self._last_request_time
         if elapsed < self._min_delay:
             wait_time = self._min_delay - elapsed + random.uniform(0.5, 2.0)
             print(f"⏳ Attente de {wait_time:.1f}s pour éviter la détection...")
-            time.sleep(wait_time)
+            with time_stage('wait'):
+                time.sleep(wait_time)
         self._last_request_time = time.time()
         
     def _load_cookies(self):
@@ -70,42 +103,16 @@ class SeLogerScraper:
             return
         
         try:
-            # Essayer de charger comme fichier JSON simple
-            with open(self.cookies_file, 'r') as f:
-                cookies_data = json.load(f)
-                
-            # Si c'est un dictionnaire simple
-            if isinstance(cookies_data, dict):
-                for name, value in cookies_data.items():
-                    self._s.cookies.set(name, value, domain='.seloger.com')
-            # Si c'est un tableau de cookies (format export navigateur)
-            elif isinstance(cookies_data, list):
-                for cookie in cookies_data:
-                    self._s.cookies.set(
-                        cookie.get('name'),
-                        cookie.get('value'),
-                        domain=cookie.get('domain', '.seloger.com'),
-                        path=cookie.get('path', '/')
-                    )
-            
+            for cookie in read_cookies(self.cookies_file):
+                self._s.cookies.set(
+                    cookie['name'],
+                    cookie['value'],
+                    domain=cookie['domain'],
+                    path=cookie['path']
+                )
             print(f"✅ {len(self._s.cookies)} cookies chargés depuis {self.cookies_file}")
-            
-        except json.JSONDecodeError:
-            # Essayer de charger comme fichier texte avec une ligne par cookie
-            try:
-                with open(self.cookies_file, 'r') as f:
-                    cookie_string = f.read().strip()
-                    
-                # Parser une chaîne de cookies (format: name=value; name2=value2)
-                for cookie_pair in cookie_string.split(';'):
-                    if '=' in cookie_pair:
-                        name, value = cookie_pair.strip().split('=', 1)
-                        self._s.cookies.set(name, value, domain='.seloger.com')
-                        
-                print(f"✅ Cookies chargés depuis {self.cookies_file}")
-                
-            except Exception as e:
-                print(f"❌ Erreur lors du chargement des cookies: {e}")
+        except Exception as e:
+            print(f"❌ Erreur lors du chargement des cookies: {e}")
 
     def build_search_url(self, filters: Optional[Dict] = None) -> str:
         """
@@ -169,9 +176,12 @@ class SeLogerScraper:
             exclude_colocation: Filtrer les colocations (défaut: True)
             
         Returns:
-            Liste de dictionnaires représentant les annonces
+            Liste de dictionnaires représentant les annonces. self.complete
+            passe à False si la recherche n'est pas allée jusqu'à une page
+            vide (dernière page de résultats)
         """
         all_results = []
+        exhausted = False
         
         for page_num in range(1, max_pages + 1):
             print(f"\n{'='*60}")
@@ -196,20 +206,23 @@ class SeLogerScraper:
             
             print(f"🔍 Recherche sur: {search_url}")
             
-            # Attendre avant la requête pour éviter la détection
-            self._wait_before_request()
-            
-            # Étape 1: Visiter la page d'accueil (première page seulement)
-            if page_num == 1:
+            # Étape 1: Visiter la page d'accueil (une fois par session)
+            if page_num == 1 and not self._home_visited and self._has_budget():
+                # Attendre avant la requête pour éviter la détection
+                self._wait_before_request()
                 print("🏠 Visite de la page d'accueil...")
+                self._home_visited = True
                 try:
                     home_headers = get_realistic_headers()
-                    home_response = self._s.get(
-                        'https://www.seloger.com/',
-                        headers=home_headers,
-                        timeout=30,
-                        allow_redirects=True
-                    )
+                    self.requests_made += 1
+                    with time_stage('http_fetch'):
+                        home_response = self._s.get(
+                            'https://www.seloger.com/',
+                            headers=home_headers,
+                            timeout=30,
+                            allow_redirects=True
+                        )
+                    HTTP_REQUESTS.inc(status=home_response.status_code)
                     if home_response.status_code == 200:
                         print("✅ Page d'accueil chargée")
                     else:
@@ -217,11 +230,15 @@ class SeLogerScraper:
                         print(f"⚠️  Page d'accueil: status {status}")
                     
                     # Petit délai pour simuler la lecture
-                    time.sleep(random.uniform(1.5, 3.0))
+                    with time_stage('wait'):
+                        time.sleep(random.uniform(1.5, 3.0))
                 except Exception as e:
                     print(f"⚠️  Erreur page d'accueil: {e}")
             
             # Étape 2: Effectuer la vraie requête
+            if not self._has_budget():
+                print(f"🛑 Budget de {self.max_requests} requêtes épuisé")
+                break
             print("📋 Chargement des résultats de recherche...")
             self._wait_before_request()
             
@@ -231,13 +248,17 @@ class SeLogerScraper:
                 search_headers['Referer'] = 'https://www.seloger.com/'
                 search_headers['Sec-Fetch-Site'] = 'same-origin'
                 
-                response = self._s.get(
-                    search_url,
-                    headers=search_headers,
-                    timeout=30,
-                    allow_redirects=True
-                )
-            except requests.exceptions.RequestException as e:
+                self.requests_made += 1
+                with time_stage('http_fetch'):
+                    response = self._s.get(
+                        search_url,
+                        headers=search_headers,
+                        timeout=30,
+                        allow_redirects=True
+                    )
+                HTTP_REQUESTS.inc(status=response.status_code)
+            except OSError as e:  # requests.RequestException en hérite
+                HTTP_REQUESTS.inc(status='error')
                 print(f"❌ Erreur de connexion: {e}")
                 break
             
@@ -267,16 +288,21 @@ class SeLogerScraper:
             
             if not page_results:
                 print(f"⚠️  Aucune annonce sur la page {page_num}, arrêt")
+                exhausted = True
                 break
                 
             all_results.extend(page_results)
             print(f"📊 Total cumulé: {len(all_results)} annonces")
             
             # Ne pas attendre après la dernière page
-            if page_num < max_pages:
+            if page_num < max_pages and self._has_budget():
                 delay = random.uniform(3.0, 5.0)
                 print(f"⏳ Pause de {delay:.1f}s avant page suivante...")
-                time.sleep(delay)
+                with time_stage('wait'):
+                    time.sleep(delay)
+        
+        if not exhausted:
+            self.complete = False
         
         # Dédupliquer par URL et réindexer
         seen_urls = set()
@@ -327,6 +353,66 @@ class SeLogerScraper:
         
         return unique_results
 
+    def run_batch(
+        self,
+        searches: List[Dict],
+        exclude_colocation: bool = True
+    ) -> List[Dict]:
+        """
+        Exécute plusieurs recherches sur la même session
+        
+        Les annonces sont dédupliquées par URL dans un index partagé au fil
+        des recherches; chaque annonce garde dans 'searches' le nom des
+        recherches qui l'ont trouvée.
+        
+        Args:
+            searches: Recherches sauvegardées, chacune de la forme
+                {'name': ..., 'filters': {...} ou 'url': ..., 'max_pages': N}
+            exclude_colocation: Filtrer les colocations (défaut: True)
+            
+        Returns:
+            Liste dédupliquée des annonces de toutes les recherches
+        """
+        index = {}  # url -> annonce
+        
+        for i, saved in enumerate(searches, 1):
+            name = saved.get('name') or f'recherche-{i}'
+            if not self._has_budget():
+                print(f"🛑 Budget épuisé, recherches restantes ignorées "
+                      f"({len(searches) - i + 1})")
+                self.complete = False
+                break
+            
+            print(f"\n🔎 Recherche {i}/{len(searches)}: {name}")
+            results = self.search(
+                filters=saved.get('filters'),
+                url=saved.get('url'),
+                max_pages=saved.get('max_pages', 1),
+                exclude_colocation=exclude_colocation
+            )
+            
+            new_count = 0
+            for annonce in results:
+                url = annonce.get('url', '')
+                existing = index.get(url)
+                if existing is not None:
+                    if name not in existing['searches']:
+                        existing['searches'].append(name)
+                else:
+                    annonce['searches'] = [name]
+                    index[url] = annonce
+                    new_count += 1
+            print(f"📊 {name}: {len(results)} annonces, {new_count} nouvelles "
+                  f"({len(results) - new_count} déjà vues)")
+        
+        unique_results = list(index.values())
+        for i, annonce in enumerate(unique_results, 1):
+            annonce['id'] = i
+        
+        print(f"\n📊 {len(unique_results)} annonces uniques, "
+              f"{self.requests_made} requêtes HTTP")
+        return unique_results
+
     def _parse_listings(self, html_content: bytes) -> List[Dict]:
         """
         Parse le HTML et extrait les annonces
@@ -337,10 +423,13 @@ class SeLogerScraper:
         Returns:
             Liste des annonces trouvées
         """
+        from lxml import html
+
         results = []
         
         try:
-            doc = html.fromstring(html_content)
+            with time_stage('dom_build'):
+                doc = html.fromstring(html_content)
             
             # Nouveau sélecteur: chercher les conteneurs d'annonces
             # (mis à jour suite à l'analyse de la structure HTML)
@@ -350,84 +439,103 @@ class SeLogerScraper:
             
             print(f"📋 {len(listings)} annonces trouvées")
             
-            for i, listing in enumerate(listings, 1):
-                try:
-                    # Extraire l'URL
-                    url_path_list = listing.xpath(
-                        ".//a[@data-testid='sl.explore.coveringLink']/@href"
-                    )
-                    url_path = url_path_list[0] if url_path_list else ""
-                    url = f"https://www.seloger.com{url_path}" if url_path else ""
-                    
-                    # Extraire le prix
-                    price_texts = listing.xpath(
-                        ".//div[@data-testid='sl.explore-card-price']//text()"
-                    )
-                    price_texts = [t.strip() for t in price_texts if t.strip()]
-                    price = price_texts[0] if price_texts else ""
-                    
-                    # Extraire tous les textes pour obtenir infos
-                    all_texts = listing.xpath(".//text()")
-                    all_texts = [t.strip() for t in all_texts
-                                 if t.strip() and len(t.strip()) > 2]
-                    
-                    # Le titre est généralement après le prix
-                    title = ""
-                    location = ""
-                    surface = ""
-                    bedrooms = ""
-                    
-                    for idx, text in enumerate(all_texts):
-                        # Le titre contient souvent "Appartement" ou "Maison"
-                        if "Appartement" in text or "Maison" in text:
-                            title = text
-                        # La localisation contient souvent un code postal
-                        if "(" in text and ")" in text and any(
-                            c.isdigit() for c in text
-                        ):
-                            location = text
-                        # Surface
-                        if "m²" in text:
-                            surface = text
-                        # Chambres
-                        if "chambre" in text:
-                            bedrooms = text
-                    
-                    # Créer l'objet annonce
-                    annonce = {
-                        'id': i,
-                        'url': url,
-                        'title': title,
-                        'price': price,
-                        'location': location,
-                        'surface': surface,
-                        'bedrooms': bedrooms,
-                    }
-                    
-                    results.append(annonce)
-                    print(f"  {i}. {title} - {price} - {location}")
-                    
-                except Exception as e:
-                    print(f"⚠️  Erreur lors du parsing de l'annonce {i}: {e}")
-                    continue
-            
+            with time_stage('xpath_extract'):
+                results = self._extract_listings(listings)
+            ANNONCES_PARSED.inc(len(results))
             return results
             
         except Exception as e:
             print(f"❌ Erreur lors du parsing: {e}")
             return []
 
+    def _extract_listings(self, listings) -> List[Dict]:
+        """
+        Extrait les champs de chaque conteneur d'annonce
+        
+        Args:
+            listings: Éléments lxml des cartes d'annonces
+            
+        Returns:
+            Liste des annonces extraites
+        """
+        results = []
+        
+        for i, listing in enumerate(listings, 1):
+            try:
+                # Extraire l'URL
+                url_path_list = listing.xpath(
+                    ".//a[@data-testid='sl.explore.coveringLink']/@href"
+                )
+                url_path = url_path_list[0] if url_path_list else ""
+                url = f"https://www.seloger.com{url_path}" if url_path else ""
+                
+                # Extraire le prix
+                price_texts = listing.xpath(
+                    ".//div[@data-testid='sl.explore-card-price']//text()"
+                )
+                price_texts = [t.strip() for t in price_texts if t.strip()]
+                price = price_texts[0] if price_texts else ""
+                
+                # Extraire tous les textes pour obtenir infos
+                all_texts = listing.xpath(".//text()")
+                all_texts = [t.strip() for t in all_texts
+                             if t.strip() and len(t.strip()) > 2]
+                
+                # Le titre est généralement après le prix
+                title = ""
+                location = ""
+                surface = ""
+                bedrooms = ""
+                
+                for idx, text in enumerate(all_texts):
+                    # Le titre contient souvent "Appartement" ou "Maison"
+                    if "Appartement" in text or "Maison" in text:
+                        title = text
+                    # La localisation contient souvent un code postal
+                    if "(" in text and ")" in text and any(
+                        c.isdigit() for c in text
+                    ):
+                        location = text
+                    # Surface
+                    if "m²" in text:
+                        surface = text
+                    # Chambres
+                    if "chambre" in text:
+                        bedrooms = text
+                
+                # Créer l'objet annonce
+                annonce = {
+                    'id': i,
+                    'url': url,
+                    'title': title,
+                    'price': price,
+                    'location': location,
+                    'surface': surface,
+                    'bedrooms': bedrooms,
+                }
+                
+                results.append(annonce)
+                if not self.quiet:
+                    print(f"  {i}. {title} - {price} - {location}")
+                
+            except Exception as e:
+                print(f"⚠️  Erreur lors du parsing de l'annonce {i}: {e}")
+                continue
+        
+        return results
+
     def save_to_json(self, results: List[Dict], filename: str = 'annonces.json'):
         """
         Sauvegarde les résultats dans un fichier JSON
         
         Args:
             results: Liste des annonces
-            filename: Nom du fichier de sortie
+            filename: Nom du fichier de sortie (format binaire compact si
+                il finit par .sla, voir record.py)
         """
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(results, f, ensure_ascii=False, indent=2)
+            with time_stage('json_write'):
+                save_annonces(filename, results)
             print(f"💾 {len(results)} annonces sauvegardées dans {filename}")
         except Exception as e:
             print(f"❌ Erreur lors de la sauvegarde: {e}")
@@ -443,7 +551,7 @@ class SeLogerScraper:
         return self._parse_listings(response.content)
 
 
-if __name__ == "__main__":
+def main(argv=None):
     argparser = argparse.ArgumentParser(
         description='Scraper d\'annonces immobilières SeLoger'
     )
@@ -463,7 +571,8 @@ if __name__ == "__main__":
         '--output', '-o',
         type=str,
         default='annonces.json',
-        help='Fichier de sortie JSON (défaut: annonces.json)'
+        help='Fichier de sortie JSON, ou binaire si .sla '
+             '(défaut: annonces.json)'
     )
     argparser.add_argument(
         '--surface-min',
@@ -481,8 +590,58 @@ if __name__ == "__main__":
         action='store_true',
         help='Inclure les colocations (par défaut: exclues)'
     )
+    argparser.add_argument(
+        '--batch',
+        type=str,
+        help='Fichier JSON de recherches sauvegardées à exécuter en lot'
+    )
+    argparser.add_argument(
+        '--max-requests',
+        type=int,
+        help='Budget global de requêtes HTTP (défaut: illimité)'
+    )
+    argparser.add_argument(
+        '--quiet', '-q',
+        action='store_true',
+        help='Ne pas afficher chaque annonce extraite'
+    )
+    argparser.add_argument(
+        '--metrics-json',
+        type=str,
+        help='Écrire un résumé JSON des métriques (temps par étape, requêtes)'
+    )
+    argparser.add_argument(
+        '--changelog',
+        type=str,
+        default=CHANGELOG_FILE,
+        help=f'Journal des modifications (défaut: {CHANGELOG_FILE})'
+    )
+    argparser.add_argument(
+        '--prune-missing',
+        action='store_true',
+        help='Marquer comme supprimées dans le journal les annonces connues '
+             'absentes du résultat (seulement si toutes les recherches sont '
+             'allées jusqu\'à leur dernière page)'
+    )
+    argparser.add_argument(
+        '--alerts',
+        type=str,
+        help='Fichier JSON de règles d\'alerte à tester sur les annonces'
+    )
+    argparser.add_argument(
+        '--profile',
+        type=str,
+        nargs='?',
+        const='profile',
+        help='Profiler chaque étape (stats cProfile + flamegraph SVG) '
+             'dans ce répertoire (défaut: profile)'
+    )
+    
+    args = argparser.parse_args(argv)
     
-    args = argparser.parse_args()
+    if args.profile:
+        import profiling
+        profiling.enable(args.profile)
     
     print("""
 ╔══════════════════════════════════════════════════════════╗
@@ -491,7 +650,11 @@ if __name__ == "__main__":
     """)
     
     # Créer le scraper avec les cookies
-    scraper = SeLogerScraper(cookies_file=args.cookies)
+    scraper = SeLogerScraper(
+        cookies_file=args.cookies,
+        max_requests=args.max_requests,
+        quiet=args.quiet
+    )
     
     # Préparer les filtres
     filters = {}
@@ -502,7 +665,15 @@ if __name__ == "__main__":
     exclude_coloc = not args.include_colocation
     
     # Effectuer la recherche
-    if args.url:
+    if args.batch:
+        with open(args.batch, 'r', encoding='utf-8') as f:
+            searches = json.load(f)
+        print(f"📂 {len(searches)} recherches chargées depuis {args.batch}")
+        results = scraper.run_batch(
+            searches,
+            exclude_colocation=exclude_coloc
+        )
+    elif args.url:
         results = scraper.search(
             url=args.url,
             max_pages=args.max_pages,
@@ -522,12 +693,38 @@ if __name__ == "__main__":
     # Sauvegarder les résultats
     if results:
         scraper.save_to_json(results, args.output)
+        # Seul un résultat complet, sur demande (--prune-missing), remplace
+        # la liste connue: un scraping interrompu ou coupé par --max-pages
+        # ne supprime rien
+        prune = args.prune_missing and scraper.complete
+        if args.prune_missing and not prune:
+            print("⚠️  Scraping incomplet: aucune annonce retirée du journal")
+        n_changes = ChangeLog(args.changelog).record(
+            results, remove_missing=prune, source='scrap'
+        )
+        print(f"📝 {n_changes} modifications ajoutées à {args.changelog}")
+        if args.alerts:
+            from alerts import ALERTS_STATE_FILE, AlertEngine
+            engine = AlertEngine.from_file(args.alerts,
+                                           state_file=ALERTS_STATE_FILE)
+            print(f"🔔 {engine.process(results)} nouvelles alertes")
         print(f"\n✅ Scraping terminé avec succès!")
         print(f"📊 {len(results)} annonces récupérées")
     else:
         print("\n⚠️  Aucune annonce trouvée")
     
+    if args.metrics_json:
+        REGISTRY.write_summary(args.metrics_json)
+        print(f"📈 Métriques écrites dans {args.metrics_json}")
+    
+    if args.profile:
+        profiling.dump()
+    
     print("""
     
     🦀 lobstr 🦀
     """)
+
+
+if __name__ == "__main__":
+    main()
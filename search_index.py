@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Index plein texte des annonces (titre, description, tags, localisation)
+Index inversé en mémoire, insensible aux accents, avec racinisation légère
+du français et classement BM25. Mis à jour incrémentalement: seules les
+annonces dont le texte a changé sont réindexées.
+
+Syntaxe des requêtes: tous les termes sont requis, "-terme" exclut.
+    python3 search_index.py "balcon parking -rez-de-chaussée"
+"""
+
+import argparse
+import heapq
+import math
+import re
+import threading
+import time
+import unicodedata
+from functools import lru_cache
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from record import load_dicts
+
+# Poids des champs dans le score (un tag ou le titre pèse plus qu'un mot
+# perdu dans la description)
+FIELD_WEIGHTS = (
+    ('title', 2.0),
+    ('tags', 2.0),
+    ('ville', 1.0),
+    ('quartier', 1.0),
+    ('location_clean', 1.0),
+    ('description', 1.0),
+)
+
+# Paramètres BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = frozenset('''
+a au aux avec ce ces dans de des du elle en et eux il je la le les leur lui
+ma mais me meme mes moi mon ne nos notre nous on ou par pas pour qu que qui
+sa se ses son sur ta te tes toi ton tu un une vos votre vous c d j l m n s t
+y est sont ete etre avoir a ont cette cet tout tous toute toutes tres plus
+'''.split())
+
+# Élisions: l'appartement, d'angle, qu'il...
+ELISIONS = ('l', 'd', 'j', 'm', 'n', 's', 't', 'c', 'qu', 'jusqu', 'lorsqu')
+
+# Suffixes retirés par la racinisation (du plus long au plus court)
+SUFFIXES = (
+    'issements', 'issement', 'atrices', 'atrice', 'ateurs', 'ateur',
+    'ations', 'ation', 'ements', 'ement', 'euses', 'euse', 'eux',
+    'iques', 'ique', 'ables', 'able', 'ites', 'ite', 'ives', 'ive', 'ifs',
+)
+
+_WORD_RE = re.compile(r"[a-z0-9]+(?:['\-][a-z0-9]+)*")
+
+
+def fold_accents(text: str) -> str:
+    """Minuscules sans accents ni ligatures ("Rez-de-Chaussée" -> "rez-de-chaussee")"""
+    text = text.lower().replace('œ', 'oe').replace('æ', 'ae').replace('’', "'")
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+@lru_cache(maxsize=100000)
+def stem(word: str) -> str:
+    """
+    Racinisation légère du français (mot déjà sans accents)
+    "meublées", "meublé" -> "meubl"; "lumineuse", "lumineux" -> "lumin"
+    """
+    if len(word) <= 3 or word.isdigit():
+        return word
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    if word.endswith('aux') and len(word) > 4:
+        word = word[:-3] + 'al'
+    elif word[-1] in 'sx':
+        word = word[:-1]
+    while len(word) > 4 and word.endswith('e'):
+        word = word[:-1]
+    if len(word) > 4 and word[-1] == word[-2] and word[-1] in 'lnt':
+        word = word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Découpe un texte en termes indexés
+
+    Un mot composé produit ses parties et sa forme jointe:
+    "rez-de-chaussée" -> ["rez", "chauss", "rez-de-chauss"]
+    """
+    terms = []
+    for word in _WORD_RE.findall(fold_accents(text)):
+        if "'" in word:
+            prefix, _, rest = word.partition("'")
+            word = rest if prefix in ELISIONS else word.replace("'", '')
+        if '-' in word:
+            parts = word.split('-')
+            terms.extend(stem(p) for p in parts if p not in STOPWORDS)
+            terms.append('-'.join(stem(p) for p in parts))
+        elif word not in STOPWORDS:
+            terms.append(stem(word))
+    return terms
+
+
+def parse_query(query: str) -> Tuple[List[str], List[Tuple[str, ...]]]:
+    """
+    Analyse une requête
+
+    Returns:
+        (termes requis, groupes de termes exclus). Un mot composé requis ne
+        cherche que sa forme jointe; exclu, il est découpé comme dans les
+        documents et écarte ceux qui contiennent toutes ses parties:
+        "-rez-de-chaussée" écarte "rez de chaussée" mais pas tout ce qui
+        contient "rez".
+    """
+    required, excluded = [], []
+    for word in query.split():
+        if word.startswith('-') and len(word) > 1:
+            terms = tokenize(word[1:])
+            if len(terms) > 1 and '-' in terms[-1]:
+                terms = terms[:-1] or terms[-1:]
+            if terms:
+                excluded.append(tuple(terms))
+            continue
+        terms = tokenize(word)
+        if len(terms) > 1 and '-' in terms[-1]:
+            terms = terms[-1:]
+        required.extend(terms)
+    return required, excluded
+
+
+def is_excluded(excluded: Iterable[Tuple[str, ...]], terms) -> bool:
+    """Vrai si les termes d'un document contiennent un groupe exclu en entier"""
+    return any(all(term in terms for term in group) for group in excluded)
+
+
+def document_text(annonce: Dict) -> Tuple:
+    """Texte indexé d'une annonce, champ par champ"""
+    values = []
+    for field, _ in FIELD_WEIGHTS:
+        value = annonce.get(field) or ''
+        if isinstance(value, list):
+            value = ' '.join(str(v) for v in value)
+        values.append(str(value))
+    return tuple(values)
+
+
+class SearchIndex:
+    """Index inversé url -> termes pondérés, interrogeable en BM25"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}  # terme -> {url: fréquence pondérée}
+        self._doc_terms = {}  # url -> {terme: fréquence}, pour la suppression
+        self._lengths = {}  # url -> longueur pondérée
+        self._total_length = 0.0
+        self._docs = {}  # url -> (annonce, texte indexé)
+        # Caches BM25 recalculés au besoin après une modification
+        self._norms = None  # url -> normalisation par la longueur
+        self._term_scores = {}  # terme -> {url: score du terme}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def get(self, url: str) -> Optional[Dict]:
+        doc = self._docs.get(url)
+        return doc[0] if doc else None
+
+    def add(self, url: str, annonce: Dict, text: Optional[Tuple] = None):
+        """Indexe (ou réindexe) une annonce"""
+        text = text or document_text(annonce)
+        frequencies = {}
+        for (_, weight), value in zip(FIELD_WEIGHTS, text):
+            for term in tokenize(value):
+                frequencies[term] = frequencies.get(term, 0.0) + weight
+        length = sum(frequencies.values())
+
+        with self._lock:
+            self.remove(url)
+            for term, tf in frequencies.items():
+                self._postings.setdefault(term, {})[url] = tf
+            self._doc_terms[url] = frequencies
+            self._lengths[url] = length
+            self._total_length += length
+            self._docs[url] = (annonce, text)
+            self._norms = None
+            self._term_scores = {}
+
+    def remove(self, url: str):
+        """Retire une annonce de l'index"""
+        with self._lock:
+            frequencies = self._doc_terms.pop(url, None)
+            if frequencies is None:
+                return
+            for term in frequencies:
+                postings = self._postings[term]
+                del postings[url]
+                if not postings:
+                    del self._postings[term]
+            self._total_length -= self._lengths.pop(url)
+            del self._docs[url]
+            self._norms = None
+            self._term_scores = {}
+
+    def _bm25_norms(self) -> Dict[str, float]:
+        """Terme de normalisation par longueur de chaque annonce"""
+        if self._norms is None:
+            avg_length = (self._total_length / len(self._docs)
+                          if self._docs else 1.0)
+            self._norms = {
+                url: BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                for url, length in self._lengths.items()
+            }
+        return self._norms
+
+    def _scores(self, term: str) -> Dict[str, float]:
+        """Score BM25 du terme pour chaque annonce qui le contient"""
+        scores = self._term_scores.get(term)
+        if scores is None:
+            postings = self._postings[term]
+            norms = self._bm25_norms()
+            n_docs = len(self._docs)
+            idf = math.log(1 + (n_docs - len(postings) + 0.5)
+                           / (len(postings) + 0.5))
+            factor = idf * (BM25_K1 + 1)
+            scores = self._term_scores[term] = {
+                url: factor * tf / (tf + norms[url])
+                for url, tf in postings.items()
+            }
+        return scores
+
+    def sync(self, annonces: Iterable[Dict]) -> Dict[str, int]:
+        """
+        Aligne l'index sur une liste d'annonces
+
+        Une annonce identique (même objet ou même texte) n'est pas
+        réindexée: le coût dépend du nombre d'annonces modifiées.
+
+        Returns:
+            {'added': n, 'updated': n, 'removed': n}
+        """
+        stats = {'added': 0, 'updated': 0, 'removed': 0}
+        with self._lock:
+            seen = set()
+            for annonce in annonces:
+                url = annonce.get('url')
+                if not url:
+                    continue
+                seen.add(url)
+                doc = self._docs.get(url)
+                if doc is not None and doc[0] is annonce:
+                    continue
+                text = document_text(annonce)
+                if doc is None:
+                    stats['added'] += 1
+                elif doc[1] == text:
+                    self._docs[url] = (annonce, text)
+                    continue
+                else:
+                    stats['updated'] += 1
+                self.add(url, annonce, text)
+
+            for url in [url for url in self._docs if url not in seen]:
+                self.remove(url)
+                stats['removed'] += 1
+        return stats
+
+    def search(self, query: str,
+               limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        Annonces contenant tous les termes requis et aucun terme exclu
+
+        Returns:
+            Liste (url, score) triée par score BM25 décroissant
+        """
+        required, excluded = parse_query(query)
+        if not required:
+            return []
+        with self._lock:
+            postings = [self._postings.get(term) for term in set(required)]
+            if not all(postings):
+                return []
+            # Intersection en partant de la liste la plus courte
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for other in postings[1:]:
+                candidates.intersection_update(other)
+                if not candidates:
+                    return []
+            for group in excluded:
+                # Annonces contenant toutes les parties du terme exclu
+                matching = set(self._postings.get(group[0], ()))
+                for term in group[1:]:
+                    matching.intersection_update(self._postings.get(term, ()))
+                candidates.difference_update(matching)
+
+            term_scores = [self._scores(term) for term in set(required)]
+            if len(term_scores) == 1:
+                only = term_scores[0]
+                scores = {url: only[url] for url in candidates}
+            else:
+                scores = {url: sum(ts[url] for ts in term_scores)
+                          for url in candidates}
+
+        key = itemgetter(1)
+        if limit:
+            return heapq.nlargest(limit, scores.items(), key=key)
+        return sorted(scores.items(), key=key, reverse=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Recherche plein texte dans les annonces'
+    )
+    parser.add_argument('query', help='Requête ("balcon parking -rez-de-chaussée")')
+    parser.add_argument('--input', default='annonces_enriched.json',
+                        help='Fichier d\'entrée (JSON ou .sla)')
+    parser.add_argument('--limit', type=int, default=10,
+                        help='Nombre de résultats affichés (défaut: 10)')
+    args = parser.parse_args(argv)
+
+    annonces = load_dicts(args.input)
+
+    index = SearchIndex()
+    start = time.perf_counter()
+    index.sync(annonces)
+    build = time.perf_counter() - start
+    print(f'📂 {len(index)} annonces indexées en {build * 1000:.0f} ms')
+
+    start = time.perf_counter()
+    results = index.search(args.query)
+    took = time.perf_counter() - start
+    print(f'🔍 {len(results)} résultats en {took * 1000:.2f} ms\n')
+
+    for url, score in results[:args.limit]:
+        annonce = index.get(url)
+        print(f"   {score:6.2f}  {annonce.get('title') or 'N/A'} | "
+              f"{annonce.get('price') or 'N/A'} | "
+              f"{annonce.get('ville') or annonce.get('location') or 'N/A'}")
+        print(f'           {url}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Point d'entrée unique des outils SeLoger
+Chaque sous-commande importe son module (et ses dépendances lourdes:
+requests, lxml, selenium) seulement quand elle est lancée.
+
+Usage: python3 seloger.py <commande> [options]
+       python3 seloger.py scrape --max-pages 3
+       python3 seloger.py serve --port 8012
+"""
+
+import importlib
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# commande -> (module, description)
+COMMANDS = {
+    'scrape': ('scrap', 'Scraper les pages de recherche'),
+    'enrich': ('enrich_annonces', 'Enrichir les annonces (Selenium)'),
+    'cookies': ('extract_cookies_selenium', 'Extraire les cookies (Chrome)'),
+    'serve': ('webview.server', 'Lancer le visualiseur web'),
+    'build': ('webview.assets', 'Build de production du visualiseur web'),
+    'export': ('export', 'Exporter le payload compact (colonnes)'),
+    'convert': ('record', 'Convertir les annonces JSON <-> binaire (.sla)'),
+    'parquet': ('parquet_export', 'Export Parquet partitionné (analyse)'),
+    'queue': ('workqueue', 'File d\'enrichissement partagée (plusieurs machines)'),
+    'images': ('image_index', 'Annonces republiées (photos communes)'),
+    'search': ('search_index', 'Recherche plein texte'),
+    'alerts': ('alerts', 'Alertes sur recherches sauvegardées'),
+    'market': ('analytics', '€/m² par quartier et bonnes affaires'),
+    'stats': ('facets', 'Facettes et histogrammes des annonces'),
+    'synth': ('synthetic', 'Annonces synthétiques (tests de charge)'),
+    'bench': ('bench', 'Benchmarks'),
+}
+
+
+def usage() -> str:
+    lines = ['Usage: python3 seloger.py <commande> [options]', '',
+             'Commandes:']
+    for name, (_, description) in COMMANDS.items():
+        lines.append(f'  {name:<10} {description}')
+    lines.append('')
+    lines.append('Aide d\'une commande: python3 seloger.py <commande> --help')
+    return '\n'.join(lines)
+
+
+def load_command(name: str):
+    """Importe le module de la commande et retourne sa fonction main"""
+    module_name = COMMANDS[name][0]
+    if module_name.startswith('webview.'):
+        # webview/ n'est pas un package: le serveur s'importe depuis son dossier
+        sys.path.insert(0, os.path.join(ROOT_DIR, 'webview'))
+        module_name = module_name.split('.', 1)[1]
+    return importlib.import_module(module_name).main
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ('-h', '--help'):
+        print(usage())
+        return
+    name, rest = argv[0], argv[1:]
+    if name not in COMMANDS:
+        print(f"❌ Commande inconnue: {name}\n\n{usage()}", file=sys.stderr)
+        sys.exit(2)
+
+    # Le nom affiché par argparse dans l'aide: "seloger.py scrape"
+    sys.argv[0] = f'{os.path.basename(sys.argv[0])} {name}'
+    load_command(name)(rest)
+
+
+if __name__ == '__main__':
+    main()
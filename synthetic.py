@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Jeu d'annonces synthétiques réalistes pour les tests de charge
+Mêmes champs que scrap.py puis enrich_annonces.py: quartiers de Lyon et
+alentours avec leurs coordonnées, loyers cohérents avec la surface et le
+quartier, photos, tags, DPE, descriptions faites de phrases d'agence (en
+partie communes à beaucoup d'annonces, comme en vrai) et quelques
+republications (mêmes photos, nouvelle URL). La graine fixe le résultat:
+deux exécutions produisent exactement les mêmes annonces.
+
+Usage: python3 synthetic.py --count 10000 --output synthetic_10k.json
+       python3 synthetic.py --count 100000 --output synthetic_100k.sla
+       python3 synthetic.py --count 1000 --changelog annonces_changes.ndjson
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+
+from changelog import ChangeLog
+from record import save
+
+DEFAULT_SEED = 42
+SIZES = (1000, 10000, 100000)
+REPOST_RATE = 0.03  # annonces republiées (photos d'une annonce précédente)
+ENRICHED_RATE = 0.95  # le reste: champs de scrap.py seulement
+EPOCH = datetime(2026, 3, 1, 9, 0)  # fin de la période de récupération
+SPAN_DAYS = 90
+CHANGELOG_BATCH = 5000
+
+# (ville, code postal, quartier, latitude, longitude, loyer médian €/m²)
+QUARTIERS = [
+    ('Lyon 1er', '69001', 'Pentes de la Croix-Rousse', 45.7700, 4.8320, 17.5),
+    ('Lyon 1er', '69001', 'Terreaux', 45.7676, 4.8344, 18.0),
+    ('Lyon 2ème', '69002', 'Bellecour', 45.7578, 4.8320, 18.5),
+    ('Lyon 2ème', '69002', 'Ainay', 45.7519, 4.8286, 18.0),
+    ('Lyon 2ème', '69002', 'Confluence', 45.7413, 4.8180, 17.0),
+    ('Lyon 3ème', '69003', 'Part-Dieu', 45.7606, 4.8590, 16.0),
+    ('Lyon 3ème', '69003', 'Montchat', 45.7560, 4.8860, 15.0),
+    ('Lyon 3ème', '69003', 'Guillotière', 45.7570, 4.8430, 16.0),
+    ('Lyon 4ème', '69004', 'Croix-Rousse', 45.7790, 4.8270, 16.5),
+    ('Lyon 5ème', '69005', 'Vieux Lyon', 45.7620, 4.8270, 17.0),
+    ('Lyon 5ème', '69005', 'Point du Jour', 45.7590, 4.7920, 14.0),
+    ('Lyon 6ème', '69006', 'Brotteaux', 45.7680, 4.8530, 18.0),
+    ('Lyon 6ème', '69006', 'Foch', 45.7700, 4.8430, 19.0),
+    ('Lyon 7ème', '69007', 'Gerland', 45.7330, 4.8330, 15.0),
+    ('Lyon 7ème', '69007', 'Jean Macé', 45.7460, 4.8420, 16.0),
+    ('Lyon 8ème', '69008', 'Monplaisir', 45.7450, 4.8700, 14.5),
+    ('Lyon 8ème', '69008', 'États-Unis', 45.7350, 4.8630, 13.0),
+    ('Lyon 9ème', '69009', 'Vaise', 45.7740, 4.8050, 14.5),
+    ('Lyon 9ème', '69009', 'La Duchère', 45.7870, 4.7960, 12.0),
+    ('Villeurbanne', '69100', 'Gratte-Ciel', 45.7680, 4.8800, 14.5),
+    ('Villeurbanne', '69100', 'Charpennes', 45.7700, 4.8630, 15.0),
+    ('Caluire-et-Cuire', '69300', 'Montessuy', 45.7960, 4.8470, 14.0),
+    ('Tassin-la-Demi-Lune', '69160', 'Centre', 45.7630, 4.7600, 13.5),
+]
+# Poids des quartiers (les arrondissements centraux publient plus)
+QUARTIER_WEIGHTS = [4, 3, 5, 3, 3, 6, 3, 4, 4, 3, 2, 5, 4, 4, 4, 4, 3, 3, 1,
+                    4, 3, 2, 2]
+
+# pièces -> (poids, surface min, surface max)
+LAYOUTS = {1: (18, 16, 35), 2: (30, 32, 58), 3: (27, 52, 85),
+           4: (16, 72, 110), 5: (9, 95, 150)}
+DPE_WEIGHTS = {'A': 2, 'B': 5, 'C': 18, 'D': 32, 'E': 24, 'F': 12, 'G': 7}
+TAGS = ['Balcon', 'Terrasse', 'Parking', 'Ascenseur', 'Cave', 'Meublé',
+        'Gardien', 'Interphone', 'Digicode', 'Cuisine équipée', 'Parquet',
+        'Double vitrage', 'Calme', 'Lumineux', 'Vue dégagée', 'Jardin',
+        'Box', 'Local vélo', 'Fibre optique', 'Climatisation']
+SEARCHES = ['Lyon T2', 'Lyon T3 balcon', 'Villeurbanne < 900 €',
+            'Grandes surfaces', 'Meublés centre']
+
+OPENINGS = [
+    "Au cœur du quartier {quartier}, {kind} de {surface} m² {state}",
+    "{Kind} de {pieces} pièces situé à {quartier}, {state}",
+    "Exclusivité: {kind} traversant de {surface} m² proche {quartier}",
+    "Dans une résidence {building}, {kind} de {surface} m² {floor}",
+]
+FEATURES = [
+    "Il se compose d'une entrée avec placard, d'un séjour lumineux et d'une "
+    "cuisine {kitchen}",
+    "Le séjour de {living} m² donne sur {view}",
+    "{bedrooms} chambre(s) avec rangements, salle {bath} et WC séparés",
+    "Chauffage {heating}, eau chaude comprise dans les charges",
+    "Double vitrage, parquet au sol et volets roulants électriques",
+    "Proche commerces, écoles et transports (métro, tram, bus)",
+    "Stationnement facile, local vélos sécurisé",
+    "Disponible le {available}",
+]
+BOILERPLATE = [
+    "Loyer de {price} € charges comprises, dont {charges} € de provisions "
+    "sur charges avec régularisation annuelle",
+    "Honoraires charge locataire: {fees} € dont état des lieux",
+    "Dépôt de garantie: un mois de loyer hors charges",
+    "Les informations sur les risques auxquels ce bien est exposé sont "
+    "disponibles sur le site Géorisques: www.georisques.gouv.fr",
+    "Montant estimé des dépenses annuelles d'énergie pour un usage "
+    "standard: entre {energy_low} € et {energy_high} € par an",
+    "Contactez notre agence pour organiser une visite",
+]
+CHOICES = {
+    'state': ['refait à neuf', 'en très bon état', 'à rafraîchir',
+              'lumineux et calme', 'en parfait état'],
+    'building': ['sécurisée', 'de standing', 'récente', 'ancienne rénovée',
+                 'avec gardien'],
+    'kitchen': ['équipée', 'ouverte aménagée', 'indépendante',
+                'américaine équipée'],
+    'view': ['un balcon', 'une cour arborée', 'la rue', 'un jardin',
+             'les toits de Lyon'],
+    'bath': ["d'eau", 'de bains'],
+    'heating': ['individuel gaz', 'collectif', 'individuel électrique',
+                'urbain'],
+}
+
+
+def _price_text(value: int) -> str:
+    return f"{value:,}".replace(',', ' ') + ' €'
+
+
+def _etage(rng: random.Random) -> str:
+    floor = rng.choice([0, 1, 1, 2, 2, 3, 3, 4, 5, 6, 7])
+    return 'rez-de-chaussée' if floor == 0 else (
+        '1er' if floor == 1 else f'{floor}ème')
+
+
+def _description(rng: random.Random, fields: Dict) -> str:
+    """Description d'agence: ouverture, caractéristiques, mentions légales"""
+    values = dict(fields)
+    for key, options in CHOICES.items():
+        values[key] = rng.choice(options)
+    values['Kind'] = values['kind'].capitalize()
+    sentences = [rng.choice(OPENINGS)]
+    sentences += rng.sample(FEATURES, rng.randint(2, 5))
+    sentences += BOILERPLATE[:rng.randint(3, len(BOILERPLATE))]
+    return '. '.join(s.format(**values) for s in sentences) + '.'
+
+
+def generate(count: int, seed: int = DEFAULT_SEED,
+             enriched_rate: float = ENRICHED_RATE,
+             repost_rate: float = REPOST_RATE) -> Iterator[Dict]:
+    """
+    Annonces synthétiques, une à une (déterministe pour une graine)
+
+    Les annonces enrichies ont tous les champs de enrich_annonces.py; les
+    autres seulement ceux de scrap.py.
+    """
+    rng = random.Random(seed)
+    layouts = list(LAYOUTS)
+    layout_weights = [LAYOUTS[p][0] for p in layouts]
+    dpe_classes = list(DPE_WEIGHTS)
+    dpe_weights = list(DPE_WEIGHTS.values())
+    photos = []  # images d'annonces précédentes, pour les republications
+
+    for i in range(1, count + 1):
+        ville, code, quartier, lat, lng, rent_m2 = rng.choices(
+            QUARTIERS, QUARTIER_WEIGHTS)[0]
+        pieces = rng.choices(layouts, layout_weights)[0]
+        _, low, high = LAYOUTS[pieces]
+        surface = rng.randint(low, high)
+        chambres = max(0, pieces - 1)
+        # Loyer: €/m² du quartier, dégressif avec la surface, bruité
+        price_m2 = rent_m2 * (surface / 50) ** -0.15 * rng.lognormvariate(0, .12)
+        price = int(round(surface * price_m2 / 5) * 5)
+        kind = 'studio' if pieces == 1 else 'appartement'
+        location = f'{ville} ({code})'
+        slug = ville.lower().replace(' ', '-').replace('è', 'e')
+        annonce = {
+            'id': i,
+            'url': (f'https://www.seloger.com/annonces/locations/'
+                    f'appartement/{slug}/{200000000 + i}.htm'),
+            'title': (f'Studio {surface} m²' if pieces == 1 else
+                      f'Appartement {pieces} pièces {surface} m²'),
+            'price': _price_text(price),
+            'location': location,
+            'surface': f'{surface} m²',
+            'bedrooms': f'{chambres} chambres' if chambres else '',
+        }
+        if rng.random() < 0.3:
+            annonce['searches'] = rng.sample(SEARCHES, rng.randint(1, 2))
+        if rng.random() >= enriched_rate:
+            yield annonce
+            continue
+
+        if photos and rng.random() < repost_rate:
+            # Republication: mêmes photos qu'une annonce précédente
+            images = list(rng.choice(photos))
+        else:
+            folder = f'{rng.getrandbits(16):x}/{rng.getrandbits(16):x}'
+            images = [
+                f'https://v.seloger.com/s/crop/590x330/visuels/{folder}/'
+                f'{rng.getrandbits(48):012x}.jpg'
+                for _ in range(rng.randint(3, 15))
+            ]
+            photos.append(images)
+        fetched = EPOCH - timedelta(minutes=rng.randint(0, SPAN_DAYS * 1440))
+        published = fetched - timedelta(days=rng.randint(0, 30))
+        etage = _etage(rng)
+        dpe = rng.choices(dpe_classes, dpe_weights)[0]
+        ges = dpe_classes[min(6, max(0, dpe_classes.index(dpe) +
+                                     rng.randint(-2, 1)))]
+        energy = int(surface * (8 + 4 * dpe_classes.index(dpe)))
+        description = _description(rng, {
+            'quartier': quartier, 'kind': kind, 'surface': surface,
+            'pieces': pieces,
+            'floor': ('au rez-de-chaussée' if etage == 'rez-de-chaussée'
+                      else f'au {etage} étage'), 'bedrooms': chambres or 1,
+            'living': max(12, surface // 3), 'price': price,
+            'charges': price // 10, 'fees': int(surface * 11),
+            'energy_low': energy, 'energy_high': int(energy * 1.35),
+            'available': (fetched + timedelta(days=rng.randint(5, 45)))
+            .strftime('%d/%m/%Y'),
+        })
+        annonce.update({
+            'gps_latitude': round(lat + rng.gauss(0, 0.004), 6),
+            'gps_longitude': round(lng + rng.gauss(0, 0.005), 6),
+            'ville': location,
+            'quartier': quartier,
+            'dpe': dpe,
+            'ges': ges,
+            'images': images,
+            'tags': rng.sample(TAGS, rng.randint(2, 9)),
+            'surface_clean': str(surface),
+            'prix_clean': str(price),
+            'chambres_clean': str(chambres) if chambres else None,
+            'pieces_clean': str(pieces),
+            'etage_clean': None if etage == 'rez-de-chaussée' else etage,
+            'location_clean': f'{quartier}, {location}',
+            'date_recuperation': fetched.isoformat(),
+            'date_publication': published.date().isoformat(),
+            'description': description,
+        })
+        yield annonce
+
+
+def write_changelog(path: str, annonces: List[Dict]) -> int:
+    """Publie les annonces dans un journal des modifications (par lots)"""
+    changelog = ChangeLog(path)
+    changes = 0
+    for start in range(0, len(annonces), CHANGELOG_BATCH):
+        changes += changelog.record(annonces[start:start + CHANGELOG_BATCH],
+                                    source='synthetic')
+    return changes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Génère des annonces synthétiques réalistes'
+    )
+    parser.add_argument('--count', type=int, default=SIZES[1],
+                        help=f'Nombre d\'annonces (défaut: {SIZES[1]})')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                        help=f'Graine (défaut: {DEFAULT_SEED})')
+    parser.add_argument('--enriched-rate', type=float, default=ENRICHED_RATE,
+                        help='Part d\'annonces enrichies '
+                             f'(défaut: {ENRICHED_RATE})')
+    parser.add_argument('--output',
+                        help='Fichier JSON, ou binaire si .sla')
+    parser.add_argument('--changelog',
+                        help='Journal des modifications à alimenter '
+                             '(visualiseur web)')
+    args = parser.parse_args(argv)
+    if not args.output and not args.changelog:
+        parser.error('--output ou --changelog requis')
+
+    start = time.perf_counter()
+    annonces = list(generate(args.count, args.seed, args.enriched_rate))
+    print(f"🧪 {len(annonces)} annonces générées en "
+          f"{time.perf_counter() - start:.2f} s (graine {args.seed})")
+    if args.output:
+        save(args.output, annonces)
+        print(f"💾 Annonces sauvegardées dans {args.output}")
+    if args.changelog:
+        changes = write_changelog(args.changelog, annonces)
+        print(f"📝 {changes} modifications ajoutées à {args.changelog}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""
+Export Parquet: requête sur des annonces sans prix ni surface connus
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import parquet_export  # noqa: E402
+
+
+@unittest.skipIf(parquet_export.pa is None, 'pyarrow non installé')
+class ParquetQueryTest(unittest.TestCase):
+
+    def test_query_without_known_price_prints_unknown_median(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'annonces.json')
+            output = os.path.join(tmp, 'parquet')
+            with open(source, 'w', encoding='utf-8') as f:
+                f.write('[{"url": "https://x/1", "title": "t", '
+                        '"price": "Prix sur demande"}]')
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                parquet_export.main(['write', '--input', source,
+                                     '--output', output])
+                parquet_export.main(['query', '--output', output])
+        self.assertIn('Prix médian ? €, surface médiane ? m²', out.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
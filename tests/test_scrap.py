@@ -0,0 +1,116 @@
+"""
+Scraping et journal des modifications: seul un résultat complet retire des
+annonces
+
+La session HTTP et le parsing des pages sont remplacés par des pages
+factices; le reste de scrap.main() tourne tel quel.
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import scrap  # noqa: E402
+from changelog import ChangeLog  # noqa: E402
+
+
+def annonce(i: int):
+    return {'url': f'https://www.seloger.com/annonces/{i}.htm',
+            'title': f'Appartement {i}', 'price': f'{1000 + i} €',
+            'location': 'Lyon', 'surface': '70 m²', 'bedrooms': '3 ch'}
+
+
+class FakeResponse:
+    def __init__(self, page):
+        self.status_code = 200
+        self.content = page
+
+
+class FakeSession:
+    """pages: une liste d'annonces par page, ou une exception à lever"""
+
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.cookies = []
+
+    def get(self, url, **kwargs):
+        page = self.pages.pop(0) if self.pages else []
+        if isinstance(page, Exception):
+            raise page
+        return FakeResponse(page)
+
+
+def fake_scraper(pages):
+    scraper = scrap.SeLogerScraper.__new__(scrap.SeLogerScraper)
+    scraper._s = FakeSession(pages)
+    scraper._last_request_time = 0
+    scraper._min_delay = 0
+    scraper.max_requests = None
+    scraper.requests_made = 0
+    scraper._home_visited = True
+    scraper.quiet = True
+    scraper.complete = True
+    # Les pages factices sont déjà des listes d'annonces
+    scraper._parse_listings = lambda page: [dict(a) for a in page]
+    return scraper
+
+
+class ScrapChangeLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.changelog = os.path.join(self.tmp.name, 'changes.ndjson')
+        self.output = os.path.join(self.tmp.name, 'annonces.json')
+        # Annonces connues: 0 à 5 (dont une enrichie)
+        known = [annonce(i) for i in range(6)]
+        known[4] = {**known[4], 'description': 'Balcon', 'dpe': 'C'}
+        ChangeLog(self.changelog).record(known, source='scrap')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_scrap(self, pages, *argv):
+        scraper = fake_scraper(pages)
+        with mock.patch.object(scrap, 'SeLogerScraper',
+                               return_value=scraper), \
+                mock.patch.object(scrap.time, 'sleep'), \
+                mock.patch.object(scrap.random, 'uniform', return_value=0):
+            scrap.main(['--output', self.output, '--changelog',
+                        self.changelog, '--quiet', *argv])
+        return scraper
+
+    def known_urls(self):
+        _, current = ChangeLog(self.changelog).state()
+        return set(current)
+
+    def test_interrupted_run_keeps_unseen_annonces(self):
+        pages = [[annonce(0), annonce(1)], OSError('connexion perdue')]
+        scraper = self.run_scrap(pages, '--max-pages', '5', '--prune-missing')
+        self.assertFalse(scraper.complete)
+        self.assertEqual(self.known_urls(),
+                         {annonce(i)['url'] for i in range(6)})
+
+    def test_max_pages_reached_keeps_unseen_annonces(self):
+        pages = [[annonce(0), annonce(1)], [annonce(2)]]
+        scraper = self.run_scrap(pages, '--max-pages', '1', '--prune-missing')
+        self.assertFalse(scraper.complete)
+        self.assertEqual(len(self.known_urls()), 6)
+
+    def test_complete_run_prunes_only_on_request(self):
+        pages = [[annonce(0), annonce(1)], [annonce(2)], []]
+        scraper = self.run_scrap(list(pages), '--max-pages', '5')
+        self.assertTrue(scraper.complete)
+        self.assertEqual(len(self.known_urls()), 6)
+
+        self.run_scrap(list(pages), '--max-pages', '5', '--prune-missing')
+        self.assertEqual(self.known_urls(),
+                         {annonce(i)['url'] for i in range(3)})
+
+
+if __name__ == '__main__':
+    unittest.main()
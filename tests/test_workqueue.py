@@ -0,0 +1,173 @@
+"""
+File de travail partagée: baux, échecs et reprise entre processus
+
+Chaque test ouvre sa propre file SQLite dans un dossier temporaire; les
+workers tournent dans des processus séparés, comme sur plusieurs machines.
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from workqueue import (DONE, FAILED, LEASED, PENDING, WorkQueue,  # noqa: E402
+                       claimed)
+
+LEASE = 0.5  # secondes: assez court pour voir les baux expirer
+
+
+def annonces(count: int):
+    return [{'url': f'https://example.test/{i}', 'title': f'Annonce {i}'}
+            for i in range(count)]
+
+
+def claim_and_die(path: str, count: int):
+    """Worker qui prend des annonces puis meurt sans rendre ses baux"""
+    queue = WorkQueue(path, lease_seconds=LEASE)
+    queue.claim('mort', limit=count)
+    os._exit(1)
+
+
+def drain(path: str, worker: str, results):
+    """Worker qui enrichit tout ce qu'il peut prendre, jusqu'à épuisement"""
+    queue = WorkQueue(path, lease_seconds=LEASE, max_attempts=2)
+    done = []
+    for annonce in claimed(queue, worker, poll=0.05):
+        remaining = queue.complete(worker, annonce['url'],
+                                   {**annonce, 'worker': worker})
+        if remaining is not None:
+            done.append(annonce['url'])
+    results.put((worker, done, queue.emptied))
+    queue.close()
+
+
+class WorkQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'queue.sqlite')
+        self.ctx = multiprocessing.get_context('spawn')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def queue(self, **kwargs) -> WorkQueue:
+        queue = WorkQueue(self.path, lease_seconds=LEASE, **kwargs)
+        self.addCleanup(queue.close)
+        return queue
+
+    def run_process(self, target, *args):
+        process = self.ctx.Process(target=target, args=(self.path, *args))
+        process.start()
+        process.join(30)
+        return process
+
+    def test_killed_worker_lease_is_reclaimed(self):
+        queue = self.queue()
+        queue.seed(annonces(3))
+        process = self.run_process(claim_and_die, 2)
+        self.assertEqual(process.exitcode, 1)
+        self.assertEqual(queue.workers(), {'mort': 2})
+
+        # Bail encore valide: seule l'annonce libre est prise
+        taken = queue.claim('vivant', limit=3)
+        self.assertEqual([a['url'] for a in taken],
+                         ['https://example.test/2'])
+
+        time.sleep(LEASE + 0.1)
+        # Le vivant prolonge son bail (heartbeat), pas le mort
+        self.assertEqual(queue.heartbeat('vivant'), 1)
+        taken = queue.claim('vivant', limit=3)
+        self.assertEqual(len(taken), 2)
+        self.assertEqual(queue.workers(), {'vivant': 3})
+        queue.complete('vivant', 'https://example.test/2', {})
+        remaining = [queue.complete('vivant', a['url'], a) for a in taken]
+        self.assertEqual(remaining, [1, 0])
+        self.assertEqual(queue.retried(), 2)
+
+    def test_fail_requeues_then_fails_after_max_attempts(self):
+        queue = self.queue(max_attempts=2)
+        queue.seed(annonces(2))
+        url = 'https://example.test/0'
+
+        self.assertEqual(queue.claim('a')[0]['url'], url)
+        self.assertEqual(queue.fail('a', url, 'timeout'), 2)
+        self.assertEqual(queue.counts()[PENDING], 2)
+        # Un worker qui ne tient pas l'annonce ne peut pas la rendre
+        self.assertIsNone(queue.fail('b', url, 'timeout'))
+
+        self.assertEqual(queue.claim('b')[0]['url'], url)
+        self.assertEqual(queue.fail('b', url, 'timeout'), 1)
+        counts = queue.counts()
+        self.assertEqual((counts[PENDING], counts[FAILED]), (1, 1))
+
+        self.assertEqual(queue.requeue(), 1)
+        self.assertEqual(queue.counts()[PENDING], 2)
+
+    def test_late_complete_is_dropped(self):
+        queue = self.queue()
+        queue.seed(annonces(1))
+        url = 'https://example.test/0'
+
+        queue.claim('lent')
+        time.sleep(LEASE + 0.1)
+        self.assertEqual(queue.claim('rapide')[0]['url'], url)
+        self.assertEqual(queue.complete('rapide', url, {'url': url,
+                                                        'by': 'rapide'}), 0)
+        self.assertIsNone(queue.complete('lent', url, {'url': url,
+                                                       'by': 'lent'}))
+        self.assertEqual(list(queue.results()), [{'url': url, 'by': 'rapide'}])
+
+    def test_release_gives_back_without_counting_an_attempt(self):
+        queue = self.queue(max_attempts=1)
+        queue.seed(annonces(3))
+        queue.claim('partant', limit=2)
+        self.assertEqual(queue.release('partant'), 2)
+        counts = queue.counts()
+        self.assertEqual((counts[PENDING], counts[LEASED]), (3, 0))
+        # max_attempts=1: sans release, ces annonces seraient déjà épuisées
+        self.assertEqual(len(queue.claim('suivant', limit=3)), 3)
+        self.assertEqual(queue.counts()[LEASED], 3)
+
+    def test_last_item_expired_by_sweep_empties_queue(self):
+        queue = self.queue(max_attempts=1)
+        queue.seed(annonces(1))
+        self.run_process(claim_and_die, 1)
+
+        # L'annonce du worker mort passe en échec pendant une prise: ce
+        # worker ne verra jamais remaining == 0, c'est à lui d'exporter
+        self.assertEqual(list(claimed(queue, 'survivant', poll=0.05)), [])
+        self.assertTrue(queue.emptied)
+        self.assertEqual(queue.counts()[FAILED], 1)
+
+    def test_workers_share_queue_and_survive_a_crash(self):
+        queue = self.queue(max_attempts=2)
+        items = annonces(30)
+        queue.seed(items)
+        self.run_process(claim_and_die, 3)
+
+        results = self.ctx.Queue()
+        workers = [self.ctx.Process(target=drain,
+                                    args=(self.path, f'w{i}', results))
+                   for i in range(3)]
+        for process in workers:
+            process.start()
+        reports = [results.get(timeout=60) for _ in workers]
+        for process in workers:
+            process.join(30)
+
+        done = [url for _, urls, _ in reports for url in urls]
+        self.assertEqual(sorted(done), sorted(a['url'] for a in items))
+        self.assertEqual(queue.counts()[DONE], len(items))
+        self.assertEqual(queue.retried(), 3)
+        self.assertEqual([a['url'] for a in queue.results()],
+                         [a['url'] for a in items])
+
+
+if __name__ == '__main__':
+    unittest.main()
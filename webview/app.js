@@ -3,10 +3,32 @@ let annoncesList = [];
 let filteredAnnonces = [];
 const DATA_URL = '/api/annonces'; // URL du proxy serveur
 const LOCAL_CACHE = 'annonces_cache.json'; // Fichier de cache local
+const CHANGES_URL = '/api/annonces/changes'; // Modifications depuis un curseur
+const REFRESH_DELAY = 5 * 60 * 1000; // Rafraîchissement incrémental (ms)
+const EVENTS_URL = '/api/events'; // Flux temps réel (Server-Sent Events)
+const COLUMNS_URL = '/api/annonces/columns'; // Payload compact liste/carte
+const DETAIL_URL = '/api/annonces/'; // Détail d'une annonce: DETAIL_URL + sid
+const SEARCH_URL = '/api/annonces?q='; // Recherche plein texte classée
+const STATS_URL = '/api/stats'; // Facettes et histogrammes (filtres actifs)
+
+// Numéro de la dernière requête /api/stats (les réponses dépassées sont ignorées)
+let statsRequest = 0;
+
+// Résultats de la recherche serveur: url -> rang (null = filtre local)
+let searchRanks = null;
+let searchedTerm = '';
+
+// Copie locale persistée dans IndexedDB, mise à jour par deltas
+const DB_NAME = 'annonces-db';
+const DB_VERSION = 1;
+let localDb = null;
+let localAnnonces = new Map(); // url -> annonce
+let changesCursor = 0;
 
 // Carte
 let map = null;
 let markersLayer = null;
+const markersByUrl = new Map(); // url -> marqueur, pour les mises à jour live
 let currentView = 'list'; // 'list' ou 'map'
 
 // Debounce timer pour optimiser les filtres
@@ -84,12 +106,35 @@ function debouncedFilter() {
     totalAnnoncesSpan.style.opacity = '0.5';
     
     // Créer un nouveau timer
-    filterDebounceTimer = setTimeout(() => {
+    filterDebounceTimer = setTimeout(async () => {
+        await updateSearchRanks();
         filterAnnonces();
         totalAnnoncesSpan.style.opacity = '1';
     }, DEBOUNCE_DELAY);
 }
 
+// Recherche plein texte côté serveur (accents, pluriels, "-terme" exclut)
+async function updateSearchRanks() {
+    const term = searchInput.value.trim();
+    if (term === searchedTerm) return;
+    searchedTerm = term;
+    if (!term) {
+        searchRanks = null;
+        return;
+    }
+    try {
+        const response = await fetch(`${SEARCH_URL}${encodeURIComponent(term)}&limit=0`);
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        const data = await response.json();
+        // Une frappe plus récente a déjà relancé la recherche
+        if (searchedTerm !== term) return;
+        searchRanks = new Map(data.results.map((result, rank) => [result.url, rank]));
+    } catch (error) {
+        console.warn('Recherche serveur indisponible, filtre local:', error);
+        searchRanks = null;
+    }
+}
+
 // Toggle des filtres avancés
 function toggleAdvancedFilters() {
     const isVisible = advancedFilters.style.display !== 'none';
@@ -104,21 +149,42 @@ async function loadAnnonces() {
         errorElement.style.display = 'none';
         annoncesContainer.innerHTML = '';
 
-        // Essayer de charger depuis l'URL
-        let response = await fetch(DATA_URL);
-        
-        if (!response.ok) {
-            // Si l'URL échoue, essayer le cache local
-            console.log('Tentative de chargement depuis le cache local...');
-            response = await fetch(LOCAL_CACHE);
+        // Copie locale + delta depuis le dernier curseur, si le serveur a un journal
+        let synced = false;
+        try {
+            await openLocalAnnonces();
+            synced = await syncAnnonces();
+        } catch (error) {
+            console.warn('Synchronisation incrémentale impossible:', error);
+            // Hors ligne: la dernière copie IndexedDB suffit pour afficher
+            synced = localAnnonces.size > 0;
         }
-        
-        if (!response.ok) {
-            throw new Error(`Erreur HTTP: ${response.status}`);
+
+        if (synced) {
+            annoncesList = Array.from(localAnnonces.values(), recordToAnnonce);
+            startLiveUpdates();
+        } else {
+            // Payload compact: descriptions et images chargées à la demande
+            annoncesList = await loadCompactAnnonces();
         }
 
-        const data = await response.json();
-        annoncesList = Array.isArray(data) ? data : [data];
+        if (annoncesList === null) {
+            // Essayer de charger depuis l'URL
+            let response = await fetch(DATA_URL);
+
+            if (!response.ok) {
+                // Si l'URL échoue, essayer le cache local
+                console.log('Tentative de chargement depuis le cache local...');
+                response = await fetch(LOCAL_CACHE);
+            }
+
+            if (!response.ok) {
+                throw new Error(`Erreur HTTP: ${response.status}`);
+            }
+
+            const data = await response.json();
+            annoncesList = Array.isArray(data) ? data : [data];
+        }
         filteredAnnonces = [...annoncesList];
         
         loadingElement.style.display = 'none';
@@ -136,23 +202,348 @@ async function loadAnnonces() {
     }
 }
 
+// Charger le payload colonnes (null si le serveur ne le fournit pas)
+async function loadCompactAnnonces() {
+    let response;
+    try {
+        response = await fetch(COLUMNS_URL);
+    } catch (error) {
+        return null;
+    }
+    if (!response.ok) return null;
+
+    const payload = await response.json();
+    const { columns, dictionaries, count } = payload;
+    const annonces = new Array(count);
+    for (let i = 0; i < count; i++) {
+        const row = {};
+        for (const name in columns) {
+            const value = columns[name][i];
+            row[name] = dictionaries[name] ? dictionaries[name][value] : value;
+        }
+        annonces[i] = compactToAnnonce(row);
+    }
+    return annonces;
+}
+
+// Convertir une ligne compacte au format utilisé par l'affichage
+function compactToAnnonce(row) {
+    const facts = [];
+    if (row.surface != null) {
+        facts.push({ type: 'livingSpace', value: `${row.surface} m²`, splitValue: String(row.surface) });
+    }
+    if (row.pieces != null) {
+        facts.push({ type: 'numberOfRooms', value: `${row.pieces} pièces`, splitValue: String(row.pieces) });
+    }
+    if (row.chambres != null) {
+        facts.push({ type: 'numberOfBedrooms', value: `${row.chambres} chambres`, splitValue: String(row.chambres) });
+    }
+
+    return {
+        id: row.sid,
+        sid: row.sid,
+        compact: true, // description et images complètes non chargées
+        hardFacts: {
+            title: row.title,
+            price: row.price != null
+                ? { value: row.price, formatted: `${row.price.toLocaleString('fr-FR')} €` }
+                : undefined,
+            facts
+        },
+        location: {
+            address: { city: row.ville, district: row.quartier },
+            coordinates: row.lat != null ? { latitude: row.lat, longitude: row.lng } : undefined
+        },
+        gallery: { images: row.image ? [{ url: row.image }] : [] },
+        energy: { dpe: row.dpe, ges: row.ges },
+        // Calculés par le serveur (analytics.py), absents sans NumPy
+        market: row.price_m2 != null
+            ? { priceM2: row.price_m2, deal: row.deal, dealRank: row.deal_rank }
+            : undefined
+    };
+}
+
+// Extraire un nombre de "1 200 €", "105,5 m²", "3 chambres"... (comme
+// export.parse_number côté serveur)
+function parseNumber(value) {
+    if (value == null || typeof value === 'boolean') return null;
+    if (typeof value === 'number') return value;
+    const match = String(value)
+        .replace(/(\d)[\s\u00a0\u202f](?=\d)/g, '$1')
+        .match(/\d+(?:[.,]\d+)?/);
+    return match ? parseFloat(match[0].replace(',', '.')) : null;
+}
+
+// Convertir une annonce du journal (format scrap.py / enrich_annonces.py)
+// au format utilisé par l'affichage, avec les champs de export.list_fields
+function recordToAnnonce(record) {
+    if (record.hardFacts) return record; // Déjà au format de l'affichage
+    const images = record.images || [];
+    const annonce = compactToAnnonce({
+        sid: record.url,
+        title: record.title || null,
+        price: parseNumber(record.prix_clean || record.price),
+        surface: parseNumber(record.surface_clean || record.surface),
+        pieces: parseNumber(record.pieces_clean),
+        chambres: parseNumber(record.chambres_clean || record.bedrooms),
+        ville: record.ville || record.location || null,
+        quartier: record.quartier || null,
+        dpe: record.dpe || null,
+        ges: record.ges || null,
+        lat: parseNumber(record.gps_latitude),
+        lng: parseNumber(record.gps_longitude),
+        image: images[0] || null
+    });
+    // Le journal contient déjà la description et toutes les images
+    annonce.url = record.url;
+    annonce.compact = false;
+    annonce.mainDescription = { headline: record.title, description: record.description };
+    annonce.gallery = { images: images.map(url => ({ url })) };
+    return annonce;
+}
+
+// Compléter une annonce compacte avec son détail (une seule fois)
+async function loadAnnonceDetails(annonce) {
+    const response = await fetch(`${DETAIL_URL}${encodeURIComponent(annonce.sid)}`);
+    if (!response.ok) {
+        throw new Error(`Erreur HTTP: ${response.status}`);
+    }
+    const detail = await response.json();
+
+    if (detail.hardFacts) {
+        Object.assign(annonce, detail);
+    } else {
+        annonce.url = detail.url;
+        annonce.mainDescription = { headline: detail.title, description: detail.description };
+        if (detail.images?.length) {
+            annonce.gallery = { images: detail.images.map(url => ({ url })) };
+        }
+    }
+    annonce.compact = false;
+}
+
+// Ouvrir la modal, en chargeant le détail si nécessaire
+async function openAnnonceDetails(annonce) {
+    if (annonce.compact) {
+        modalBody.innerHTML = '<div class="loading"><div class="spinner"></div></div>';
+        modal.style.display = 'block';
+        try {
+            await loadAnnonceDetails(annonce);
+        } catch (error) {
+            console.warn('Détail indisponible:', error);
+        }
+    }
+    showAnnonceDetails(annonce);
+}
+
+// Transformer une requête IndexedDB en promesse
+function idbRequest(request) {
+    return new Promise((resolve, reject) => {
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+// Ouvrir IndexedDB et charger la copie locale (sans IndexedDB: mémoire seule)
+async function openLocalAnnonces() {
+    if (!window.indexedDB) return;
+
+    const request = indexedDB.open(DB_NAME, DB_VERSION);
+    request.onupgradeneeded = () => {
+        const db = request.result;
+        db.createObjectStore('annonces', { keyPath: 'url' });
+        db.createObjectStore('meta');
+    };
+    localDb = await idbRequest(request);
+
+    const tx = localDb.transaction(['annonces', 'meta'], 'readonly');
+    const [annonces, cursor] = await Promise.all([
+        idbRequest(tx.objectStore('annonces').getAll()),
+        idbRequest(tx.objectStore('meta').get('cursor'))
+    ]);
+    localAnnonces = new Map(annonces.map(annonce => [annonce.url, annonce]));
+    changesCursor = cursor || 0;
+}
+
+// Récupérer et appliquer les modifications depuis le dernier curseur
+// Retourne false si le serveur n'a pas de journal des modifications
+async function syncAnnonces() {
+    const response = await fetch(`${CHANGES_URL}?since=${changesCursor}`);
+    if (response.status === 404) return false;
+    if (!response.ok) {
+        throw new Error(`Erreur HTTP: ${response.status}`);
+    }
+
+    const delta = await response.json();
+    applyDelta(delta);
+    if (localDb) {
+        await saveDelta(delta);
+    }
+    return true;
+}
+
+// Appliquer une delta à la copie en mémoire
+function applyDelta(delta) {
+    if (delta.reset) localAnnonces.clear();
+    delta.inserted.forEach(annonce => localAnnonces.set(annonce.url, annonce));
+    delta.updated.forEach(annonce => localAnnonces.set(annonce.url, annonce));
+    delta.removed.forEach(url => localAnnonces.delete(url));
+    changesCursor = delta.cursor;
+}
+
+// Persister une delta dans IndexedDB (une seule transaction)
+function saveDelta(delta) {
+    const tx = localDb.transaction(['annonces', 'meta'], 'readwrite');
+    const store = tx.objectStore('annonces');
+    if (delta.reset) store.clear();
+    delta.inserted.forEach(annonce => store.put(annonce));
+    delta.updated.forEach(annonce => store.put(annonce));
+    delta.removed.forEach(url => store.delete(url));
+    tx.objectStore('meta').put(delta.cursor, 'cursor');
+
+    return new Promise((resolve, reject) => {
+        tx.oncomplete = () => resolve();
+        tx.onerror = () => reject(tx.error);
+    });
+}
+
+// Rafraîchissement périodique: ne retélécharger que les modifications
+async function refreshAnnonces() {
+    const previousCursor = changesCursor;
+    try {
+        await syncAnnonces();
+    } catch (error) {
+        console.warn('Rafraîchissement impossible:', error);
+        return;
+    }
+    if (changesCursor === previousCursor) return;
+
+    annoncesList = Array.from(localAnnonces.values(), recordToAnnonce);
+    populateCityFilter(); // Garde la ville choisie
+    filterAnnonces();
+}
+
+// ==================== MISES À JOUR EN DIRECT ====================
+
+// S'abonner au flux SSE (repli: rafraîchissement périodique)
+function startLiveUpdates() {
+    if (!window.EventSource) {
+        setInterval(refreshAnnonces, REFRESH_DELAY);
+        return;
+    }
+
+    // Last-Event-ID est renvoyé automatiquement lors des reconnexions
+    const events = new EventSource(`${EVENTS_URL}?since=${changesCursor}`);
+    ['new', 'price', 'enriched', 'update', 'remove'].forEach(type => {
+        events.addEventListener(type, (e) => applyLiveEntry(JSON.parse(e.data)));
+    });
+    // Journal recréé côté serveur: repartir de zéro
+    events.addEventListener('reset', () => {
+        changesCursor = 0;
+        refreshAnnonces();
+    });
+}
+
+// Appliquer une entrée du journal reçue en direct
+function applyLiveEntry(entry) {
+    if (entry.seq <= changesCursor) return;
+
+    const delta = {
+        inserted: entry.op === 'insert' ? [entry.annonce] : [],
+        updated: entry.op === 'update' ? [entry.annonce] : [],
+        removed: entry.op === 'remove' ? [entry.url] : [],
+        cursor: entry.seq,
+        reset: false
+    };
+    applyDelta(delta);
+    if (localDb) {
+        saveDelta(delta).catch(error => console.warn('IndexedDB:', error));
+    }
+
+    const index = annoncesList.findIndex(a => a.url === entry.url);
+    if (entry.op === 'remove') {
+        if (index >= 0) annoncesList.splice(index, 1);
+        removeAnnonceFromView(entry.url);
+    } else {
+        const annonce = recordToAnnonce(entry.annonce);
+        if (index >= 0) annoncesList[index] = annonce;
+        else annoncesList.push(annonce);
+        upsertAnnonceInView(annonce);
+    }
+}
+
+// Insérer ou remplacer la carte et le marqueur d'une annonce
+function upsertAnnonceInView(annonce) {
+    const matches = matchesFilters(annonce);
+    const index = filteredAnnonces.findIndex(a => a.url === annonce.url);
+    if (index >= 0) {
+        if (matches) filteredAnnonces[index] = annonce;
+        else filteredAnnonces.splice(index, 1);
+    } else if (matches) {
+        filteredAnnonces.unshift(annonce);
+    }
+
+    // Liste vide (message "Aucune annonce"): rendu complet
+    if (!annoncesContainer.querySelector('.annonce-card')) {
+        renderAnnonces();
+        return;
+    }
+
+    const existing = findAnnonceCard(annonce.url);
+    if (matches) {
+        const card = createAnnonceCard(annonce);
+        card.classList.add('annonce-card-live');
+        if (existing) existing.replaceWith(card);
+        else annoncesContainer.prepend(card);
+    } else if (existing) {
+        existing.remove();
+    }
+
+    removeMapMarker(annonce.url);
+    if (matches && markersLayer) addMapMarker(annonce);
+    updateStats();
+}
+
+// Retirer la carte et le marqueur d'une annonce supprimée
+function removeAnnonceFromView(url) {
+    filteredAnnonces = filteredAnnonces.filter(a => a.url !== url);
+    const card = findAnnonceCard(url);
+    if (card) card.remove();
+    removeMapMarker(url);
+    updateStats();
+}
+
+function findAnnonceCard(url) {
+    if (!url) return null;
+    return annoncesContainer.querySelector(`.annonce-card[data-url="${CSS.escape(url)}"]`);
+}
+
 // Mettre à jour les statistiques
 function updateStats() {
     totalAnnoncesSpan.textContent = `${filteredAnnonces.length} annonce${filteredAnnonces.length > 1 ? 's' : ''}`;
 }
 
-// Remplir le filtre des villes
-function populateCityFilter() {
-    const cities = new Set();
-    annoncesList.forEach(annonce => {
-        const city = annonce.location?.address?.city;
-        if (city) cities.add(city);
-    });
-    
-    // Trier les villes par ordre alphabétique
-    const sortedCities = Array.from(cities).sort();
-    
-    // Vider et remplir le select
+// Remplir le filtre des villes (facettes du serveur, sinon parcours local)
+async function populateCityFilter() {
+    const request = ++statsRequest;
+    const stats = await fetchStats(statsQuery(getActiveFilters()));
+    if (request !== statsRequest) return;
+
+    let sortedCities;
+    if (stats) {
+        sortedCities = stats.facets.ville.map(facet => facet.value).sort();
+    } else {
+        const cities = new Set();
+        annoncesList.forEach(annonce => {
+            const city = annonce.location?.address?.city;
+            if (city) cities.add(city);
+        });
+        // Trier les villes par ordre alphabétique
+        sortedCities = Array.from(cities).sort();
+    }
+
+    // Vider et remplir le select (en gardant la ville choisie)
+    const selected = cityFilter.value;
     cityFilter.innerHTML = '<option value="">Toutes les villes</option>';
     sortedCities.forEach(city => {
         const option = document.createElement('option');
@@ -160,65 +551,137 @@ function populateCityFilter() {
         option.textContent = city;
         cityFilter.appendChild(option);
     });
+    cityFilter.value = sortedCities.includes(selected) ? selected : '';
+    if (stats) applyFacetCounts(stats);
 }
 
-// Filtrer les annonces
-function filterAnnonces() {
-    const searchTerm = searchInput.value.toLowerCase().trim();
-    const priceMin = parseFloat(priceMinInput.value) || 0;
-    const priceMax = parseFloat(priceMaxInput.value) || Infinity;
-    const surfaceMin = parseFloat(surfaceMinInput.value) || 0;
-    const surfaceMax = parseFloat(surfaceMaxInput.value) || Infinity;
-    const minBedrooms = parseInt(bedroomsFilter.value) || 0;
-    const minRooms = parseInt(roomsFilter.value) || 0;
-    const selectedCity = cityFilter.value;
-    
-    filteredAnnonces = annoncesList.filter(annonce => {
-        // Filtre de recherche textuelle
-        if (searchTerm) {
-            const title = (annonce.hardFacts?.title || annonce.mainDescription?.headline || '').toLowerCase();
-            const city = (annonce.location?.address?.city || '').toLowerCase();
-            const district = (annonce.location?.address?.district || '').toLowerCase();
-            const zipCode = (annonce.location?.address?.zipCode || '').toLowerCase();
-            const price = (annonce.hardFacts?.price?.formatted || '').toLowerCase();
-            const description = (annonce.mainDescription?.description || '').toLowerCase();
-            
-            const matchesSearch = title.includes(searchTerm) || 
-                                city.includes(searchTerm) || 
-                                district.includes(searchTerm) ||
-                                zipCode.includes(searchTerm) ||
-                                price.includes(searchTerm) ||
-                                description.includes(searchTerm);
-            
-            if (!matchesSearch) return false;
+// Paramètres de /api/stats correspondant aux filtres du visualiseur
+function statsQuery(filters) {
+    const params = new URLSearchParams();
+    if (filters.priceMin > 0) params.set('price_min', filters.priceMin);
+    if (Number.isFinite(filters.priceMax)) params.set('price_max', filters.priceMax);
+    if (filters.surfaceMin > 0) params.set('surface_min', filters.surfaceMin);
+    if (Number.isFinite(filters.surfaceMax)) params.set('surface_max', filters.surfaceMax);
+    if (filters.minBedrooms) params.set('chambres_min', filters.minBedrooms);
+    if (filters.minRooms) params.set('pieces_min', filters.minRooms);
+    if (filters.selectedCity) params.set('ville', filters.selectedCity);
+    // Recherche serveur uniquement (le filtre local n'a pas d'équivalent)
+    if (filters.searchTerm && searchRanks) params.set('q', searchInput.value.trim());
+    return params.toString();
+}
+
+// Facettes calculées par le serveur (null s'il ne les fournit pas)
+async function fetchStats(query) {
+    try {
+        const response = await fetch(query ? `${STATS_URL}?${query}` : STATS_URL);
+        if (!response.ok) return null;
+        return await response.json();
+    } catch (error) {
+        return null;
+    }
+}
+
+// Afficher le nombre d'annonces de chaque option, filtres actifs compris
+function applyFacetCounts(stats) {
+    const cityCounts = new Map(stats.facets.ville.map(facet => [facet.value, facet.count]));
+    for (const option of cityFilter.options) {
+        if (option.value) {
+            option.textContent = `${option.value} (${cityCounts.get(option.value) || 0})`;
         }
-        
-        // Filtre de prix
-        const price = extractPrice(annonce.hardFacts?.price?.value || annonce.rawData?.price);
-        if (price < priceMin || price > priceMax) return false;
-        
-        // Filtre de surface
-        const surface = extractSurface(annonce);
-        if (surface < surfaceMin || surface > surfaceMax) return false;
-        
-        // Filtre de chambres
-        const bedrooms = extractBedrooms(annonce);
-        if (bedrooms < minBedrooms) return false;
-        
-        // Filtre de pièces
-        const rooms = extractRooms(annonce);
-        if (rooms < minRooms) return false;
-        
-        // Filtre de ville
-        if (selectedCity) {
-            const annonceCity = annonce.location?.address?.city || '';
-            if (annonceCity !== selectedCity) return false;
+    }
+    // "3+": annonces avec au moins 3 chambres (ou pièces)
+    for (const [select, facet] of [[bedroomsFilter, 'chambres'], [roomsFilter, 'pieces']]) {
+        for (const option of select.options) {
+            if (!option.value) continue;
+            const minimum = parseInt(option.value);
+            const count = stats.facets[facet]
+                .filter(item => item.value >= minimum)
+                .reduce((total, item) => total + item.count, 0);
+            option.dataset.label = option.dataset.label || option.textContent;
+            option.textContent = `${option.dataset.label} (${count})`;
         }
+    }
+}
+
+// Recalculer les compteurs des options après un changement de filtre
+async function refreshFacetCounts() {
+    const request = ++statsRequest;
+    const stats = await fetchStats(statsQuery(getActiveFilters()));
+    if (stats && request === statsRequest) applyFacetCounts(stats);
+}
+
+// Lire les valeurs courantes des filtres
+function getActiveFilters() {
+    return {
+        searchTerm: searchInput.value.toLowerCase().trim(),
+        priceMin: parseFloat(priceMinInput.value) || 0,
+        priceMax: parseFloat(priceMaxInput.value) || Infinity,
+        surfaceMin: parseFloat(surfaceMinInput.value) || 0,
+        surfaceMax: parseFloat(surfaceMaxInput.value) || Infinity,
+        minBedrooms: parseInt(bedroomsFilter.value) || 0,
+        minRooms: parseInt(roomsFilter.value) || 0,
+        selectedCity: cityFilter.value
+    };
+}
+
+// Tester une annonce contre les filtres actifs
+function matchesFilters(annonce, filters = getActiveFilters()) {
+    const { searchTerm, priceMin, priceMax, surfaceMin, surfaceMax,
+            minBedrooms, minRooms, selectedCity } = filters;
+
+    // Filtre de recherche textuelle (index du serveur si disponible)
+    if (searchTerm && searchRanks) {
+        if (!searchRanks.has(annonce.url)) return false;
+    } else if (searchTerm) {
+        const title = (annonce.hardFacts?.title || annonce.mainDescription?.headline || '').toLowerCase();
+        const city = (annonce.location?.address?.city || '').toLowerCase();
+        const district = (annonce.location?.address?.district || '').toLowerCase();
+        const zipCode = (annonce.location?.address?.zipCode || '').toLowerCase();
+        const price = (annonce.hardFacts?.price?.formatted || '').toLowerCase();
+        const description = (annonce.mainDescription?.description || '').toLowerCase();
         
-        return true;
-    });
+        const matchesSearch = title.includes(searchTerm) || 
+                            city.includes(searchTerm) || 
+                            district.includes(searchTerm) ||
+                            zipCode.includes(searchTerm) ||
+                            price.includes(searchTerm) ||
+                            description.includes(searchTerm);
+        
+        if (!matchesSearch) return false;
+    }
+    
+    // Filtre de prix
+    const price = extractPrice(annonce.hardFacts?.price?.value || annonce.rawData?.price);
+    if (price < priceMin || price > priceMax) return false;
+    
+    // Filtre de surface
+    const surface = extractSurface(annonce);
+    if (surface < surfaceMin || surface > surfaceMax) return false;
+    
+    // Filtre de chambres
+    const bedrooms = extractBedrooms(annonce);
+    if (bedrooms < minBedrooms) return false;
+    
+    // Filtre de pièces
+    const rooms = extractRooms(annonce);
+    if (rooms < minRooms) return false;
+    
+    // Filtre de ville
+    if (selectedCity) {
+        const annonceCity = annonce.location?.address?.city || '';
+        if (annonceCity !== selectedCity) return false;
+    }
+    
+    return true;
+}
+
+// Filtrer les annonces
+function filterAnnonces() {
+    const filters = getActiveFilters();
+    filteredAnnonces = annoncesList.filter(annonce => matchesFilters(annonce, filters));
     
     sortAnnonces();
+    refreshFacetCounts();
 }
 
 // Extraire le nombre de chambres
@@ -254,6 +717,10 @@ function sortAnnonces() {
     const sortValue = sortSelect.value;
     
     if (!sortValue) {
+        if (searchRanks) {
+            // Par défaut, les résultats d'une recherche sont classés par pertinence
+            filteredAnnonces.sort((a, b) => searchRanks.get(a.url) - searchRanks.get(b.url));
+        }
         renderAnnonces();
         return;
     }
@@ -267,6 +734,11 @@ function sortAnnonces() {
             const surfaceA = extractSurface(a) || 0;
             const surfaceB = extractSurface(b) || 0;
             return sortValue === 'surface-asc' ? surfaceA - surfaceB : surfaceB - surfaceA;
+        } else if (sortValue === 'price_m2-asc') {
+            // Annonces sans €/m² en fin de liste
+            return (a.market?.priceM2 ?? Infinity) - (b.market?.priceM2 ?? Infinity);
+        } else if (sortValue === 'deal-desc') {
+            return (b.market?.deal ?? -Infinity) - (a.market?.deal ?? -Infinity);
         }
         return 0;
     });
@@ -312,9 +784,12 @@ function resetFilters() {
     bedroomsFilter.value = '';
     roomsFilter.value = '';
     cityFilter.value = '';
+    searchRanks = null;
+    searchedTerm = '';
     filteredAnnonces = [...annoncesList];
     updateStats();
     renderAnnonces();
+    refreshFacetCounts();
 }
 
 // Afficher les annonces
@@ -352,7 +827,8 @@ function renderAnnonces() {
 function createAnnonceCard(annonce) {
     const card = document.createElement('div');
     card.className = 'annonce-card';
-    card.onclick = () => showAnnonceDetails(annonce);
+    if (annonce.url) card.dataset.url = annonce.url;
+    card.onclick = () => openAnnonceDetails(annonce);
 
     const imageUrl = getMainImage(annonce);
     const title = truncateText(
@@ -401,6 +877,7 @@ function createAnnonceCard(annonce) {
             </div>
             ${floor ? `<div class="annonce-info-item" style="margin-top: 0.5rem;">📶 ${floor}</div>` : ''}
             <div class="annonce-price">${price}</div>
+            ${renderDeal(annonce.market)}
             ${renderTags(tags)}
         </div>
     `;
@@ -408,6 +885,17 @@ function createAnnonceCard(annonce) {
     return card;
 }
 
+// Écart du prix au m² à la référence du quartier
+function renderDeal(market) {
+    if (!market || market.deal == null) return '';
+    const percent = Math.round(Math.abs(market.deal) * 100);
+    const label = market.deal >= 0
+        ? `${percent} % sous la médiane du quartier`
+        : `${percent} % au-dessus de la médiane du quartier`;
+    const good = market.deal >= 0.1 ? ' good' : '';
+    return `<div class="annonce-deal${good}">${market.priceM2} €/m² · ${label}</div>`;
+}
+
 // Obtenir l'image principale
 function getMainImage(annonce) {
     if (annonce.gallery?.images && annonce.gallery.images.length > 0) {
@@ -602,6 +1090,7 @@ function updateMapMarkers() {
     
     // Vider les marqueurs existants
     markersLayer.clearLayers();
+    markersByUrl.clear();
     
     // Filtrer les annonces avec coordonnées GPS
     const annoncesWithCoords = filteredAnnonces.filter(annonce => {
@@ -621,40 +1110,8 @@ function updateMapMarkers() {
     const bounds = [];
     
     annoncesWithCoords.forEach(annonce => {
-        const coords = getAnnonceCoordinates(annonce);
-        if (!coords) return;
-        
-        bounds.push([coords.lat, coords.lng]);
-        
-        // Créer un marqueur personnalisé avec le prix
-        const price = annonce.hardFacts?.price?.value || 
-                     (annonce.rawData?.price ? `${annonce.rawData.price} €` : 'N/A');
-        
-        const icon = L.divIcon({
-            className: 'custom-marker',
-            html: `<div class="price-marker">${price}</div>`,
-            iconSize: [80, 40],
-            iconAnchor: [40, 40]
-        });
-        
-        const marker = L.marker([coords.lat, coords.lng], { icon })
-            .addTo(markersLayer);
-        
-        // Créer le popup
-        const popupContent = createMapPopup(annonce);
-        marker.bindPopup(popupContent, {
-            maxWidth: 300,
-            className: 'custom-popup'
-        });
-        
-        // Gérer le clic sur le marqueur
-        marker.on('click', () => {
-            // Mettre en surbrillance le marqueur
-            document.querySelectorAll('.price-marker').forEach(m => {
-                m.classList.remove('selected');
-            });
-            marker.getElement().querySelector('.price-marker').classList.add('selected');
-        });
+        const coords = addMapMarker(annonce);
+        if (coords) bounds.push([coords.lat, coords.lng]);
     });
     
     // Ajuster la vue pour montrer tous les marqueurs
@@ -663,6 +1120,54 @@ function updateMapMarkers() {
     }
 }
 
+// Ajouter le marqueur d'une annonce, retourne ses coordonnées
+function addMapMarker(annonce) {
+    const coords = getAnnonceCoordinates(annonce);
+    if (!coords) return null;
+    
+    // Créer un marqueur personnalisé avec le prix
+    const price = annonce.hardFacts?.price?.value || 
+                 (annonce.rawData?.price ? `${annonce.rawData.price} €` : 'N/A');
+    
+    const icon = L.divIcon({
+        className: 'custom-marker',
+        html: `<div class="price-marker">${price}</div>`,
+        iconSize: [80, 40],
+        iconAnchor: [40, 40]
+    });
+    
+    const marker = L.marker([coords.lat, coords.lng], { icon })
+        .addTo(markersLayer);
+    if (annonce.url) markersByUrl.set(annonce.url, marker);
+    
+    // Créer le popup
+    const popupContent = createMapPopup(annonce);
+    marker.bindPopup(popupContent, {
+        maxWidth: 300,
+        className: 'custom-popup'
+    });
+    
+    // Gérer le clic sur le marqueur
+    marker.on('click', () => {
+        // Mettre en surbrillance le marqueur
+        document.querySelectorAll('.price-marker').forEach(m => {
+            m.classList.remove('selected');
+        });
+        marker.getElement().querySelector('.price-marker').classList.add('selected');
+    });
+    
+    return coords;
+}
+
+// Retirer le marqueur d'une annonce
+function removeMapMarker(url) {
+    const marker = markersByUrl.get(url);
+    if (marker) {
+        markersLayer.removeLayer(marker);
+        markersByUrl.delete(url);
+    }
+}
+
 // Obtenir les coordonnées d'une annonce
 function getAnnonceCoordinates(annonce) {
     // Coordonnées directes
@@ -856,9 +1361,28 @@ function createMapPopup(annonce) {
 function showAnnonceDetailsFromMap(annonceId) {
     const annonce = annoncesList.find(a => a.id === annonceId);
     if (annonce) {
-        showAnnonceDetails(annonce);
+        openAnnonceDetails(annonce);
     }
 }
 
 // Exposer les fonctions nécessaires au scope global pour les onclick
 window.showAnnonceDetailsFromMap = showAnnonceDetailsFromMap;
+
+// Mesures de performance: chaque appel devient une entrée
+// performance.measure (onglet Performance des DevTools, bench.py e2e)
+function traceStep(fn) {
+    return function (...args) {
+        const start = performance.now();
+        const done = () => performance.measure(fn.name, { start });
+        const result = fn.apply(this, args);
+        if (result && typeof result.then === 'function') {
+            return result.finally(done);
+        }
+        done();
+        return result;
+    };
+}
+
+loadAnnonces = traceStep(loadAnnonces);
+renderAnnonces = traceStep(renderAnnonces);
+updateMapMarkers = traceStep(updateMapMarkers);
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Fichiers statiques du visualiseur en mode production
+Le build minifie app.js et style.css, les renomme d'après leur contenu
+(app.<empreinte>.js), réécrit index.html en conséquence, génère le service
+worker (sw.js) et précompresse chaque fichier en gzip (et brotli si le
+module est installé). Un nom versionné ne change jamais de contenu: le
+serveur le sert avec un cache "immutable" d'un an, seuls index.html et
+sw.js sont revalidés (ETag).
+
+Usage: python3 assets.py [--output dist]
+       python3 server.py --dist   # build au démarrage puis service
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import time
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # Variantes .br non générées (gzip seul)
+    brotli = None
+
+WEBVIEW_DIR = os.path.dirname(os.path.abspath(__file__))
+DIST_DIR = os.path.join(WEBVIEW_DIR, 'dist')
+INDEX = 'index.html'
+SERVICE_WORKER = 'sw.js'
+HASHED = ('app.js', 'style.css')  # fichiers renommés d'après leur contenu
+HASH_LENGTH = 10
+MANIFEST = 'manifest.json'
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+# Encodages préférés, dans l'ordre (identity = fichier tel quel)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_HASHED_NAME = re.compile(r'\.[0-9a-f]{%d}\.' % HASH_LENGTH)
+# Mots après lesquels un / ouvre une expression régulière, pas une division
+_REGEX_KEYWORDS = frozenset((
+    'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete',
+    'void', 'throw', 'instanceof', 'yield', 'await',
+))
+# Après la parenthèse fermante de ces mots, une instruction commence:
+# "if (c) /a/.test(s)" est une regex, "(a + b) / 2" une division
+_STATEMENT_KEYWORDS = frozenset(('if', 'while', 'for', 'with'))
+_WORD_RE = re.compile(r'[\w$]+')
+
+SW_REGISTER = (
+    "<script>if ('serviceWorker' in navigator) "
+    "navigator.serviceWorker.register('sw.js');</script>"
+)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def _skip_quoted(source: str, i: int, quote: str) -> int:
+    """Fin (exclue) d'une chaîne ou d'une regex commençant en i"""
+    i += 1
+    in_class = False  # [...] d'une regex: / n'y termine rien
+    while i < len(source):
+        c = source[i]
+        if c == '\\':
+            i += 2
+            continue
+        if quote == '/' and c == '[':
+            in_class = True
+        elif quote == '/' and c == ']':
+            in_class = False
+        elif c == quote and not in_class:
+            return i + 1
+        elif c == '\n' and quote != '`':
+            raise ValueError(f"Littéral non terminé à l'offset {i}")
+        i += 1
+    raise ValueError("Littéral non terminé en fin de fichier")
+
+
+def _skip_template(source: str, i: int):
+    """
+    Fin d'un morceau de gabarit `...` commençant en i (après ` ou })
+
+    Returns:
+        (position après le morceau, True si le morceau ouvre un ${)
+    """
+    while i < len(source):
+        c = source[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == '`':
+            return i + 1, False
+        if c == '$' and source.startswith('${', i):
+            return i + 2, True
+        i += 1
+    raise ValueError("Gabarit non terminé en fin de fichier")
+
+
+def minify_js(source: str) -> str:
+    """
+    Minification sûre: commentaires et indentation supprimés, espaces
+    réduits, chaînes, gabarits et regex intacts
+
+    Les retours à la ligne sont gardés (insertion automatique des
+    points-virgules inchangée); gzip et brotli font le reste. Un / ouvre
+    une regex selon le type du jeton précédent: après une valeur (nom,
+    nombre, littéral, ")" ou "]", "++"), c'est une division.
+    """
+    out = []
+    braces = []  # accolades ouvertes: True = ${ d'un gabarit
+    parens = []  # parenthèses ouvertes: True = après if/while/for/with
+    regex_ok = True  # un / ici ouvrirait une regex
+    word = ''  # dernier jeton s'il s'agit d'un mot
+    i, n = 0, len(source)
+
+    def space(newline: bool):
+        if not out or out[-1] == '\n':
+            return
+        if newline:
+            if out[-1] == ' ':
+                out.pop()
+            out.append('\n')
+        elif out[-1] != ' ':
+            out.append(' ')
+
+    while i < n:
+        c = source[i]
+        if c in ' \t\r\n':
+            j = i
+            while j < n and source[j] in ' \t\r\n':
+                j += 1
+            space('\n' in source[i:j])
+            i = j
+            continue
+        if source.startswith('//', i):
+            j = source.find('\n', i)
+            i = n if j < 0 else j
+            continue
+        if source.startswith('/*', i):
+            j = source.find('*/', i + 2)
+            if j < 0:
+                raise ValueError("Commentaire non terminé")
+            space('\n' in source[i:j])
+            i = j + 2
+            continue
+        previous, word = word, ''
+        if c in '"\'' or (c == '/' and regex_ok):
+            j = _skip_quoted(source, i, c)
+            out.append(source[i:j])
+            regex_ok, i = False, j
+        elif c == '`' or (c == '}' and braces and braces[-1]):
+            if c == '}':
+                braces.pop()
+            j, opened = _skip_template(source, i + 1)
+            if opened:
+                braces.append(True)
+            out.append(source[i:j])
+            regex_ok, i = opened, j
+        elif c == '$' or c.isalnum() or c == '_':
+            word = _WORD_RE.match(source, i).group()
+            out.append(word)
+            regex_ok, i = word in _REGEX_KEYWORDS, i + len(word)
+        elif source.startswith(('++', '--'), i):
+            # "x++ / 2": division (un ++ préfixe n'est jamais suivi de /)
+            out.append(source[i:i + 2])
+            regex_ok, i = False, i + 2
+        else:
+            if c == '{':
+                braces.append(False)
+            elif c == '}' and braces:
+                braces.pop()
+            elif c == '(':
+                parens.append(previous in _STATEMENT_KEYWORDS)
+            out.append(c)
+            if c == ')':
+                regex_ok = parens.pop() if parens else False
+            else:
+                regex_ok = c != ']'
+            i += 1
+    return ''.join(out).strip() + '\n'
+
+
+def minify_css(source: str) -> str:
+    """Commentaires supprimés, espaces réduits autour de { } ; , :"""
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    # Pas d'espace avant ':' (sélecteurs "a :hover" ≠ "a:hover")
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    source = re.sub(r':\s+', ':', source)
+    source = source.replace(';}', '}')
+    return source.strip() + '\n'
+
+
+def minify_html(source: str) -> str:
+    """Commentaires et indentation supprimés (pas de <pre> dans la page)"""
+    source = re.sub(r'<!--.*?-->', '', source, flags=re.S)
+    lines = (line.strip() for line in source.splitlines())
+    return '\n'.join(line for line in lines if line) + '\n'
+
+
+def _write(path: str, data: bytes) -> Dict[str, int]:
+    """Écrit un fichier et ses variantes compressées; renvoie les tailles"""
+    sizes = {'identity': len(data)}
+    variants = [('', data), ('.gz', gzip.compress(data, 9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    for suffix, body in variants:
+        with open(path + suffix, 'wb') as f:
+            f.write(body)
+        if suffix:
+            sizes[suffix[1:]] = len(body)
+    return sizes
+
+
+def _remove_previous(output_dir: str):
+    """Supprime les fichiers du build précédent (listés par son manifeste)"""
+    path = os.path.join(output_dir, MANIFEST)
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        previous = json.load(f)
+    for entry in previous['files'].values():
+        for suffix in ('',) + tuple(suffix for _, suffix in ENCODINGS):
+            name = os.path.join(output_dir, entry['name'] + suffix)
+            if os.path.exists(name):
+                os.remove(name)
+    os.remove(path)
+
+
+def build(source_dir: str = WEBVIEW_DIR, output_dir: str = DIST_DIR) -> Dict:
+    """
+    Construit les fichiers de production dans output_dir
+
+    Returns:
+        Manifeste: nom source -> {name, sizes}, et version de la coquille
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    _remove_previous(output_dir)
+
+    def read(name: str) -> str:
+        with open(os.path.join(source_dir, name), 'r', encoding='utf-8') as f:
+            return f.read()
+
+    minifiers = {'.js': minify_js, '.css': minify_css}
+    files = {}
+    html = read(INDEX)
+    for name in HASHED:
+        base, ext = os.path.splitext(name)
+        data = minifiers[ext](read(name)).encode('utf-8')
+        hashed = f'{base}.{content_hash(data)}{ext}'
+        files[name] = (hashed, data)
+        # href="style.css" / src="app.js" -> nom versionné
+        html = re.sub(r'(\b(?:href|src)=")%s(")' % re.escape(name),
+                      r'\g<1>%s\g<2>' % hashed, html)
+
+    html = minify_html(html).replace('</body>', SW_REGISTER + '\n</body>')
+    files[INDEX] = (INDEX, html.encode('utf-8'))
+
+    # Coquille mise en cache par le service worker: la page, les fichiers
+    # versionnés et les feuilles / scripts du CDN (Leaflet)
+    external = re.findall(r'(?:href|src)="(https://[^"]+)"', html)
+    shell = ['./'] + [files[name][0] for name in HASHED] + external
+    version = content_hash(b''.join(files[name][1] for name in files))
+    worker = (read(SERVICE_WORKER)
+              .replace("'__VERSION__'", json.dumps(version))
+              .replace('__SHELL__', json.dumps(shell)))
+    files[SERVICE_WORKER] = (SERVICE_WORKER,
+                             minify_js(worker).encode('utf-8'))
+
+    manifest = {'version': version, 'files': {}}
+    for name, (target, data) in files.items():
+        sizes = _write(os.path.join(output_dir, target), data)
+        manifest['files'][name] = {'name': target, 'sizes': sizes}
+    with open(os.path.join(output_dir, MANIFEST), 'w',
+              encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class StaticAsset:
+    """Fichier de production en mémoire, avec ses variantes compressées"""
+
+    def __init__(self, path: str, name: str):
+        with open(path, 'rb') as f:
+            identity = f.read()
+        self.bodies = {'identity': identity}
+        for encoding, suffix in ENCODINGS:
+            if os.path.exists(path + suffix):
+                with open(path + suffix, 'rb') as f:
+                    self.bodies[encoding] = f.read()
+        self.content_type = (mimetypes.guess_type(name)[0] or
+                             'application/octet-stream')
+        if self.content_type.startswith('text/') or name.endswith('.js'):
+            self.content_type += '; charset=utf-8'
+        # Faible: même validateur pour toutes les variantes compressées
+        self.etag = f'W/"{content_hash(identity)}"'
+        self.cache_control = (IMMUTABLE if _HASHED_NAME.search(name)
+                              else REVALIDATE)
+
+    def negotiate(self, accept_encoding: Optional[str]) -> str:
+        """Meilleur encodage accepté par le client (br, gzip, identity)"""
+        accepted = set()
+        for part in (accept_encoding or '').split(','):
+            token, _, params = part.strip().partition(';')
+            if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00'):
+                accepted.add(token.strip().lower())
+        for encoding, _ in ENCODINGS:
+            if encoding in self.bodies and (encoding in accepted or
+                                            '*' in accepted):
+                return encoding
+        return 'identity'
+
+
+class StaticAssets:
+    """
+    Fichiers de production servis depuis la mémoire
+
+    Usage:
+        assets = StaticAssets.load(DIST_DIR)
+        asset = assets.get('/app.1a2b3c4d5e.js')
+    """
+
+    def __init__(self, files: Dict[str, StaticAsset], version: str):
+        self.files = files
+        self.version = version
+
+    @classmethod
+    def load(cls, dist_dir: str = DIST_DIR) -> 'StaticAssets':
+        with open(os.path.join(dist_dir, MANIFEST), 'r',
+                  encoding='utf-8') as f:
+            manifest = json.load(f)
+        files = {}
+        for entry in manifest['files'].values():
+            name = entry['name']
+            files['/' + name] = StaticAsset(os.path.join(dist_dir, name), name)
+        files['/'] = files['/' + INDEX]
+        return cls(files, manifest['version'])
+
+    def get(self, route: str) -> Optional[StaticAsset]:
+        return self.files.get(route)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Build de production du visualiseur (minifié, '
+                    'versionné, précompressé)'
+    )
+    parser.add_argument('--output', default=DIST_DIR,
+                        help='Répertoire de sortie (défaut: webview/dist)')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    manifest = build(WEBVIEW_DIR, args.output)
+    took = time.perf_counter() - start
+    print(f"📦 Build {manifest['version']} dans {args.output} "
+          f"en {took * 1000:.0f} ms")
+    for name, entry in manifest['files'].items():
+        sizes = entry['sizes']
+        original = os.path.getsize(os.path.join(WEBVIEW_DIR, name))
+        compressed = ', '.join(f"{encoding} {size / 1024:.1f} Ko"
+                               for encoding, size in sizes.items()
+                               if encoding != 'identity')
+        print(f"   {entry['name']:<24} {original / 1024:6.1f} Ko -> "
+              f"{sizes['identity'] / 1024:6.1f} Ko ({compressed})")
+    if brotli is None:
+        print("ℹ️  Module brotli absent: variantes gzip seulement")
+
+
+if __name__ == '__main__':
+    main()
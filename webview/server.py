@@ -1,21 +1,689 @@
 #!/usr/bin/env python3
 """
 Serveur web simple pour visualiser les annonces immobilières
-Usage: python3 server.py [URL_JSON]
+Usage: python3 server.py [URL_JSON] [--port PORT] [--single-thread] [--dist]
 """
+import argparse
+import bisect
+import http.client
 import http.server
+import json
 import socketserver
 import os
 import sys
+import tempfile
+import threading
+import time
 import urllib.request
 import urllib.error
+import urllib.parse
+from typing import Dict, List
+
+# Modules partagés avec les scripts du dossier parent
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import analytics  # noqa: E402
+import assets  # noqa: E402
+from changelog import CHANGELOG_FILE, ChangeLog, collapse_changes  # noqa: E402
+from export import list_fields, short_id, to_columns  # noqa: E402
+from facets import FILTER_PARAMS, FacetIndex  # noqa: E402
+from metrics import REGISTRY, time_stage  # noqa: E402
+import profiling  # noqa: E402
+from search_index import SearchIndex  # noqa: E402
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    'seloger_server_request_seconds', 'Durée de traitement des requêtes'
+)
+REQUESTS_TOTAL = REGISTRY.counter(
+    'seloger_server_requests_total', 'Requêtes servies par route et statut'
+)
+API_ROUTES = ('/api/annonces', '/api/annonces/changes',
+              '/api/annonces/columns', '/api/market', '/api/stats',
+              '/api/events', '/metrics')
 
 PORT = 8012
 CACHE_FILE = "annonces_cache.json"
 DATA_URL = None  # URL configurée via argument en ligne de commande
+UPSTREAM_TIMEOUT = 30
+REFRESH_INTERVAL = 300  # secondes entre deux rafraîchissements
+# Journal écrit par scrap.py / enrich_annonces.py (lancés depuis la racine)
+CHANGES_FILE = os.path.join(ROOT_DIR, CHANGELOG_FILE)
+CHANGES_POLL_INTERVAL = 1  # secondes entre deux lectures du journal
+SSE_HEARTBEAT = 15  # secondes sans événement avant un ping
+SEARCH_LIMIT = 100  # Résultats par défaut de /api/annonces?q=
+# Entrées du journal gardées en mémoire pour les deltas, au moins
+CHANGES_MIN_KEPT = 10000
+
+
+class UpstreamPool:
+    """Pool de connexions keep-alive vers les serveurs amont"""
+
+    def __init__(self, max_per_host: int = 4):
+        self.max_per_host = max_per_host
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _key(self, parsed):
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        return (parsed.scheme, parsed.hostname, port)
+
+    def _connect(self, key, timeout):
+        scheme, host, port = key
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=timeout)
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _acquire(self, key, timeout):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop()
+        return self._connect(key, timeout)
+
+    def _release(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def fetch(self, url: str, timeout: float = UPSTREAM_TIMEOUT,
+              etag: str = None):
+        """
+        Télécharge une URL en réutilisant une connexion existante
+
+        Lève urllib.error.URLError en cas d'échec, comme urlopen.
+
+        Args:
+            etag: ETag de la version déjà connue (requête conditionnelle)
+
+        Returns:
+            (données, ETag reçu); données à None si le serveur amont
+            répond 304 (version connue inchangée)
+        """
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme not in ('http', 'https'):
+            # Schémas exotiques (file://...) : pas de pool
+            with urllib.request.urlopen(url, timeout=timeout) as response:
+                return response.read(), None
+
+        key = self._key(parsed)
+        path = parsed.path or '/'
+        if parsed.query:
+            path += '?' + parsed.query
+
+        # Une connexion du pool peut avoir été fermée par le serveur amont:
+        # on réessaie une fois avec une connexion neuve
+        headers = {'Connection': 'keep-alive', 'Accept': 'application/json'}
+        if etag:
+            headers['If-None-Match'] = etag
+        for attempt in range(2):
+            if attempt == 0:
+                conn = self._acquire(key, timeout)
+            else:
+                conn = self._connect(key, timeout)
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                if attempt == 0:
+                    continue
+                raise urllib.error.URLError(e)
+
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+
+            if response.status == 304 and etag:
+                return None, etag
+            if response.status != 200:
+                raise urllib.error.HTTPError(
+                    url, response.status, response.reason,
+                    response.headers, None
+                )
+            return data, response.getheader('ETag')
+        raise urllib.error.URLError("échec du téléchargement")
+
+
+class SingleFlight:
+    """Regroupe les appels concurrents sur une même clé en un seul"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Exécute fn() une seule fois pour tous les appelants simultanés
+
+        Returns:
+            Le résultat de fn(), partagé entre les appelants
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'event': threading.Event(), 'result': None,
+                        'error': None}
+                self._calls[key] = call
+
+        if not leader:
+            call['event'].wait()
+        else:
+            try:
+                call['result'] = fn()
+            except Exception as e:
+                call['error'] = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call['event'].set()
+
+        if call['error'] is not None:
+            raise call['error']
+        return call['result']
+
+
+upstream_pool = UpstreamPool()
+upstream_flight = SingleFlight()
+
+
+def write_atomic(path: str, data: bytes):
+    """
+    Écrit un fichier de façon atomique (fichier temporaire + rename)
+
+    Un crash pendant l'écriture laisse l'ancien fichier intact.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=f'.{os.path.basename(path)}.', suffix='.tmp', dir=directory
+    )
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class DatasetSnapshot:
+    """
+    Version du jeu de données servi
+
+    `data` ne change jamais; `loaded_at`, `source` et `etag` suivent la
+    fraîcheur (un rafraîchissement sans changement garde le snapshot, et
+    donc les vues calculées dessus).
+    """
+    __slots__ = ('data', 'loaded_at', 'source', 'etag')
+
+    def __init__(self, data: bytes, loaded_at: float, source: str,
+                 etag: str = None):
+        self.data = data
+        self.loaded_at = loaded_at
+        self.source = source
+        self.etag = etag
+
+
+class AnnoncesDataset:
+    """
+    Jeu de données en mémoire, rafraîchi en arrière-plan
+
+    Les requêtes lisent toujours le snapshot courant sans attendre; un
+    rafraîchissement remplace le snapshot d'un seul coup (swap atomique).
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self.last_error = None
+        self.last_attempt = None
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    def swap(self, data: bytes, source: str, loaded_at: float = None,
+             etag: str = None):
+        """Remplace le jeu de données courant"""
+        self._snapshot = DatasetSnapshot(
+            data, loaded_at if loaded_at is not None else time.time(), source,
+            etag
+        )
+
+    def load_cache(self) -> bool:
+        """Charge le fichier cache en mémoire s'il existe"""
+        if not os.path.exists(CACHE_FILE):
+            return False
+        mtime = os.path.getmtime(CACHE_FILE)
+        current = self._snapshot
+        if current and current.source == 'cache' and current.loaded_at >= mtime:
+            return True
+        with open(CACHE_FILE, 'rb') as f:
+            data = f.read()
+        self.swap(data, 'cache', loaded_at=mtime)
+        print(f"📂 {CACHE_FILE} chargé en mémoire ({len(data)} octets)")
+        return True
+
+    def refresh(self):
+        """Télécharge DATA_URL, met à jour le cache et le snapshot"""
+        self.last_attempt = time.time()
+        try:
+            data = upstream_flight.do(DATA_URL, self._download)
+        except urllib.error.URLError as e:
+            self.last_error = str(e)
+            raise
+        self.last_error = None
+        return data
+
+    def _download(self) -> bytes:
+        print(f"📥 Téléchargement des annonces depuis {DATA_URL}...")
+        current = self._snapshot
+        with time_stage('http_fetch'):
+            data, etag = upstream_pool.fetch(
+                DATA_URL, etag=current.etag if current else None)
+        if current is not None and (data is None or current.data == data):
+            # Données inchangées (304 ou mêmes octets): seule la fraîcheur
+            # est mise à jour, les vues, la recherche et le marché restent
+            current.loaded_at = time.time()
+            current.source = 'upstream'
+            current.etag = etag or current.etag
+            return current.data
+        # Sauvegarder dans le cache
+        with time_stage('json_write'):
+            write_atomic(CACHE_FILE, data)
+        print(f"✅ Données sauvegardées dans {CACHE_FILE}")
+        self.swap(data, 'upstream', etag=etag)
+        return data
+
+    def is_stale(self, max_age: float) -> bool:
+        """Indique si le snapshot est plus vieux que max_age secondes"""
+        current = self._snapshot
+        if current is None:
+            return True
+        return self.last_error is not None or (
+            time.time() - current.loaded_at > max_age
+        )
+
+
+class BackgroundRefresher(threading.Thread):
+    """Thread qui rafraîchit le jeu de données à intervalle régulier"""
+
+    def __init__(self, dataset: AnnoncesDataset, interval: float):
+        super().__init__(name='annonces-refresher', daemon=True)
+        self.dataset = dataset
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                if DATA_URL:
+                    self.dataset.refresh()
+                else:
+                    # Pas d'URL: recharger le cache s'il a été remplacé
+                    self.dataset.load_cache()
+            except urllib.error.URLError as e:
+                print(f"⚠️ Erreur de téléchargement: {e}")
+            except Exception as e:
+                print(f"❌ Erreur de rafraîchissement: {e}")
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class ChangeFeed:
+    """
+    Index en mémoire du journal des modifications, lu incrémentalement
+
+    Les entrées sont rangées par curseur (recherche par bisection). Les plus
+    anciennes sont oubliées quand elles dépassent l'état courant: un client
+    en retard de plus que `floor` repart de l'état complet (reset).
+    """
+
+    def __init__(self, path: str):
+        self.log = ChangeLog(path)
+        self._lock = threading.Lock()
+        # Réveille les flux SSE quand de nouvelles entrées arrivent
+        self._cond = threading.Condition(self._lock)
+        self._entries = []
+        self._seqs = []
+        self._state = {}  # url -> annonce courante
+        self._floor = 0  # curseur des dernières entrées oubliées
+        self._offset = 0
+        self._size = 0
+
+    @property
+    def cursor(self) -> int:
+        return self._seqs[-1] if self._seqs else 0
+
+    def poll(self):
+        """Lit les nouvelles lignes du journal (sans relire tout le fichier)"""
+        with self._lock:
+            try:
+                size = os.path.getsize(self.log.path)
+            except OSError:
+                size = 0
+            if size < self._size:
+                # Journal recréé ou tronqué: tout relire
+                self._entries, self._seqs, self._offset = [], [], 0
+                self._state, self._floor = {}, 0
+                self._cond.notify_all()
+            self._size = size
+            if size > self._offset:
+                entries, self._offset = self.log.read(self._offset)
+                self._entries.extend(entries)
+                self._seqs.extend(entry['seq'] for entry in entries)
+                for entry in entries:
+                    if entry['op'] == 'remove':
+                        self._state.pop(entry['url'], None)
+                    else:
+                        self._state[entry['url']] = entry['annonce']
+                if entries:
+                    self._compact()
+                    self._cond.notify_all()
+
+    def _compact(self):
+        """
+        Oublie les entrées les plus anciennes au-delà de deux fois l'état
+
+        Une delta plus longue que l'état complet coûte plus cher que lui:
+        les clients aussi en retard reçoivent l'état (reset).
+        """
+        keep = max(CHANGES_MIN_KEPT, len(self._state))
+        if len(self._entries) <= 2 * keep:
+            return
+        drop = len(self._entries) - keep
+        self._floor = self._seqs[drop - 1]
+        del self._entries[:drop]
+        del self._seqs[:drop]
+
+    def annonces(self) -> List[Dict]:
+        """Annonces courantes (journal rejoué)"""
+        with self._lock:
+            return list(self._state.values())
+
+    def entries_after(self, seq: int) -> List[Dict]:
+        """Entrées de curseur strictement supérieur à seq"""
+        with self._lock:
+            return self._entries[bisect.bisect_right(self._seqs, seq):]
+
+    def wait_for_entries(self, after: int, timeout: float):
+        """
+        Attend de nouvelles entrées après un curseur
+
+        Returns:
+            Liste des entrées (vide si timeout), ou None si le journal a été
+            recréé et que le curseur n'a plus de sens
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.cursor != after, timeout)
+            if self.cursor < after or after < self._floor:
+                return None
+            return self._entries[bisect.bisect_right(self._seqs, after):]
+
+    def exists(self) -> bool:
+        return os.path.exists(self.log.path)
+
+    def needs_reset(self, since: int) -> bool:
+        """Le client doit-il repartir de l'état complet ?"""
+        return since <= 0 or since < self._floor or since > self.cursor
+
+    def changes_since(self, since: int) -> Dict:
+        """
+        Calcule la delta depuis un curseur client
+
+        Un curseur inconnu (journal recréé) ou plus ancien que les entrées
+        gardées renvoie l'état complet avec reset=True pour que le client
+        reparte de zéro.
+        """
+        self.poll()
+        with self._lock:
+            cursor = self.cursor
+            reset = self.needs_reset(since)
+            if reset:
+                delta = {'inserted': list(self._state.values()),
+                         'updated': [], 'removed': []}
+            else:
+                start = bisect.bisect_right(self._seqs, since)
+                delta = collapse_changes(self._entries[start:], since)
+        delta['cursor'] = cursor
+        delta['reset'] = reset
+        return delta
+
+
+class ChangeWatcher(threading.Thread):
+    """Thread qui surveille le journal et réveille les flux SSE"""
+
+    def __init__(self, interval: float = CHANGES_POLL_INTERVAL):
+        super().__init__(name='changes-watcher', daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                changes.poll()
+                # Annonces enrichies cherchables sans attendre une requête
+                search.refresh()
+            except Exception as e:
+                print(f"❌ Erreur de lecture du journal: {e}")
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def event_type(entry: Dict) -> str:
+    """Type d'événement SSE correspondant à une entrée du journal"""
+    if entry['op'] == 'insert':
+        return 'new'
+    if entry['op'] == 'remove':
+        return 'remove'
+    if 'price' in entry.get('changed', ()):
+        return 'price'
+    if entry.get('source') == 'enrich':
+        return 'enriched'
+    return 'update'
+
+
+def current_version():
+    """
+    Version du jeu de données servi (change quand les données changent)
+
+    Le journal des modifications est prioritaire sur DATA_URL / le cache,
+    pour toutes les routes (/api/annonces, colonnes, détail, stats...).
+    """
+    if changes.exists():
+        changes.poll()
+        return ('changes', changes.cursor)
+    snapshot = dataset.snapshot
+    return ('dataset', snapshot) if snapshot else None
+
+
+def current_annonces() -> List[Dict]:
+    """Annonces de la version courante, décodées"""
+    if changes.exists():
+        return changes.annonces()
+    snapshot = dataset.snapshot
+    if snapshot is None:
+        return []
+    data = json.loads(snapshot.data)
+    return data if isinstance(data, list) else [data]
+
+
+class MaterializedViews:
+    """
+    Vues dérivées du jeu de données (payload colonnes, index...)
+
+    Chaque vue est calculée une seule fois par version des données, à la
+    première requête qui en a besoin, puis partagée.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._views = {}
+        self._flight = SingleFlight()
+
+    def get(self, name: str, builder):
+        """
+        Retourne la vue `name`, calculée par builder(annonces) si besoin
+        """
+        version = current_version()
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._views = {}
+            if name in self._views:
+                return self._views[name]
+
+        def build():
+            with time_stage(f'view_{name}'):
+                value = builder(current_annonces())
+            with self._lock:
+                if self._version == version:
+                    self._views[name] = value
+            return value
+
+        return self._flight.do((name, version), build)
+
+
+def build_annonces(annonces: List[Dict]) -> bytes:
+    """Annonces complètes servies par /api/annonces (journal rejoué)"""
+    return json.dumps(annonces, ensure_ascii=False).encode('utf-8')
+
+
+def build_changes_reset(annonces: List[Dict]) -> bytes:
+    """Réponse de /api/annonces/changes pour un client sans curseur"""
+    delta = changes.changes_since(0)
+    return json.dumps(delta, ensure_ascii=False).encode('utf-8')
+
+
+def build_details_index(annonces: List[Dict]) -> Dict[str, Dict]:
+    """Index sid -> annonce complète pour /api/annonces/<sid>"""
+    return {
+        short_id(annonce.get('url') or str(annonce.get('id', ''))): annonce
+        for annonce in annonces
+    }
+
+
+class LiveMarket:
+    """
+    Références €/m² par quartier alignées sur la version servie
+
+    L'index NumPy survit aux changements de version: seules les annonces
+    nouvelles ou modifiées sont relues, puis les agrégats sont recalculés
+    d'un bloc.
+    """
+
+    def __init__(self):
+        self.index = analytics.MarketIndex() if analytics.available() \
+            else None
+        self._lock = threading.Lock()
+
+    def sync(self, annonces: List[Dict]):
+        with self._lock, time_stage('market_sync'):
+            self.index.sync(annonces)
+
+    def scores(self, annonces: List[Dict]) -> Dict[str, List]:
+        """Colonnes price_m2 / deal / deal_rank alignées sur annonces"""
+        self.sync(annonces)
+        return self.index.scores([analytics.annonce_key(a)
+                                  for a in annonces])
+
+
+def build_fields(annonces: List[Dict]) -> List[Dict]:
+    """Champs des vues liste et carte, partagés par colonnes et facettes"""
+    return [list_fields(annonce) for annonce in annonces]
+
+
+def build_columns(annonces: List[Dict]) -> bytes:
+    """Payload colonnes, complété des scores de marché si NumPy est là"""
+    payload = to_columns(annonces, views.get('fields', build_fields))
+    if market.index is not None:
+        payload['columns'].update(market.scores(annonces))
+    return json.dumps(
+        payload, ensure_ascii=False, separators=(',', ':')
+    ).encode('utf-8')
+
+
+def build_market(annonces: List[Dict]) -> bytes:
+    """Références €/m² par quartier, par ville et par DPE"""
+    market.sync(annonces)
+    return json.dumps({
+        'min_group': market.index.min_group,
+        'percentiles': analytics.PERCENTILES,
+        'baselines': market.index.baselines(),
+        'dpe': market.index.dpe_baselines(),
+    }, ensure_ascii=False).encode('utf-8')
+
+
+def build_facets(annonces: List[Dict]) -> FacetIndex:
+    return FacetIndex(annonces, views.get('fields', build_fields))
+
+
+def build_stats(annonces: List[Dict]) -> bytes:
+    """Facettes et histogrammes sans filtre (servis tels quels)"""
+    stats = views.get('facets', build_facets).stats()
+    return json.dumps(stats, ensure_ascii=False).encode('utf-8')
+
+
+class LiveSearch:
+    """
+    Index plein texte aligné sur la version servie
+
+    Construit à la première recherche, puis mis à jour incrémentalement
+    (seules les annonces modifiées sont réindexées).
+    """
+
+    def __init__(self):
+        self.index = SearchIndex()
+        self._lock = threading.Lock()
+        self._version = None
+
+    def refresh(self, force: bool = False):
+        """Synchronise l'index si les données ont changé"""
+        if self._version is None and not force:
+            return  # Pas encore utilisé: ne pas indexer pour rien
+        version = current_version()
+        with self._lock:
+            if version is None or version == self._version:
+                return
+            with time_stage('search_sync'):
+                self.index.sync(current_annonces())
+            self._version = version
+
+    def search(self, query: str, limit=None):
+        self.refresh(force=True)
+        return self.index.search(query, limit)
+
+
+dataset = AnnoncesDataset()
+changes = ChangeFeed(CHANGES_FILE)
+views = MaterializedViews()
+search = LiveSearch()
+market = LiveMarket()
+# Fichiers de production (--dist); None: fichiers sources tels quels
+static_assets = None
 
 
 class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+    # HTTP/1.1 pour garder les connexions des navigateurs ouvertes
+    protocol_version = 'HTTP/1.1'
+    # En-têtes et corps partent en deux écritures: sans TCP_NODELAY, le
+    # corps attend l'ACK retardé du client (~40 ms) sur une connexion gardée
+    disable_nagle_algorithm = True
+
     def end_headers(self):
         # Ajouter les headers CORS pour éviter les problèmes de chargement
         self.send_header('Access-Control-Allow-Origin', '*')
@@ -23,107 +691,438 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         super().end_headers()
 
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
     def do_GET(self):
+        route = urllib.parse.urlsplit(self.path).path
+        label = metrics_route(route)
+        self._status = None
+        start = time.perf_counter()
+        try:
+            self.dispatch_get(route)
+        finally:
+            if label != '/api/events':
+                # Les flux SSE restent ouverts: leur durée n'a pas de sens
+                REQUEST_SECONDS.observe(time.perf_counter() - start,
+                                        route=label)
+            REQUESTS_TOTAL.inc(route=label, status=self._status)
+
+    def dispatch_get(self, route: str):
+        """Aiguille une requête GET vers l'API ou les fichiers statiques"""
         # Intercepter les requêtes vers /api/annonces
-        if self.path.startswith('/api/annonces'):
-            self.serve_annonces()
+        if route == '/metrics':
+            self.serve_metrics()
+        elif route == '/api/annonces/changes':
+            self.serve_changes()
+        elif route == '/api/annonces/columns':
+            self.serve_columns()
+        elif route == '/api/market':
+            self.serve_market()
+        elif route == '/api/stats':
+            self.serve_stats()
+        elif route.startswith('/api/annonces/'):
+            self.serve_annonce_detail(route[len('/api/annonces/'):])
+        elif route == '/api/events':
+            self.serve_events()
+        elif self.path.startswith('/api/annonces'):
+            if 'q' in self.query_params():
+                self.serve_search()
+            else:
+                self.serve_annonces()
+        elif static_assets and static_assets.get(route):
+            self.serve_asset(static_assets.get(route))
         else:
             # Servir les fichiers statiques normalement
             super().do_GET()
 
+    def serve_asset(self, asset: 'assets.StaticAsset'):
+        """Fichier de production: variante compressée, cache et ETag"""
+        headers = {
+            'Cache-Control': asset.cache_control,
+            'ETag': asset.etag,
+            'Vary': 'Accept-Encoding',
+        }
+        if_none_match = self.headers.get('If-None-Match', '')
+        if asset.etag in (tag.strip() for tag in if_none_match.split(',')):
+            self.send_response(304)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        encoding = asset.negotiate(self.headers.get('Accept-Encoding'))
+        body = asset.bodies[encoding]
+        self.send_response(200)
+        self.send_header('Content-Type', asset.content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if encoding != 'identity':
+            self.send_header('Content-Encoding', encoding)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, data: bytes, status: int = 200, headers=None):
+        """Envoie un corps JSON déjà sérialisé"""
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
     def serve_annonces(self):
-        """Télécharger et servir les annonces depuis l'URL ou le cache"""
-        global DATA_URL
-        
+        """Servir les annonces depuis la mémoire (stale-while-revalidate)"""
         try:
-            # Essayer de télécharger depuis l'URL si elle est configurée
-            if DATA_URL:
-                print(f"📥 Téléchargement des annonces depuis {DATA_URL}...")
-                
-                with urllib.request.urlopen(DATA_URL, timeout=30) as response:
-                    data = response.read()
-                    
-                # Sauvegarder dans le cache
-                with open(CACHE_FILE, 'wb') as f:
-                    f.write(data)
-                msg = f"Données sauvegardées dans {CACHE_FILE}"
-                print(f"✅ {msg}")
-                
-                # Envoyer les données
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(data)
-                
-            else:
-                # Pas d'URL configurée, essayer le cache
-                if os.path.exists(CACHE_FILE):
-                    print(f"📂 Chargement depuis le cache {CACHE_FILE}...")
-                    with open(CACHE_FILE, 'rb') as f:
-                        data = f.read()
-                    
-                    self.send_response(200)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    self.wfile.write(data)
-                else:
-                    msg = (f"Aucune URL configurée et pas de cache "
-                           f"trouvé ({CACHE_FILE})")
-                    raise FileNotFoundError(msg)
-                    
-        except urllib.error.URLError as e:
-            # Erreur de téléchargement, essayer le cache
-            print(f"⚠️ Erreur de téléchargement: {e}")
-            if os.path.exists(CACHE_FILE):
-                print(f"📂 Utilisation du cache {CACHE_FILE}...")
-                with open(CACHE_FILE, 'rb') as f:
-                    data = f.read()
-                
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(data)
-            else:
+            if changes.exists():
+                # Même source que les colonnes et le détail
+                data = views.get('annonces', build_annonces)
+                self.send_json(data, headers={
+                    'Cache-Control': 'no-cache',
+                    'X-Data-Source': 'changes',
+                })
+                return
+            snapshot = dataset.snapshot
+            if snapshot is None and DATA_URL:
+                # Premier démarrage sans cache: attendre le téléchargement
+                try:
+                    dataset.refresh()
+                except urllib.error.URLError as e:
+                    print(f"⚠️ Erreur de téléchargement: {e}")
+                snapshot = dataset.snapshot
+            if snapshot is None:
+                dataset.load_cache()
+                snapshot = dataset.snapshot
+
+            if snapshot is None:
                 msg = ("Service indisponible: impossible de télécharger "
                        "et pas de cache")
                 self.send_error(503, msg)
-                
+                return
+
+            age = max(0, int(time.time() - snapshot.loaded_at))
+            stale = dataset.is_stale(2 * REFRESH_INTERVAL)
+            self.send_json(snapshot.data, headers={
+                'Age': str(age),
+                'Last-Modified': self.date_time_string(snapshot.loaded_at),
+                'Cache-Control': 'no-cache',
+                'X-Data-Source': snapshot.source,
+                'X-Data-Stale': 'true' if stale else 'false',
+            })
+
+        except Exception as e:
+            print(f"❌ Erreur: {e}")
+            self.send_error(500, f"Erreur interne: {str(e)}")
+
+    def query_params(self) -> Dict[str, str]:
+        """Paramètres de la query string (dernière valeur retenue)"""
+        query = urllib.parse.urlsplit(self.path).query
+        return dict(urllib.parse.parse_qsl(query))
+
+    def serve_changes(self):
+        """Servir les annonces modifiées depuis ?since=<curseur>"""
+        if not changes.exists():
+            self.send_error(404, "Pas de journal des modifications")
+            return
+        try:
+            since = int(self.query_params().get('since', 0))
+        except ValueError:
+            self.send_error(400, "Paramètre since invalide")
+            return
+        try:
+            if changes.needs_reset(since):
+                # État complet: sérialisé une fois par version
+                data = views.get('changes_reset', build_changes_reset)
+            else:
+                delta = changes.changes_since(since)
+                data = json.dumps(delta, ensure_ascii=False).encode('utf-8')
+            self.send_json(data, headers={'Cache-Control': 'no-cache'})
         except Exception as e:
             print(f"❌ Erreur: {e}")
             self.send_error(500, f"Erreur interne: {str(e)}")
 
+    def serve_search(self):
+        """Recherche plein texte: ?q=<requête>[&limit=N] (0 = tout)"""
+        params = self.query_params()
+        try:
+            limit = int(params.get('limit', SEARCH_LIMIT))
+        except ValueError:
+            self.send_error(400, "Paramètre limit invalide")
+            return
+        try:
+            if current_version() is None:
+                self.send_error(503, "Aucune donnée disponible")
+                return
+            start = time.perf_counter()
+            results = search.search(params['q'], limit or None)
+            took = time.perf_counter() - start
+            data = json.dumps({
+                'query': params['q'],
+                'count': len(results),
+                'took_ms': round(took * 1000, 2),
+                'results': [
+                    {'url': url, 'sid': short_id(url),
+                     'score': round(score, 4)}
+                    for url, score in results
+                ],
+            }, ensure_ascii=False).encode('utf-8')
+            self.send_json(data, headers={'Cache-Control': 'no-cache'})
+        except Exception as e:
+            print(f"❌ Erreur: {e}")
+            self.send_error(500, f"Erreur interne: {str(e)}")
+
+    def serve_metrics(self):
+        """Métriques au format texte Prometheus"""
+        data = REGISTRY.to_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def serve_columns(self):
+        """Servir le payload compact (colonnes) des vues liste et carte"""
+        try:
+            if current_version() is None:
+                self.send_error(503, "Aucune donnée disponible")
+                return
+            data = views.get('columns', build_columns)
+            self.send_json(data, headers={'Cache-Control': 'no-cache'})
+        except Exception as e:
+            print(f"❌ Erreur: {e}")
+            self.send_error(500, f"Erreur interne: {str(e)}")
+
+    def serve_market(self):
+        """Servir les références €/m² par quartier"""
+        if market.index is None:
+            self.send_error(503, "Analyse de marché indisponible (NumPy "
+                                 "non installé)")
+            return
+        try:
+            if current_version() is None:
+                self.send_error(503, "Aucune donnée disponible")
+                return
+            data = views.get('market', build_market)
+            self.send_json(data, headers={'Cache-Control': 'no-cache'})
+        except Exception as e:
+            print(f"❌ Erreur: {e}")
+            self.send_error(500, f"Erreur interne: {str(e)}")
+
+    def serve_stats(self):
+        """
+        Facettes (ville, quartier, DPE, chambres, pièces) et histogrammes
+        (prix, surface), pour les filtres de la query string:
+        ?ville=...&price_min=...&chambres_min=...&q=<recherche>
+        """
+        params = self.query_params()
+        filters = {k: v for k, v in params.items()
+                   if k in FILTER_PARAMS and v}
+        query = params.get('q', '').strip()
+        try:
+            if current_version() is None:
+                self.send_error(503, "Aucune donnée disponible")
+                return
+            if not filters and not query:
+                data = views.get('stats', build_stats)
+            else:
+                start = time.perf_counter()
+                index = views.get('facets', build_facets)
+                matched = None
+                if query:
+                    matched = [url for url, _ in search.search(query, None)]
+                stats = index.stats(filters, matched)
+                stats['query'] = query or None
+                stats['took_ms'] = round(
+                    (time.perf_counter() - start) * 1000, 2)
+                data = json.dumps(stats, ensure_ascii=False).encode('utf-8')
+            self.send_json(data, headers={'Cache-Control': 'no-cache'})
+        except ValueError as e:
+            self.send_error(400, str(e))
+        except Exception as e:
+            print(f"❌ Erreur: {e}")
+            self.send_error(500, f"Erreur interne: {str(e)}")
+
+    def serve_annonce_detail(self, sid: str):
+        """Servir une annonce complète (description, images...)"""
+        try:
+            annonce = views.get('details', build_details_index).get(sid)
+            if annonce is None:
+                self.send_error(404, "Annonce inconnue")
+                return
+            data = json.dumps(annonce, ensure_ascii=False).encode('utf-8')
+            self.send_json(data)
+        except Exception as e:
+            print(f"❌ Erreur: {e}")
+            self.send_error(500, f"Erreur interne: {str(e)}")
+
+    def serve_events(self):
+        """Flux Server-Sent Events des modifications du journal"""
+        if not isinstance(self.server, socketserver.ThreadingMixIn):
+            # Un flux permanent bloquerait le serveur mono-thread
+            self.send_error(503, "SSE indisponible en mode mono-thread")
+            return
+        # EventSource renvoie Last-Event-ID lors des reconnexions
+        last_id = self.headers.get('Last-Event-ID') or \
+            self.query_params().get('since')
+        try:
+            last_id = int(last_id) if last_id else changes.cursor
+        except ValueError:
+            self.send_error(400, "Curseur invalide")
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.close_connection = True
+
+        try:
+            self.wfile.write(b'retry: 3000\n\n')
+            self.wfile.flush()
+            while True:
+                entries = changes.wait_for_entries(last_id, SSE_HEARTBEAT)
+                if entries is None:
+                    # Journal recréé: le client doit se resynchroniser
+                    last_id = changes.cursor
+                    self.wfile.write(
+                        f'id: {last_id}\nevent: reset\ndata: {{}}\n\n'
+                        .encode('utf-8')
+                    )
+                elif not entries:
+                    # Commentaire pour garder la connexion ouverte
+                    self.wfile.write(b': ping\n\n')
+                else:
+                    chunks = []
+                    for entry in entries:
+                        payload = json.dumps(entry, ensure_ascii=False)
+                        chunks.append(
+                            f"id: {entry['seq']}\nevent: {event_type(entry)}"
+                            f"\ndata: {payload}\n\n"
+                        )
+                    last_id = entries[-1]['seq']
+                    self.wfile.write(''.join(chunks).encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client déconnecté
+            return
+
     def log_message(self, format, *args):  # noqa: A002
         # Logger les requêtes
         print(f"[{self.log_date_time_string()}] {format % args}")
 
 
-def main():
-    global DATA_URL
-    
+def metrics_route(route: str) -> str:
+    """Étiquette de route à faible cardinalité pour les métriques"""
+    if route in API_ROUTES:
+        return route
+    if route.startswith('/api/annonces/'):
+        return '/api/annonces/:sid'
+    return 'static'
+
+
+class ThreadedHTTPServer(http.server.ThreadingHTTPServer):
+    """Serveur HTTP traitant chaque connexion dans son propre thread"""
+    allow_reuse_address = True
+    daemon_threads = True
+    # File d'attente assez longue pour absorber des rafales de connexions
+    request_queue_size = 128
+
+
+class SingleThreadHTTPServer(socketserver.TCPServer):
+    """Serveur HTTP historique: une requête à la fois"""
+    allow_reuse_address = True
+
+
+def make_server(port: int = PORT, threaded: bool = True,
+                handler=MyHTTPRequestHandler):
+    """Crée le serveur HTTP (multi-thread par défaut)"""
+    if threaded:
+        return ThreadedHTTPServer(("", port), handler)
+    # En mono-thread, une connexion keep-alive bloquerait tous les autres
+    # clients: on revient à HTTP/1.0 (une requête par connexion)
+    handler = type(handler.__name__, (handler,),
+                   {'protocol_version': 'HTTP/1.0'})
+    return SingleThreadHTTPServer(("", port), handler)
+
+
+def main(argv=None):
+    global DATA_URL, REFRESH_INTERVAL, changes, static_assets
+
+    parser = argparse.ArgumentParser(
+        description='Serveur du visualiseur d\'annonces'
+    )
+    parser.add_argument('url', nargs='?',
+                        help='URL du fichier JSON des annonces')
+    parser.add_argument('--port', '-p', type=int, default=PORT,
+                        help=f'Port d\'écoute (défaut: {PORT})')
+    parser.add_argument('--single-thread', action='store_true',
+                        help='Traiter une seule requête à la fois')
+    parser.add_argument('--refresh', type=float, default=REFRESH_INTERVAL,
+                        help='Intervalle de rafraîchissement en secondes '
+                             f'(défaut: {REFRESH_INTERVAL})')
+    parser.add_argument('--changelog', default=CHANGES_FILE,
+                        help='Journal des modifications (défaut: '
+                             f'{CHANGELOG_FILE} à la racine du projet)')
+    parser.add_argument('--dist', action='store_true',
+                        help='Mode production: fichiers minifiés, versionnés '
+                             'et précompressés (build au démarrage), cache '
+                             'navigateur et service worker hors ligne')
+    args = parser.parse_args(argv)
+    if args.refresh <= 0:
+        parser.error('--refresh doit être strictement positif')
+    changes_path = os.path.abspath(args.changelog)
+    # SELOGER_PROFILE=<répertoire>: profilage par étape, écrit à l'arrêt
+    profile_dir = os.environ.get(profiling.PROFILE_ENV)
+    if profile_dir:
+        profiling.enable(os.path.abspath(profile_dir))
+
     # Changer le répertoire vers celui du script
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
-    
+
     # Vérifier si une URL est fournie en argument
-    if len(sys.argv) > 1:
-        DATA_URL = sys.argv[1]
+    if args.url:
+        DATA_URL = args.url
         print(f"🔗 URL configurée: {DATA_URL}")
     else:
         print("ℹ️  Aucune URL fournie, utilisation du cache si disponible")
         print("   Usage: python3 server.py <URL_JSON>")
-    
-    with socketserver.TCPServer(("", PORT), MyHTTPRequestHandler) as httpd:
-        print(f"🚀 Serveur démarré sur http://localhost:{PORT}")
+    REFRESH_INTERVAL = args.refresh
+    changes = ChangeFeed(changes_path)
+    if args.dist:
+        manifest = assets.build()
+        static_assets = assets.StaticAssets.load()
+        print(f"📦 Fichiers de production {manifest['version']} "
+              f"({assets.DIST_DIR})")
+
+    # Servir immédiatement le dernier cache connu, puis rafraîchir
+    dataset.load_cache()
+    refresher = BackgroundRefresher(dataset, REFRESH_INTERVAL)
+    refresher.start()
+    watcher = ChangeWatcher()
+    watcher.start()
+
+    with make_server(args.port, threaded=not args.single_thread) as httpd:
+        mode = "mono-thread" if args.single_thread else "multi-thread"
+        print(f"🚀 Serveur démarré sur http://localhost:{args.port} ({mode})")
         print(f"📂 Répertoire: {os.getcwd()}")
         print(f"💾 Fichier cache: {CACHE_FILE}")
-        url = f"http://localhost:{PORT}"
+        print(f"🔄 Rafraîchissement toutes les {REFRESH_INTERVAL:.0f}s")
+        url = f"http://localhost:{args.port}"
         print(f"🌐 Ouvrez votre navigateur à l'adresse: {url}")
         print("⏹️  Appuyez sur Ctrl+C pour arrêter le serveur\n")
-        
+
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
             print("\n\n👋 Arrêt du serveur...")
+            refresher.stop()
+            watcher.stop()
             httpd.shutdown()
+            if profile_dir:
+                profiling.dump()
 
 
 if __name__ == "__main__":
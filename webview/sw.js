@@ -0,0 +1,75 @@
+// Service worker du visualiseur (mode production, généré par assets.py)
+// Coquille (HTML, JS, CSS, Leaflet) en cache à l'installation: affichage
+// immédiat et hors ligne. Dernier jeu de données gardé pour le hors-ligne.
+const VERSION = '__VERSION__'; // Empreinte de la coquille (remplacée au build)
+const SHELL = __SHELL__; // Fichiers de la coquille (remplacés au build)
+const SHELL_CACHE = `shell-${VERSION}`;
+const DATA_CACHE = 'data';
+// Réponses de l'API gardées pour le hors-ligne (sans query string). Les
+// deltas (/api/annonces/changes) n'en font pas partie: la copie IndexedDB
+// de app.js sert alors de dernier jeu de données.
+const DATA_ROUTES = ['/api/annonces', '/api/annonces/columns', '/api/market', '/api/stats'];
+
+self.addEventListener('install', (event) => {
+    event.waitUntil(caches.open(SHELL_CACHE).then(cache => Promise.all(SHELL.map(url => {
+        // Leaflet vient d'un CDN sans CORS: réponse opaque, mise en cache telle quelle
+        const request = url.startsWith('http') ? new Request(url, { mode: 'no-cors' }) : url;
+        return fetch(request).then(response => cache.put(url, response));
+    }))).then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', (event) => {
+    // Supprimer les coquilles des versions précédentes
+    event.waitUntil(caches.keys().then(keys => Promise.all(
+        keys.filter(key => key.startsWith('shell-') && key !== SHELL_CACHE)
+            .map(key => caches.delete(key))
+    )).then(() => self.clients.claim()));
+});
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+    const url = new URL(request.url);
+
+    if (url.origin === location.origin && DATA_ROUTES.includes(url.pathname)) {
+        // Recherches et filtres: toujours le réseau
+        if (url.search) return;
+        event.respondWith(networkFirst(request));
+    } else if (request.mode === 'navigate') {
+        event.respondWith(staleWhileRevalidate('./'));
+    } else if (SHELL.includes(url.origin === location.origin ? url.pathname.slice(1) : url.href)) {
+        // Fichiers versionnés: jamais modifiés, le cache suffit
+        event.respondWith(caches.match(url.href).then(cached => cached || fetch(request)));
+    }
+});
+
+// Réseau d'abord (données à jour), dernière réponse en cache hors ligne
+async function networkFirst(request) {
+    const cache = await caches.open(DATA_CACHE);
+    try {
+        const response = await fetch(request);
+        if (response.ok) {
+            await cache.put(request, response.clone());
+        }
+        return response;
+    } catch (error) {
+        const cached = await cache.match(request);
+        if (cached) return cached;
+        throw error;
+    }
+}
+
+// Page en cache tout de suite, mise à jour en arrière-plan
+async function staleWhileRevalidate(key) {
+    const cache = await caches.open(SHELL_CACHE);
+    const cached = await cache.match(key);
+    const refresh = fetch(key).then(response => {
+        if (response.ok) cache.put(key, response.clone());
+        return response;
+    });
+    if (cached) {
+        refresh.catch(() => {});
+        return cached;
+    }
+    return refresh;
+}
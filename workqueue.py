@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+File de travail partagée pour l'enrichissement sur plusieurs machines
+Un fichier SQLite (sur un volume partagé) liste les annonces à enrichir.
+Chaque worker prend une annonce avec un bail (lease) daté, le prolonge
+tant qu'il travaille (heartbeat) et dépose le résultat dans la base. Un
+worker mort laisse expirer ses baux: ses annonces repartent chez les
+autres, au plus `max_attempts` fois. Deux workers ne prennent jamais la
+même annonce en même temps; si un bail expire pendant un chargement lent,
+le premier résultat déposé l'emporte.
+
+Le journal SQLite reste en mode "delete" (le mode WAL exige une mémoire
+partagée sur une seule machine); le volume doit donc gérer les verrous
+POSIX (NFSv4, SMB) et les horloges des machines être synchronisées (NTP).
+
+Usage: python3 workqueue.py seed --input annonces.json
+       python3 enrich_annonces.py --queue enrich_queue.sqlite   # sur chaque machine
+       python3 workqueue.py status
+       python3 workqueue.py export --output annonces_enriched.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from checkpoint import compact, iter_annonces
+
+QUEUE_FILE = 'enrich_queue.sqlite'
+DEFAULT_LEASE = 120.0  # secondes sans heartbeat avant reprise par un autre
+DEFAULT_MAX_ATTEMPTS = 3
+BUSY_TIMEOUT = 60.0  # secondes d'attente d'un verrou tenu par un autre worker
+SEED_BATCH = 500
+
+PENDING, LEASED, DONE, FAILED = 'pending', 'leased', 'done', 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL UNIQUE,
+    annonce TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    result TEXT,
+    error TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS items_state ON items (state, seq);
+"""
+
+
+def worker_name() -> str:
+    """Identifiant du worker: machine et processus"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class WorkQueue:
+    """
+    File d'annonces à enrichir, partagée par fichier SQLite
+
+    Utilisable depuis plusieurs threads (une connexion, un verrou).
+
+    Usage:
+        queue = WorkQueue('enrich_queue.sqlite')
+        queue.seed(iter_annonces('annonces.json'))
+        worker = worker_name()
+        for annonce in queue.claim(worker):
+            queue.complete(worker, annonce['url'], enriched)
+    """
+
+    def __init__(self, path: str = QUEUE_FILE,
+                 lease_seconds: float = DEFAULT_LEASE,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self._lock = threading.Lock()
+        # Vrai quand un claim() de ce worker a fait passer en échec la
+        # dernière annonce ouverte: complete()/fail() ne verront plus
+        # jamais 0, l'export lui revient
+        self.emptied = False
+        self._db = sqlite3.connect(path, timeout=BUSY_TIMEOUT,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=DELETE')
+        self._db.executescript(SCHEMA)
+
+    def _write(self, fn):
+        """Exécute fn(db) dans une transaction qui prend le verrou d'écriture"""
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                result = fn(self._db)
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+            return result
+
+    def seed(self, annonces: Iterable[Dict]) -> int:
+        """
+        Ajoute des annonces (les URLs déjà présentes sont ignorées)
+
+        Returns:
+            Nombre d'annonces ajoutées
+        """
+        added = 0
+        rows = ((a['url'], json.dumps(a, ensure_ascii=False), time.time())
+                for a in annonces if a.get('url'))
+        while True:
+            batch = list(itertools.islice(rows, SEED_BATCH))
+            if not batch:
+                return added
+
+            def insert(db):
+                before = db.total_changes
+                db.executemany(
+                    'INSERT OR IGNORE INTO items (url, annonce, updated) '
+                    'VALUES (?, ?, ?)', batch)
+                return db.total_changes - before
+
+            added += self._write(insert)
+
+    def claim(self, worker: str, limit: int = 1) -> List[Dict]:
+        """
+        Prend jusqu'à `limit` annonces libres ou à bail expiré
+
+        Une annonce dont le bail expire après `max_attempts` prises (le
+        worker meurt à chaque fois dessus) passe en échec au lieu d'être
+        reprise. Si c'était la dernière annonce ouverte, `emptied` passe à
+        vrai.
+        """
+        def take(db):
+            now = time.time()
+            expired = db.execute(
+                "UPDATE items SET state = 'failed', worker = NULL, "
+                "lease_until = NULL, error = 'bail expiré', updated = ? "
+                "WHERE state = 'leased' AND lease_until < ? "
+                "AND attempts >= ?", (now, now, self.max_attempts)).rowcount
+            if expired and not self._open_count(db):
+                self.emptied = True
+            rows = db.execute(
+                "SELECT seq, annonce FROM items WHERE state = 'pending' "
+                "OR (state = 'leased' AND lease_until < ?) "
+                "ORDER BY seq LIMIT ?", (now, limit)).fetchall()
+            db.executemany(
+                "UPDATE items SET state = 'leased', worker = ?, "
+                "lease_until = ?, attempts = attempts + 1, updated = ? "
+                "WHERE seq = ?",
+                [(worker, now + self.lease_seconds, now, seq)
+                 for seq, _ in rows])
+            return [json.loads(annonce) for _, annonce in rows]
+
+        return self._write(take)
+
+    def heartbeat(self, worker: str) -> int:
+        """Prolonge les baux du worker; renvoie le nombre d'annonces tenues"""
+        def renew(db):
+            return db.execute(
+                "UPDATE items SET lease_until = ? "
+                "WHERE state = 'leased' AND worker = ?",
+                (time.time() + self.lease_seconds, worker)).rowcount
+
+        return self._write(renew)
+
+    def _open_count(self, db) -> int:
+        return db.execute("SELECT COUNT(*) FROM items "
+                          "WHERE state IN ('pending', 'leased')").fetchone()[0]
+
+    def complete(self, worker: str, url: str, result: Dict) -> Optional[int]:
+        """
+        Dépose le résultat d'une annonce
+
+        Accepté même si le bail a expiré entre-temps, tant que personne
+        n'a déjà déposé de résultat.
+
+        Returns:
+            Annonces restant à traiter (en attente ou en cours), ou None si
+            un autre worker avait déjà terminé cette annonce
+        """
+        payload = json.dumps(result, ensure_ascii=False)
+
+        def finish(db):
+            changed = db.execute(
+                "UPDATE items SET state = 'done', result = ?, worker = ?, "
+                "lease_until = NULL, error = NULL, updated = ? "
+                "WHERE url = ? AND state != 'done'",
+                (payload, worker, time.time(), url)).rowcount
+            return self._open_count(db) if changed else None
+
+        return self._write(finish)
+
+    def fail(self, worker: str, url: str, error: str) -> Optional[int]:
+        """
+        Rend une annonce en échec: remise en attente, ou échec définitif
+        après `max_attempts` prises
+
+        Returns:
+            Annonces restant à traiter, ou None si le bail n'était plus tenu
+        """
+        def give_back(db):
+            changed = db.execute(
+                "UPDATE items SET state = CASE WHEN attempts >= ? "
+                "THEN 'failed' ELSE 'pending' END, worker = NULL, "
+                "lease_until = NULL, error = ?, updated = ? "
+                "WHERE url = ? AND state = 'leased' AND worker = ?",
+                (self.max_attempts, error, time.time(), url,
+                 worker)).rowcount
+            return self._open_count(db) if changed else None
+
+        return self._write(give_back)
+
+    def release(self, worker: str) -> int:
+        """Rend les annonces tenues par un worker qui s'arrête (sans échec)"""
+        def give_back(db):
+            return db.execute(
+                "UPDATE items SET state = 'pending', worker = NULL, "
+                "lease_until = NULL, attempts = MAX(attempts - 1, 0), "
+                "updated = ? WHERE state = 'leased' AND worker = ?",
+                (time.time(), worker)).rowcount
+
+        return self._write(give_back)
+
+    def requeue(self) -> int:
+        """Remet en attente les annonces en échec définitif"""
+        def reset(db):
+            return db.execute(
+                "UPDATE items SET state = 'pending', attempts = 0, "
+                "updated = ? WHERE state = 'failed'",
+                (time.time(),)).rowcount
+
+        return self._write(reset)
+
+    def waiting(self, worker: str) -> int:
+        """
+        Annonces qu'un autre worker pourrait encore rendre: en attente, ou
+        en cours chez un autre (son bail peut expirer)
+        """
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM items WHERE state = 'pending' "
+                "OR (state = 'leased' AND worker != ?)",
+                (worker,)).fetchone()[0]
+
+    def counts(self) -> Dict[str, int]:
+        """Nombre d'annonces par état"""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT state, COUNT(*) FROM items GROUP BY state').fetchall()
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update(rows)
+        return counts
+
+    def workers(self, state: str = LEASED) -> Dict[str, int]:
+        """Annonces par worker dans un état (en cours par défaut)"""
+        with self._lock:
+            return dict(self._db.execute(
+                "SELECT worker, COUNT(*) FROM items WHERE state = ? "
+                "GROUP BY worker ORDER BY worker", (state,)).fetchall())
+
+    def retried(self) -> int:
+        """Annonces enrichies après plus d'une prise (bail expiré, échec)"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM items WHERE state = 'done' "
+                "AND attempts > 1").fetchone()[0]
+
+    def results(self) -> Iterator[Dict]:
+        """Annonces enrichies, dans l'ordre d'ajout à la file"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT result FROM items WHERE state = 'done' "
+                "ORDER BY seq").fetchall()
+        for (result,) in rows:
+            yield json.loads(result)
+
+    def export(self, output_path: str, visit=None) -> int:
+        """
+        Écrit les annonces enrichies vers output_path (JSON, ou binaire si
+        .sla), via un fichier de reprise temporaire compacté
+
+        Returns:
+            Nombre d'annonces écrites
+        """
+        staging = f'{output_path}.{worker_name().replace(":", "-")}.ndjson'
+        try:
+            with open(staging, 'w', encoding='utf-8') as f:
+                for annonce in self.results():
+                    f.write(json.dumps(annonce, ensure_ascii=False) + '\n')
+            return compact(staging, output_path, visit=visit)
+        finally:
+            if os.path.exists(staging):
+                os.remove(staging)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Heartbeat:
+    """
+    Thread qui prolonge les baux d'un worker (3 fois par durée de bail)
+
+    Usage:
+        with Heartbeat(queue, worker):
+            ...  # enrichissement
+    """
+
+    def __init__(self, queue: WorkQueue, worker: str,
+                 interval: Optional[float] = None):
+        self.queue = queue
+        self.worker = worker
+        self.interval = interval or queue.lease_seconds / 3
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='heartbeat')
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.queue.heartbeat(self.worker)
+            except sqlite3.Error as e:
+                # Volume momentanément injoignable: on réessaie au prochain
+                # battement, le bail laisse de la marge
+                print(f"    ⚠️  Heartbeat: {e}")
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def claimed(queue: WorkQueue, worker: str,
+            poll: Optional[float] = None) -> Iterator[Dict]:
+    """
+    Annonces prises une à une dans la file, jusqu'à épuisement
+
+    Quand la file est vide mais que d'autres workers tiennent encore des
+    annonces, on attend: si l'un d'eux meurt, ses baux expirent et ses
+    annonces sont reprises ici.
+    """
+    poll = poll or min(5.0, queue.lease_seconds / 4)
+    while True:
+        items = queue.claim(worker)
+        if items:
+            yield from items
+            continue
+        if not queue.waiting(worker):
+            return
+        time.sleep(poll)
+
+
+def print_status(queue: WorkQueue):
+    counts = queue.counts()
+    total = sum(counts.values())
+    print(f"📋 {queue.path}: {total} annonces | "
+          f"{counts[PENDING]} en attente | {counts[LEASED]} en cours | "
+          f"{counts[DONE]} enrichies | {counts[FAILED]} en échec")
+    for worker, held in queue.workers().items():
+        print(f"   - {worker}: {held} en cours")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='File de travail partagée de l\'enrichissement'
+    )
+    parser.add_argument('--queue', default=QUEUE_FILE,
+                        help=f'Fichier SQLite de la file (défaut: {QUEUE_FILE})')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_seed = sub.add_parser('seed', help='Ajouter des annonces à enrichir')
+    p_seed.add_argument('--input', default='annonces.json',
+                        help='Fichier d\'entrée (JSON, NDJSON ou .sla)')
+    p_seed.add_argument('--limit', type=int,
+                        help='Nombre max d\'annonces à ajouter')
+
+    sub.add_parser('status', help='Avancement de la file')
+
+    p_export = sub.add_parser('export', help='Écrire les annonces enrichies')
+    p_export.add_argument('--output', default='annonces_enriched.json',
+                          help='Fichier de sortie JSON, ou binaire si .sla')
+
+    sub.add_parser('requeue', help='Remettre en attente les annonces en échec')
+    args = parser.parse_args(argv)
+
+    with WorkQueue(args.queue) as queue:
+        if args.command == 'seed':
+            annonces = iter_annonces(args.input)
+            if args.limit:
+                annonces = itertools.islice(annonces, args.limit)
+            added = queue.seed(annonces)
+            print(f"📥 {added} annonces ajoutées depuis {args.input}")
+            print_status(queue)
+        elif args.command == 'status':
+            print_status(queue)
+        elif args.command == 'export':
+            total = queue.export(args.output)
+            print(f"💾 {total} annonces sauvegardées dans {args.output}")
+        elif args.command == 'requeue':
+            print(f"🔁 {queue.requeue()} annonces remises en attente")
+
+
+if __name__ == '__main__':
+    main()